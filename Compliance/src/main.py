@@ -1,11 +1,16 @@
 import os
 import re
-import yaml
 import json
 import subprocess
 import shutil
 import pwd
 import grp
+import time
+
+from scan_output import (
+    CHECK_IDS, ScanProgress, load_durations, load_groups, load_results, merge_results,
+    publish_artifacts, publish_node_results, scan_plan,
+)
 
 
 # ==============================
@@ -280,31 +285,27 @@ def evaluate_test(audit_output, tests_def):
 # Main CIS processing logic
 # ==============================
 
-def process_cis_yaml(yaml_path):
-    """Parse CIS controls YAML and evaluate all checks."""
-    with open(yaml_path, "r") as f:
-        data = yaml.safe_load(f)
-
-    if not data:
-        raise ValueError("YAML file is empty or invalid")
-
-    if "controls" in data and isinstance(data["controls"], dict) and data["controls"]:
-        control = data["controls"]
-    else:
-        control = {
-            "version": data.get("version"),
-            "id": data.get("id"),
-            "text": data.get("text"),
-            "type": data.get("type"),
-            "groups": data.get("groups", [])
-        }
-
-    groups = control.get("groups", [])
+def process_cis_yaml(yaml_path, only=None, progress=None):
+    """
+    Parse CIS controls YAML and evaluate all checks (or only the IDs in `only`).
+    Each finished check is reported to `progress`, a ScanProgress, if given.
+    """
+    groups = load_groups(yaml_path)
     results = []
 
+    def record(result):
+        results.append(result)
+        if progress is not None:
+            progress.check_done(yaml_path, result, time.monotonic() - started)
+
     for group in groups:
         for check in group.get("checks", []):
             check_id = check.get("id")
+            if only is not None and str(check_id) not in only:
+                continue
+            started = time.monotonic()
+            if progress is not None:
+                progress.check_started(yaml_path, group, check_id)
             description = check.get("text")
             audit_cmd = check.get("audit")
             check_type = check.get("type")
@@ -313,7 +314,7 @@ def process_cis_yaml(yaml_path):
             use_multiple = check.get("use_multiple_values", False)
 
             if check_type == "manual":
-                results.append({
+                record({
                     "check_id": check_id,
                     "description": description,
                     "status": "WARN",
@@ -352,7 +353,7 @@ def process_cis_yaml(yaml_path):
                     else:
                         status, reason = "WARN", "No definitive PASS or FAIL"
 
-                results.append({
+                record({
                     "check_id": check_id,
                     "description": description,
                     "status": status,
@@ -369,7 +370,7 @@ def process_cis_yaml(yaml_path):
                 except Exception as e:
                     status, reason = "ERROR", f"Exception during evaluation: {e}"
 
-                results.append({
+                record({
                     "check_id": check_id,
                     "description": description,
                     "status": status,
@@ -400,12 +401,17 @@ def main():
         print(f"Source '{MAIN_SOURCE}' not found (expected directory or file).")
         return
 
+    # Re-checks run a handful of checks and leave the last scan's progress alone
+    progress = None if CHECK_IDS else ScanProgress(scan_plan(yamls_to_process), load_durations())
+
     all_results = []
     for yaml_path in yamls_to_process:
         try:
-            res = process_cis_yaml(yaml_path)
+            res = process_cis_yaml(yaml_path, only=CHECK_IDS or None, progress=progress)
             for r in res:
                 r["_source_file"] = yaml_path
+                if CHECK_IDS:
+                    r["rechecked_at"] = time.time()
             all_results.extend(res)
         except Exception as e:
             all_results.append({
@@ -420,9 +426,22 @@ def main():
     os.makedirs("/output", exist_ok=True)
     output_file = "/output/results.json"
 
-    with open(output_file, "w") as f:
-        json.dump(all_results, f, indent=4)
-        f.write("\n")
+    if CHECK_IDS:
+        existing = load_results(output_file)
+        if not existing:
+            # Nothing to merge into: writing only the re-run checks would
+            # replace a full result set with a handful of results
+            print(f"No results in {output_file} to merge re-checked checks into; run a full scan first")
+            return
+        print(f"Re-checked {len(all_results)} of {len(CHECK_IDS)} requested checks")
+        all_results = merge_results(existing, all_results, CHECK_IDS)
+
+    # Written to a temp file and renamed, so readers never see a partial file
+    publish_artifacts(output_file, (json.dumps(all_results, indent=4) + "\n").encode(), all_results)
+    if progress is not None:
+        progress.finish()
+
+    publish_node_results(all_results)
 
     print(json.dumps(all_results, indent=4) + "\n")
 
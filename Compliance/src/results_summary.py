@@ -0,0 +1,72 @@
+"""
+Summary of a compliance result set, as the dashboard serves it on
+/api/processed.
+
+Shared by the scanners, which publish it as summary.json with each scan,
+and the dashboard, which builds it itself when no matching summary.json is
+published, so both always produce the same document.
+"""
+from collections import Counter, defaultdict
+
+TOP_FAILED_LIMIT = 20
+
+
+def normalize_status(status):
+    """PASS, FAIL, WARN or UNKNOWN."""
+    if not status:
+        return "UNKNOWN"
+    s = str(status).strip().upper()
+    if s in ("PASS", "PASSED", "SUCCESS"):
+        return "PASS"
+    if s in ("FAIL", "FAILED", "ERROR"):
+        return "FAIL"
+    if s in ("WARN", "WARNING"):
+        return "WARN"
+    return "UNKNOWN"
+
+
+def build_processed(raw_list, source_path=None, version=None):
+    """Status counts, per-file counts and ranked failures of a result list."""
+    counts = Counter()
+    per_file = defaultdict(Counter)
+    top_failed = []
+
+    for item in raw_list:
+        if not isinstance(item, dict):
+            continue
+        status = normalize_status(item.get("status"))
+        counts[status] += 1
+
+        src = item.get("_source_file") or item.get("source") or "unknown"
+        per_file[src][status] += 1
+
+        if status != "FAIL":
+            continue
+        canonical = {
+            "check_id": item.get("check_id"),
+            "description": item.get("description"),
+            "status": status,
+            "reason": item.get("reason"),
+            "remediation": item.get("remediation"),
+            "_source_file": src,
+        }
+        if isinstance(item.get("line_results"), list):
+            canonical["line_results"] = item["line_results"][:8]
+        top_failed.append(canonical)
+
+    # Failures with per-line results first; check_id coerced to str so mixed types compare
+    top_failed.sort(key=lambda x: (0 if "line_results" in x else 1, str(x.get("check_id") or "")))
+
+    meta = {"source_path": source_path}
+    if version is not None:
+        meta["version"] = version
+    return {
+        "summary": {
+            "total_checks": sum(counts.values()),
+            "counts": dict(counts),
+        },
+        "per_file": {src: dict(c) for src, c in per_file.items()},
+        "top_failed": top_failed[:TOP_FAILED_LIMIT],
+        "counts_by_status": dict(counts),
+        "meta": meta,
+    }
@@ -0,0 +1,312 @@
+"""
+Scan output shared by the control-plane and worker scanners: targeted
+re-check merging, per-node results, live progress, and the artifacts
+published with each results.json. The summary.json in those artifacts is
+built by results_summary.py, the same code the dashboard uses.
+"""
+import os
+import json
+import gzip
+import hashlib
+import socket
+import time
+import urllib.request
+
+import yaml
+
+from results_summary import build_processed
+
+
+# ==============================
+# CIS controls files
+# ==============================
+
+def load_groups(yaml_path):
+    """Return the check groups of a CIS controls YAML file."""
+    with open(yaml_path, "r") as f:
+        data = yaml.safe_load(f)
+
+    if not data:
+        raise ValueError("YAML file is empty or invalid")
+
+    if "controls" in data and isinstance(data["controls"], dict) and data["controls"]:
+        control = data["controls"]
+    else:
+        control = {
+            "version": data.get("version"),
+            "id": data.get("id"),
+            "text": data.get("text"),
+            "type": data.get("type"),
+            "groups": data.get("groups", [])
+        }
+
+    return control.get("groups", [])
+
+
+# ==============================
+# Targeted re-checks
+# ==============================
+
+# Comma-separated check IDs: run only these and merge them into the existing
+# results instead of replacing them (set by the dashboard's runtime re-checks)
+CHECK_IDS = {c.strip() for c in os.environ.get("CHECK_IDS", "").split(",") if c.strip()}
+
+
+def merge_results(existing, rerun, check_ids):
+    """Replace the re-run checks in `existing`, keeping every other result."""
+    # Only results of the requested checks: a file that failed to load yields
+    # an ERROR record without a check_id, which must not replace real results
+    by_key = {(r.get("_source_file"), r.get("check_id")): r for r in rerun if r.get("check_id") in check_ids}
+    merged = [by_key.pop((r.get("_source_file"), r.get("check_id")), r) for r in existing]
+    merged.extend(by_key.values())
+    return merged
+
+
+def load_results(path):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except (OSError, ValueError):
+        return []
+
+
+# ==============================
+# Publishing per-node results
+# ==============================
+
+NODE_NAME = os.environ.get("NODE_NAME") or socket.gethostname()
+NODE_ROLE = os.environ.get("NODE_ROLE", "control-plane")
+DASHBOARD_URL = os.environ.get("DASHBOARD_URL", "")
+# Shared secret the dashboard requires on uploads (the cis-node-upload Secret)
+NODE_UPLOAD_TOKEN = os.environ.get("NODE_UPLOAD_TOKEN", "")
+
+
+def publish_node_results(results):
+    """
+    Write this node's results to /output/nodes/<node>.json and, if
+    DASHBOARD_URL and NODE_UPLOAD_TOKEN are set, upload them to the dashboard.
+    """
+    document = {
+        "node": NODE_NAME,
+        "role": NODE_ROLE,
+        "scanned_at": time.time(),
+        "results": results,
+    }
+    os.makedirs("/output/nodes", exist_ok=True)
+    path = os.path.join("/output/nodes", f"{NODE_NAME}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(document, f)
+    os.replace(tmp, path)
+
+    if not DASHBOARD_URL or not NODE_UPLOAD_TOKEN:
+        return
+    req = urllib.request.Request(
+        f"{DASHBOARD_URL.rstrip('/')}/api/compliance/nodes/{NODE_NAME}",
+        data=json.dumps(document).encode("utf-8"),
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {NODE_UPLOAD_TOKEN}"},
+        method="PUT",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            print(f"Uploaded results for {NODE_NAME} ({resp.status})")
+    except Exception as e:
+        print(f"Failed to upload results for {NODE_NAME}: {e}")
+
+
+# ==============================
+# Scan progress
+# ==============================
+
+PROGRESS_FILE = os.environ.get("PROGRESS_FILE", "/output/progress.json")
+# Finished results of the running scan, one JSON object per line
+PARTIAL_RESULTS_FILE = os.environ.get("PARTIAL_RESULTS_FILE", "/output/results.partial.ndjson")
+# Per-check durations of past scans, for the ETA
+CHECK_DURATIONS_FILE = os.environ.get("CHECK_DURATIONS_FILE", "/output/check_durations.json")
+
+
+def duration_key(yaml_path, check_id):
+    return f"{os.path.basename(yaml_path)}:{check_id}"
+
+
+def scan_plan(yaml_paths, only=None):
+    """Duration keys of every check the scan will run, in run order."""
+    plan = []
+    for yaml_path in yaml_paths:
+        try:
+            groups = load_groups(yaml_path)
+        except Exception:
+            continue
+        for group in groups:
+            for check in group.get("checks", []):
+                if only is None or str(check.get("id")) in only:
+                    plan.append(duration_key(yaml_path, check.get("id")))
+    return plan
+
+
+def write_json_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class ScanProgress:
+    """
+    Progress of a running scan, rewritten to PROGRESS_FILE as each check
+    starts and ends; every finished result is appended to
+    PARTIAL_RESULTS_FILE so the dashboard can show it before results.json
+    exists. The ETA adds up the past durations of the remaining checks,
+    scaled by how fast this scan has been so far.
+    """
+
+    def __init__(self, plan, durations):
+        self.plan = plan
+        self.durations = durations
+        self.measured = {}
+        self.started_at = time.time()
+        self.counts = {}
+        self.current = None
+        os.makedirs(os.path.dirname(PROGRESS_FILE), exist_ok=True)
+        open(PARTIAL_RESULTS_FILE, "w").close()
+        self.write("running")
+
+    def check_started(self, yaml_path, group, check_id):
+        self.current = {
+            "source": os.path.basename(yaml_path),
+            "group_id": group.get("id"),
+            "group": group.get("text"),
+            "check_id": check_id,
+        }
+        self.write("running")
+
+    def check_done(self, yaml_path, result, seconds):
+        self.measured[duration_key(yaml_path, result.get("check_id"))] = seconds
+        status = result.get("status") or "UNKNOWN"
+        self.counts[status] = self.counts.get(status, 0) + 1
+        try:
+            with open(PARTIAL_RESULTS_FILE, "a") as f:
+                f.write(json.dumps(dict(result, _source_file=yaml_path)) + "\n")
+        except OSError as e:
+            print(f"Could not append partial result: {e}")
+        self.write("running")
+
+    def eta(self):
+        remaining = self.plan[len(self.measured):]
+        if not remaining:
+            return 0.0
+        if self.measured:
+            fallback = sum(self.measured.values()) / len(self.measured)
+        elif self.durations:
+            fallback = sum(self.durations.values()) / len(self.durations)
+        else:
+            return None
+        expected = sum(self.durations[k] for k in self.measured if k in self.durations)
+        actual = sum(v for k, v in self.measured.items() if k in self.durations)
+        scale = min(5.0, max(0.2, actual / expected)) if expected > 0 and actual > 0 else 1.0
+        return sum(self.durations.get(k, fallback) for k in remaining) * scale
+
+    def write(self, state):
+        now = time.time()
+        done = len(self.measured)
+        total = max(len(self.plan), done)
+        eta = self.eta() if state == "running" else 0.0
+        record = {
+            "state": state,
+            "node": NODE_NAME,
+            "role": NODE_ROLE,
+            "started_at": self.started_at,
+            "updated_at": now,
+            "elapsed_seconds": round(now - self.started_at, 2),
+            "checks_done": done,
+            "checks_total": total,
+            "percent": round(100.0 * done / total, 1) if total else 100.0,
+            "current": self.current if state == "running" else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "counts": self.counts,
+        }
+        try:
+            write_json_atomic(PROGRESS_FILE, record)
+        except OSError as e:
+            print(f"Could not write scan progress: {e}")
+
+    def finish(self, state="completed"):
+        self.write(state)
+        durations = dict(self.durations)
+        for key, seconds in self.measured.items():
+            previous = durations.get(key)
+            durations[key] = round(seconds if previous is None else (previous + seconds) / 2, 4)
+        try:
+            write_json_atomic(CHECK_DURATIONS_FILE, durations)
+        except OSError as e:
+            print(f"Could not save check durations: {e}")
+
+
+def load_durations():
+    try:
+        with open(CHECK_DURATIONS_FILE, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+# ==============================
+# Published artifacts
+# ==============================
+
+# Summary the dashboard serves as-is (see results_summary.py)
+SUMMARY_FILE = os.environ.get("SUMMARY_FILE", "/output/summary.json")
+# Written last: ties results.json and the artifacts built from it together
+MANIFEST_FILE = os.environ.get("MANIFEST_FILE", "/output/manifest.json")
+
+
+def write_bytes_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def publish_artifacts(output_file, data, results):
+    """
+    Write results.json (`data`), then the summary and gzip copies of both,
+    each through a temp file and rename, then the manifest. The manifest
+    records the version (hash of results.json), the identity of the
+    results.json it describes and the hash of every artifact, so a reader
+    can tell a complete, matching set from one still being replaced.
+    """
+    version = hashlib.sha256(data).hexdigest()[:16]
+    write_bytes_atomic(output_file, data)
+    st = os.stat(output_file)
+
+    summary = json.dumps(build_processed(results, output_file, version)).encode()
+    artifacts = {
+        SUMMARY_FILE: summary,
+        SUMMARY_FILE + ".gz": gzip.compress(summary, mtime=0),
+        output_file + ".gz": gzip.compress(data, compresslevel=6, mtime=0),
+    }
+    manifest = {
+        "version": version,
+        "generated_at": time.time(),
+        "node": NODE_NAME,
+        "role": NODE_ROLE,
+        "results": {
+            "name": os.path.basename(output_file),
+            "inode": st.st_ino,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+        },
+        "artifacts": {},
+    }
+    try:
+        for path, body in artifacts.items():
+            write_bytes_atomic(path, body)
+            manifest["artifacts"][os.path.basename(path)] = {
+                "bytes": len(body),
+                "sha256": hashlib.sha256(body).hexdigest(),
+            }
+        write_json_atomic(MANIFEST_FILE, manifest)
+    except OSError as e:
+        print(f"Could not publish result artifacts: {e}")
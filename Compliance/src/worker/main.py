@@ -1,11 +1,24 @@
 import os
 import re
+import shlex
+import sys
 import yaml
 import json
 import subprocess
 import shutil
 import pwd
 import grp
+import time
+
+# scan_output.py and results_summary.py sit next to main.py in the image and
+# one directory up in the repository; this image scans worker nodes
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("NODE_ROLE", "worker")
+
+from scan_output import (
+    CHECK_IDS, ScanProgress, load_durations, load_groups, load_results, merge_results,
+    publish_artifacts, publish_node_results, scan_plan,
+)
 
 
 # ==============================
@@ -277,34 +290,259 @@ def evaluate_test(audit_output, tests_def):
 
 
 # ==============================
-# Main CIS processing logic
+# Kubelet configuration
 # ==============================
 
-def process_cis_yaml(yaml_path):
-    """Parse CIS controls YAML and evaluate all checks."""
-    with open(yaml_path, "r") as f:
-        data = yaml.safe_load(f)
+# Binaries whose checks are answered from their flags and config file, and
+# the kube-bench variables the audit commands name them by
+FLAG_CONFIG_BINARIES = ("kubelet", "kube-proxy")
+AUDIT_BINARY_VARS = {"$kubeletbin": "kubelet", "$proxybin": "kube-proxy"}
+PS_AUDIT_RE = re.compile(r"\bps\s+-fC\s+(\S+)")
+
 
-    if not data:
-        raise ValueError("YAML file is empty or invalid")
+def audited_binary(audit):
+    """Binary a `ps -fC <binary>` audit command looks at, or None."""
+    match = PS_AUDIT_RE.search(audit or "")
+    if not match:
+        return None
+    name = match.group(1).strip("'\"")
+    return AUDIT_BINARY_VARS.get(name, name)
 
-    if "controls" in data and isinstance(data["controls"], dict) and data["controls"]:
-        control = data["controls"]
+
+class KubeletConfig:
+    """
+    Merged view of a component's command-line flags and config file, built
+    once per scan. Kubelet (and kube-proxy) checks declare both an `audit`
+    command (ps -fC <binary>) and an `audit_config` command (cat of the
+    config file); each test item names a `flag` and a JSONPath-like `path`
+    into the config. As in the kubelet itself, a flag given on the command
+    line takes precedence over the config file.
+    """
+
+    def __init__(self):
+        self._outputs = {}
+        self._flags = {}
+        self._configs = {}
+
+    def output(self, command):
+        """Output of an audit command, run at most once per scan."""
+        if command not in self._outputs:
+            self._outputs[command] = safe_run_command(command)
+        return self._outputs[command]
+
+    def flags(self, audit_cmd):
+        """Command-line flags of the audited process, e.g. {'--anonymous-auth': 'false'}."""
+        if audit_cmd in self._flags:
+            return self._flags[audit_cmd]
+        binary = audited_binary(audit_cmd) or "kubelet"
+        command = audit_cmd
+        for var, name in AUDIT_BINARY_VARS.items():
+            command = command.replace(var, name)
+        flags = {}
+        for line in self.output(command).splitlines():
+            try:
+                tokens = shlex.split(line)
+            except ValueError:
+                tokens = line.split()
+            start = next((i for i, t in enumerate(tokens) if os.path.basename(t) == binary), None)
+            if start is None:
+                continue
+            args = tokens[start + 1:]
+            i = 0
+            while i < len(args):
+                arg = args[i]
+                if arg.startswith("--"):
+                    if "=" in arg:
+                        key, value = arg.split("=", 1)
+                    elif i + 1 < len(args) and not args[i + 1].startswith("-"):
+                        key, value = arg, args[i + 1]
+                        i += 1
+                    else:
+                        key, value = arg, "true"
+                    flags[key] = value
+                i += 1
+            break
+        self._flags[audit_cmd] = flags
+        return flags
+
+    def config(self, audit_config, flags):
+        """
+        Parsed config file. The file named by --config wins over the one in
+        audit_config; `cat <file>` is read directly instead of forked.
+        """
+        path = flags.get("--config")
+        if not path:
+            parts = (audit_config or "").split()
+            if len(parts) == 2 and os.path.basename(parts[0]) == "cat":
+                path = parts[1]
+        key = path or audit_config
+        if key in self._configs:
+            return self._configs[key]
+        try:
+            if path:
+                with open(path, "r") as f:
+                    text = f.read()
+            else:
+                text = self.output(audit_config)
+            config = yaml.safe_load(text)
+        except Exception:
+            config = None
+        self._configs[key] = config if isinstance(config, dict) else {}
+        return self._configs[key]
+
+    def resolve(self, check, test):
+        """(source, value) of one test item; source is 'flag', 'config' or None."""
+        flags = self.flags(check.get("audit"))
+        flag = test.get("flag") or ""
+        if flag.startswith("--"):
+            if flag in flags:
+                return "flag", flags[flag]
+        elif flag:
+            # Feature gates: --feature-gates=RotateKubeletServerCertificate=true,...
+            gates = dict(
+                g.split("=", 1) for g in flags.get("--feature-gates", "").split(",") if "=" in g
+            )
+            if flag in gates:
+                return "flag", gates[flag]
+        if test.get("path") and check.get("audit_config"):
+            found, value = config_lookup(self.config(check["audit_config"], flags), test["path"])
+            if found:
+                return "config", value
+        return None, None
+
+
+def config_lookup(config, path):
+    """
+    Look up a kube-bench style path such as '{.authentication.anonymous.enabled}'
+    or '{range .tlsCipherSuites[:]}{}{','}{end}' (a list joined with commas).
+    """
+    match = re.match(r"\{(range\s+)?\.([\w.]+)(\[:\])?\}", path.strip())
+    if not match:
+        return False, None
+    value = config
+    for part in match.group(2).split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    if isinstance(value, list):
+        value = ",".join(str(v) for v in value)
+    return True, value
+
+
+def config_text(value):
+    """YAML values as the kubelet flags would spell them (true, not True)."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def compare_value(op, actual, expected):
+    """(status, reason) for a resolved value and one compare op."""
+    actual_text, expected_text = config_text(actual), config_text(expected)
+    if op == "eq":
+        ok = actual_text.lower() == expected_text.lower()
+        return ("PASS" if ok else "FAIL"), f"{actual_text} {'==' if ok else '!='} {expected_text}"
+    if op == "noteq":
+        ok = actual_text.lower() != expected_text.lower()
+        return ("PASS" if ok else "FAIL"), f"{actual_text} {'!=' if ok else '=='} {expected_text}"
+    if op == "has":
+        ok = expected_text in actual_text
+        return ("PASS" if ok else "FAIL"), f"{actual_text} {'contains' if ok else 'does not contain'} {expected_text}"
+    if op in ("nothave", "not_have"):
+        ok = expected_text not in actual_text
+        return ("PASS" if ok else "FAIL"), f"{actual_text} {'does not contain' if ok else 'contains'} {expected_text}"
+    if op in ("gte", "gt", "lte", "lt"):
+        try:
+            a, e = float(actual_text), float(expected_text)
+        except ValueError:
+            return "WARN", f"Cannot compare {actual_text} with {expected_text} numerically"
+        ok = {"gte": a >= e, "gt": a > e, "lte": a <= e, "lt": a < e}[op]
+        return ("PASS" if ok else "FAIL"), f"{actual_text} {op} {expected_text} is {str(ok).lower()}"
+    if op == "valid_elements":
+        allowed = {s.strip() for s in expected_text.split(",") if s.strip()}
+        invalid = [s.strip() for s in actual_text.split(",") if s.strip() and s.strip() not in allowed]
+        if invalid:
+            return "FAIL", f"Found disallowed values: {', '.join(invalid)}"
+        return "PASS", "All configured values are in the allowed list"
+    return "WARN", f"Unknown compare op {op}"
+
+
+def evaluate_kubelet_check(kubelet, check):
+    """Evaluate a kubelet or kube-proxy check against the merged flags and config file."""
+    tests_def = check.get("tests") or {}
+    test_items = tests_def.get("test_items", []) or []
+    bin_op = (tests_def.get("bin_op") or "and").lower()
+
+    results = []
+    resolved = []
+    for test in test_items:
+        name = test.get("flag") or test.get("path")
+        source, value = kubelet.resolve(check, test)
+        if source:
+            resolved.append(f"{name}={config_text(value)} ({source})")
+        compare = test.get("compare") or {}
+        # `set` is only a precondition on presence; a compare still applies
+        should_exist = bool(test["set"]) if "set" in test else None
+        if should_exist is not None and should_exist != (source is not None):
+            results.append(("FAIL", f"{name} {'missing' if should_exist else 'should not be set'}"))
+        elif should_exist is False:
+            results.append(("PASS", f"{name} unset as expected"))
+        elif compare.get("op"):
+            if source is None:
+                results.append(("FAIL", f"{name} is not set"))
+            else:
+                status, reason = compare_value(str(compare["op"]).lower(), value, compare.get("value"))
+                results.append((status, f"{name}: {reason}"))
+        elif should_exist:
+            results.append(("PASS", f"{name} set as expected"))
+        elif source is not None:
+            results.append(("PASS", f"Found {name}"))
+        else:
+            results.append(("FAIL", f"Did not find {name}"))
+
+    statuses = [r[0] for r in results if r[0] != "WARN"]
+    reason = "; ".join(r[1] for r in results)
+    if not statuses:
+        status = "WARN"
+    elif bin_op == "or":
+        status = "PASS" if "PASS" in statuses else "FAIL"
     else:
-        control = {
-            "version": data.get("version"),
-            "id": data.get("id"),
-            "text": data.get("text"),
-            "type": data.get("type"),
-            "groups": data.get("groups", [])
-        }
-
-    groups = control.get("groups", [])
+        status = "PASS" if all(s == "PASS" for s in statuses) else "FAIL"
+    return status, reason or "No valid test conditions", "\n".join(resolved)
+
+
+def is_kubelet_check(check):
+    """True for checks of the kubelet's or kube-proxy's flags and config, answered by KubeletConfig."""
+    return audited_binary(check.get("audit")) in FLAG_CONFIG_BINARIES
+
+
+# ==============================
+# Main CIS processing logic
+# ==============================
+
+def process_cis_yaml(yaml_path, only=None, kubelet=None, progress=None):
+    """
+    Parse CIS controls YAML and evaluate all checks (or only the IDs in `only`).
+    Kubelet checks are answered from `kubelet`, a KubeletConfig shared by the scan.
+    Each finished check is reported to `progress`, a ScanProgress, if given.
+    """
+    kubelet = kubelet or KubeletConfig()
+    groups = load_groups(yaml_path)
     results = []
 
+    def record(result):
+        results.append(result)
+        if progress is not None:
+            progress.check_done(yaml_path, result, time.monotonic() - started)
+
     for group in groups:
         for check in group.get("checks", []):
             check_id = check.get("id")
+            if only is not None and str(check_id) not in only:
+                continue
+            started = time.monotonic()
+            if progress is not None:
+                progress.check_started(yaml_path, group, check_id)
             description = check.get("text")
             audit_cmd = check.get("audit")
             check_type = check.get("type")
@@ -313,7 +551,7 @@ def process_cis_yaml(yaml_path):
             use_multiple = check.get("use_multiple_values", False)
 
             if check_type == "manual":
-                results.append({
+                record({
                     "check_id": check_id,
                     "description": description,
                     "status": "WARN",
@@ -322,6 +560,23 @@ def process_cis_yaml(yaml_path):
                 })
                 continue
 
+            if is_kubelet_check(check) and not use_multiple:
+                try:
+                    status, reason, resolved = evaluate_kubelet_check(kubelet, check)
+                except Exception as e:
+                    status, reason, resolved = "ERROR", f"Exception during evaluation: {e}", ""
+                record({
+                    "check_id": check_id,
+                    "description": description,
+                    "status": status,
+                    "reason": reason,
+                    "audit_command": audit_cmd,
+                    "audit_config": check.get("audit_config"),
+                    "audit_output": resolved,
+                    "remediation": remediation
+                })
+                continue
+
             audit_output = safe_run_command(audit_cmd)
 
             if use_multiple:
@@ -352,7 +607,7 @@ def process_cis_yaml(yaml_path):
                     else:
                         status, reason = "WARN", "No definitive PASS or FAIL"
 
-                results.append({
+                record({
                     "check_id": check_id,
                     "description": description,
                     "status": status,
@@ -369,7 +624,7 @@ def process_cis_yaml(yaml_path):
                 except Exception as e:
                     status, reason = "ERROR", f"Exception during evaluation: {e}"
 
-                results.append({
+                record({
                     "check_id": check_id,
                     "description": description,
                     "status": status,
@@ -400,12 +655,18 @@ def main():
         print(f"Source '{MAIN_SOURCE}' not found (expected directory or file).")
         return
 
+    # Re-checks run a handful of checks and leave the last scan's progress alone
+    progress = None if CHECK_IDS else ScanProgress(scan_plan(yamls_to_process), load_durations())
+
     all_results = []
+    kubelet = KubeletConfig()
     for yaml_path in yamls_to_process:
         try:
-            res = process_cis_yaml(yaml_path)
+            res = process_cis_yaml(yaml_path, only=CHECK_IDS or None, kubelet=kubelet, progress=progress)
             for r in res:
                 r["_source_file"] = yaml_path
+                if CHECK_IDS:
+                    r["rechecked_at"] = time.time()
             all_results.extend(res)
         except Exception as e:
             all_results.append({
@@ -420,9 +681,22 @@ def main():
     os.makedirs("/output", exist_ok=True)
     output_file = "/output/results.json"
 
-    with open(output_file, "w") as f:
-        json.dump(all_results, f, indent=4)
-        f.write("\n")
+    if CHECK_IDS:
+        existing = load_results(output_file)
+        if not existing:
+            # Nothing to merge into: writing only the re-run checks would
+            # replace a full result set with a handful of results
+            print(f"No results in {output_file} to merge re-checked checks into; run a full scan first")
+            return
+        print(f"Re-checked {len(all_results)} of {len(CHECK_IDS)} requested checks")
+        all_results = merge_results(existing, all_results, CHECK_IDS)
+
+    # Written to a temp file and renamed, so readers never see a partial file
+    publish_artifacts(output_file, (json.dumps(all_results, indent=4) + "\n").encode(), all_results)
+    if progress is not None:
+        progress.finish()
+
+    publish_node_results(all_results)
 
     print(json.dumps(all_results, indent=4) + "\n")
 
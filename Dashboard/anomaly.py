@@ -0,0 +1,216 @@
+"""
+Streaming rate-anomaly detection for runtime events.
+
+The severity buckets in events.py are static keyword lists: a normal `clone`
+and a fork bomb are both "high". RateDetector is an ingest consumer that
+keeps, per binary, per pod and per call, the event count of the current
+time bucket and an EWMA baseline (mean and variance) of past bucket rates.
+A key whose current rate exceeds its baseline by ANOMALY_THRESHOLD standard
+deviations (and ANOMALY_MIN_RATE), or exceeds ANOMALY_ABSOLUTE_RATE even
+without a baseline, produces one synthetic high-priority anomaly alert;
+further excess in the next ANOMALY_COOLDOWN seconds updates that alert
+instead of adding new ones.
+
+Every update is O(1): buckets that passed without events are folded into
+the baseline in closed form. Each dimension tracks at most ANOMALY_MAX_KEYS
+keys in LRU order, and keys idle for ANOMALY_IDLE seconds are dropped.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from events import classify_event, event_count, event_timestamp
+
+ANOMALY_ENABLED = os.environ.get('ANOMALY_ENABLED', '1') == '1'
+ANOMALY_BUCKET = float(os.environ.get('ANOMALY_BUCKET', '10'))
+# EWMA weight of each closed bucket in the baseline
+ANOMALY_ALPHA = float(os.environ.get('ANOMALY_ALPHA', '0.1'))
+ANOMALY_THRESHOLD = float(os.environ.get('ANOMALY_THRESHOLD', '6'))
+# Rates (events/s) below this are never anomalous
+ANOMALY_MIN_RATE = float(os.environ.get('ANOMALY_MIN_RATE', '20'))
+# Rates above this are anomalous even for keys without a baseline yet
+ANOMALY_ABSOLUTE_RATE = float(os.environ.get('ANOMALY_ABSOLUTE_RATE', '500'))
+# Closed buckets needed before the baseline is trusted
+ANOMALY_WARMUP = int(os.environ.get('ANOMALY_WARMUP', '6'))
+ANOMALY_COOLDOWN = float(os.environ.get('ANOMALY_COOLDOWN', '60'))
+ANOMALY_MAX_KEYS = int(os.environ.get('ANOMALY_MAX_KEYS', '5000'))
+ANOMALY_IDLE = float(os.environ.get('ANOMALY_IDLE', '600'))
+ANOMALY_HISTORY = int(os.environ.get('ANOMALY_HISTORY', '200'))
+
+DIMENSIONS = ('binary', 'pod', 'call')
+
+
+def iso_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class KeyRate:
+    """Rate state of one key: the open bucket and the EWMA baseline of closed ones."""
+    __slots__ = ('bucket', 'count', 'mean', 'var', 'samples', 'last_seen', 'limit', 'alert')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.count = 0.0
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+        self.last_seen = 0.0
+        self.limit = None
+        self.alert = None
+
+
+class RateDetector:
+    def __init__(self, bucket=ANOMALY_BUCKET, alpha=ANOMALY_ALPHA, threshold=ANOMALY_THRESHOLD,
+                 min_rate=ANOMALY_MIN_RATE, absolute_rate=ANOMALY_ABSOLUTE_RATE, warmup=ANOMALY_WARMUP,
+                 cooldown=ANOMALY_COOLDOWN, max_keys=ANOMALY_MAX_KEYS, idle=ANOMALY_IDLE,
+                 history=ANOMALY_HISTORY):
+        self.bucket = bucket
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_rate = min_rate
+        self.absolute_rate = absolute_rate
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self.max_keys = max_keys
+        self.idle = idle
+        self.lock = threading.Lock()
+        self.keys = {dim: OrderedDict() for dim in DIMENSIONS}
+        self.anomalies = deque(maxlen=history)
+        self.stats = {'events': 0, 'anomalies': 0, 'evicted': 0}
+
+    def __call__(self, alert):
+        ts = event_timestamp(alert)
+        if ts is None:
+            return
+        event_type, binary = classify_event(alert)
+        body = next((v for k, v in alert.items() if k.startswith('process_') and isinstance(v, dict)), {})
+        pod = (body.get('process') or {}).get('pod') or {}
+        pod_name = f"{pod.get('namespace', '')}/{pod.get('name', '')}" if pod.get('name') else None
+        weight = event_count(alert)
+        with self.lock:
+            self.stats['events'] += weight
+            for dim, key in (('binary', binary), ('pod', pod_name), ('call', event_type)):
+                if key and key != 'unknown':
+                    self._observe(dim, key, ts, weight, alert)
+
+    def _observe(self, dim, key, ts, weight, alert):
+        keys = self.keys[dim]
+        state = keys.get(key)
+        if state is None:
+            state = keys[key] = KeyRate(ts - ts % self.bucket)
+            self._evict(keys, ts)
+        else:
+            keys.move_to_end(key)
+        if ts >= state.bucket + self.bucket:
+            self._roll(state, ts)
+        state.count += weight
+        state.last_seen = max(state.last_seen, ts)
+        if state.limit is None:
+            state.limit = self._limit(state)
+        if state.count > state.limit:
+            self._flag(dim, key, state, ts, alert)
+
+    def _roll(self, state, ts):
+        """Close the open bucket (and any empty ones since) into the baseline."""
+        a = self.alpha
+        rate = state.count / self.bucket
+        if state.samples >= self.warmup:
+            # Do not let an attack become the new normal
+            rate = min(rate, state.mean + self.threshold * math.sqrt(state.var) + self.min_rate)
+        diff = rate - state.mean
+        state.mean += a * diff
+        state.var = (1 - a) * (state.var + a * diff * diff)
+        state.samples += 1
+        start = ts - ts % self.bucket
+        empty = int((start - state.bucket) / self.bucket) - 1
+        if empty > 0:
+            # k zero-rate updates in closed form
+            decay = (1 - a) ** empty
+            state.var = decay * (state.var + state.mean * state.mean * (1 - decay))
+            state.mean *= decay
+            state.samples += empty
+        state.bucket = start
+        state.count = 0.0
+        state.limit = None
+
+    def _limit(self, state):
+        """Events allowed in the open bucket before the key counts as anomalous."""
+        absolute = self.absolute_rate * self.bucket
+        if state.samples < self.warmup:
+            return absolute
+        expected = state.mean + self.threshold * math.sqrt(state.var)
+        return min(absolute, max(self.min_rate, expected) * self.bucket)
+
+    def _flag(self, dim, key, state, ts, alert):
+        rate = state.count / self.bucket
+        ongoing = state.alert
+        if ongoing is not None and ts - ongoing['anomaly']['last_time'] <= self.cooldown:
+            info = ongoing['anomaly']
+            info['last_time'] = ts
+            info['peak_rate'] = max(info['peak_rate'], round(rate, 1))
+            info['excess_events'] = info.get('excess_events', 0) + 1
+            info['severity'] = self._severity(info['peak_rate'], info['baseline_rate'])
+            return
+        baseline = round(state.mean, 2) if state.samples >= self.warmup else None
+        severity = self._severity(rate, baseline)
+        synthetic = {
+            'anomaly': {
+                'dimension': dim,
+                'key': key,
+                'rate': round(rate, 1),
+                'peak_rate': round(rate, 1),
+                'baseline_rate': baseline,
+                'baseline_stddev': round(math.sqrt(state.var), 2) if baseline is not None else None,
+                'window_seconds': self.bucket,
+                'severity': severity,
+                'first_time': ts,
+                'last_time': ts,
+                'sample_event': classify_event(alert)[0],
+            },
+            'time': iso_time(ts),
+            'node_name': alert.get('node_name', ''),
+        }
+        state.alert = synthetic
+        self.anomalies.append(synthetic)
+        self.stats['anomalies'] += 1
+
+    def _severity(self, rate, baseline):
+        if rate >= self.absolute_rate or (baseline is not None and rate >= 10 * max(baseline, 1)):
+            return 'critical'
+        return 'high'
+
+    def _evict(self, keys, now):
+        """Drop least recently updated keys that are idle, or over capacity."""
+        while keys:
+            oldest_key, oldest = next(iter(keys.items()))
+            if len(keys) > self.max_keys or (oldest.last_seen and now - oldest.last_seen > self.idle):
+                del keys[oldest_key]
+                self.stats['evicted'] += 1
+            else:
+                break
+
+    def recent(self, limit=50, dimension=None):
+        with self.lock:
+            items = [a for a in reversed(self.anomalies)
+                     if dimension is None or a['anomaly']['dimension'] == dimension]
+            return [dict(a, anomaly=dict(a['anomaly'])) for a in items[:limit]]
+
+    def baselines(self, dimension, limit=20):
+        """Keys with the highest baseline rates, for inspection."""
+        with self.lock:
+            rows = [(k, s) for k, s in self.keys[dimension].items() if s.samples]
+            rows.sort(key=lambda kv: kv[1].mean, reverse=True)
+            return [{'key': k, 'baseline_rate': round(s.mean, 3), 'stddev': round(math.sqrt(s.var), 3),
+                     'samples': s.samples, 'current_count': s.count} for k, s in rows[:limit]]
+
+    def snapshot(self):
+        baselines = {dim: self.baselines(dim, 10) for dim in DIMENSIONS}
+        with self.lock:
+            return {
+                'anomalies': [dict(a, anomaly=dict(a['anomaly'])) for a in self.anomalies],
+                'stats': dict(self.stats),
+                'tracked_keys': {dim: len(keys) for dim, keys in self.keys.items()},
+                'baselines': baselines,
+            }
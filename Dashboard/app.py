@@ -1,14 +1,45 @@
-from flask import Flask, render_template, jsonify, send_from_directory
+from flask import Flask, render_template, jsonify, send_from_directory, request, g
 import os, json
-from collections import defaultdict, Counter
-import subprocess
+import copy
+import hashlib
+import hmac
+from collections import Counter
+import sys
+import threading
 import time
 
+import segments
+from events import parse_time
+from ingest import RuntimeIngester
+from rollups import Rollups, DIMENSIONS
+from sketches import HeavyHitters
+from lineage import ProcessTree
+from event_store import EventStore, read_payloads
+from facets import FacetIndex, FACETS, query_from_params, format_query, match_row, count_rows
+from anomaly import RateDetector, ANOMALY_ENABLED
+from kube import make_client, load_manifest, recreate_job, JobWatcher, job_status, job_pending, job_age
+from recheck import RecheckTrigger, RECHECK_ENABLED, RECHECK_CALLS
+from shedding import LoadShedder, SHED_ENABLED
+from policy_cost import PolicyProfiler, POLICY_PROFILE_ENABLED
+from shared import SharedState, SHARED_STATE_DIR
+from compliance_store import NodeResultsStore, NODE_RESULTS_DIR, results_list
+from history import ScanHistory, ScanRecorder, HISTORY_DB_PATH, DEFAULT_SOURCE
+from check_index import CheckIndex
+from scan_progress import ScanProgress
+from artifacts import PublishedArtifacts
+# results_summary.py is shared with the compliance engine: copied next to this
+# file in the image, under Compliance/src in the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Compliance', 'src'))
+from results_summary import build_processed as summarize_results, normalize_status
+import metrics
+
 
 app = Flask(__name__)
 JSON_PATH = os.environ.get('RESULT_JSON_PATH', '/output/results.json')
 RESULTS_PATH = "/output/results.json"
-RUNTIME_LOGS_PATH = "/output/runtime_alerts.json"
+RUNTIME_LOGS_PATH = os.environ.get('RUNTIME_LOGS_PATH', '/output/runtime_alerts.json')
+# Segmented runtime log written by collector.py (falls back to RUNTIME_LOGS_PATH)
+RUNTIME_LOG_DIR = os.environ.get('RUNTIME_LOG_DIR', '/output/runtime_log')
 JOB_NAME = "cis-k8s-audit"
 NAMESPACE = "default"
 
@@ -28,6 +59,31 @@ INCLUDED_EVENT_TYPES = os.environ.get('INCLUDED_EVENT_TYPES',
 # For tracepoints: 'syscalls', 'raw_syscalls', etc.
 INCLUDED_SUBSYSTEMS = os.environ.get('INCLUDED_SUBSYSTEMS', '').split(',') if os.environ.get('INCLUDED_SUBSYSTEMS') else []
 
+# State shared between worker processes (set by gunicorn.conf.py). Unset means
+# a single process that keeps everything in memory.
+shared_state = SharedState(SHARED_STATE_DIR) if SHARED_STATE_DIR else None
+
+# Metrics served on /metrics; every worker publishes its own and they are merged
+# (exited workers' counters are kept, see metrics.fold_exited)
+COLLECTOR_STATS_PATH = os.environ.get('COLLECTOR_STATS_PATH', '/output/collector_stats.json')
+registry = metrics.Registry()
+REQUEST_SECONDS = registry.histogram(
+    'dashboard_request_duration_seconds', 'Request latency by route', ('route', 'method', 'status'))
+RESULTS_PARSE_SECONDS = registry.histogram(
+    'dashboard_results_parse_seconds', 'Time to read and parse results.json')
+BUILD_PROCESSED_SECONDS = registry.histogram(
+    'dashboard_build_processed_seconds', 'Time spent in build_processed')
+RUNTIME_READ_SECONDS = registry.histogram(
+    'dashboard_runtime_log_read_seconds', 'Time to read and parse the runtime log per request', ('operation',))
+ALERT_FILTER = registry.counter(
+    'dashboard_alert_filter_total', 'should_include_alert decisions', ('result',))
+ALERT_BUFFER = registry.gauge(
+    'dashboard_alert_buffer_size', 'Alerts held in memory by the last /api/runtime/alerts request')
+CACHE_REQUESTS = registry.counter(
+    'dashboard_cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result'))
+if shared_state is not None:
+    shared_state.register_local('metrics', registry.snapshot)
+
 # Compliance job YAML template
 COMPLIANCE_JOB_YAML = """
 apiVersion: batch/v1
@@ -52,6 +108,19 @@ spec:
         - name: check
           image: mohanvamsi06/fyp:master_node 
           imagePullPolicy: Always
+          env:
+            - name: NODE_NAME
+              valueFrom:
+                fieldRef:
+                  fieldPath: spec.nodeName
+            - name: DASHBOARD_URL
+              value: "http://k8s-security-dashboard.default.svc:5000"
+            - name: NODE_UPLOAD_TOKEN
+              valueFrom:
+                secretKeyRef:
+                  name: cis-node-upload
+                  key: token
+                  optional: true
           volumeMounts:
             - name: kubernetes
               mountPath: /etc/kubernetes
@@ -80,152 +149,258 @@ spec:
             type: DirectoryOrCreate
 """
 
-def run_cmd(cmd):
-    return subprocess.run(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        check=False
-    )
-
-def load_raw():
+@RESULTS_PARSE_SECONDS.time()
+def read_raw():
     try:
         with open(JSON_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            for k in ('findings', 'results', 'checks'):
-                if k in data and isinstance(data[k], list):
-                    return data[k]
-            for v in data.values() if isinstance(data, dict) else []:
-                if isinstance(v, list):
-                    return v
-            return []
+            return results_list(json.load(f))
     except Exception as e:
         return {"error": f"Could not load JSON: {e}"}
 
-def normalize_status(s):
-    if not s: return 'UNKNOWN'
-    s_up = str(s).strip().upper()
-    if s_up in ('PASS', 'PASSED', 'SUCCESS'):
-        return 'PASS'
-    if s_up in ('FAIL', 'FAILED', 'ERROR'):
-        return 'FAIL'
-    if s_up in ('WARN', 'WARNING'):
-        return 'WARN'
-    return 'UNKNOWN'
+# Parsed results.json, keyed by the file's (inode, mtime, size). The file only
+# changes when a scan completes, so everything derived from it is memoized here.
+_results_lock = threading.Lock()
+_results_cache = {'identity': None}
 
-def build_processed(raw_list):
-    totals = {'total': 0, 'by_status': Counter()}
-    per_file = defaultdict(lambda: Counter())
-    top_failed = []
-    checks_by_id = {}
+def results_identity():
+    try:
+        st = os.stat(JSON_PATH)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
 
-    for item in raw_list:
-        if not isinstance(item, dict):
-            continue
-        totals['total'] += 1
-        status = normalize_status(item.get('status'))
-        totals['by_status'][status] += 1
-
-        src = item.get('_source_file') or item.get('source') or 'unknown'
-        per_file[src][status] += 1
-
-        canonical = {
-            'check_id': item.get('check_id'),
-            'description': item.get('description'),
-            'status': status,
-            'reason': item.get('reason'),
-            'remediation': item.get('remediation'),
-            '_source_file': src,
-        }
-        if 'line_results' in item and isinstance(item['line_results'], list):
-            canonical['line_results'] = item['line_results'][:8]
+def cached_results():
+    """Return the cache entry for the current results file, re-reading it only if it changed."""
+    identity = results_identity()
+    with _results_lock:
+        entry = _results_cache
+        if identity is not None and entry['identity'] == identity:
+            CACHE_REQUESTS.inc(cache='results', result='hit')
+            return entry
+    CACHE_REQUESTS.inc(cache='results', result='miss')
+    # stat before read: if the file changes mid-read the next request sees a new identity
+    raw = read_raw()
+    entry = {'identity': identity, 'raw': raw, 'processed': None, 'index': None, 'bodies': {}}
+    if identity is not None and not (isinstance(raw, dict) and raw.get('error')):
+        with _results_lock:
+            _results_cache.clear()
+            _results_cache.update(entry)
+            entry = _results_cache
+    return entry
 
-        if status == 'FAIL':
-            top_failed.append(canonical)
+def results_etag(entry, kind):
+    """Strong ETag for one representation of the results file."""
+    ino, mtime_ns, size = entry['identity']
+    return f"{ino:x}-{mtime_ns:x}-{size:x}-{kind}"
 
-        cid = item.get('check_id')
-        if cid:
-            checks_by_id[cid] = canonical
+def cached_json_response(entry, kind, build):
+    """
+    Serve a JSON body derived from the results file with a strong ETag.
+    If-None-Match is answered with 304 before anything is built or encoded.
+    """
+    etag = results_etag(entry, kind)
+    if request.if_none_match.contains(etag):
+        CACHE_REQUESTS.inc(cache='etag', result='hit')
+        response = app.response_class(status=304)
+    else:
+        CACHE_REQUESTS.inc(cache='etag', result='miss')
+        body = entry['bodies'].get(kind)
+        CACHE_REQUESTS.inc(cache='body', result='miss' if body is None else 'hit')
+        if body is None and shared_state is not None:
+            # Another worker may already have encoded this version
+            body = shared_state.get_blob(f"{kind}-{etag}")
+            CACHE_REQUESTS.inc(cache='shared_body', result='miss' if body is None else 'hit')
+        if body is None:
+            body = app.json.dumps(build()).encode('utf-8')
+            if shared_state is not None:
+                shared_state.put_blob(f"{kind}-{etag}", body, prefix=f"{kind}-")
+        entry['bodies'][kind] = body
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# summary.json and gzip copies the compliance engine writes with results.json
+published = PublishedArtifacts()
+
+def published_response(name, kind):
+    """
+    Serve a pre-built artifact of the current results.json (gzipped if the
+    client accepts it) without parsing anything, or None if there is none.
+    """
+    identity = results_identity()
+    if identity is None:
+        return None
+    gzipped = 'gzip' in request.accept_encodings
+    body = published.body(name + '.gz', identity) if gzipped else None
+    if body is None:
+        gzipped = False
+        body = published.body(name, identity)
+    CACHE_REQUESTS.inc(cache='published', result='miss' if body is None else 'hit')
+    if body is None:
+        return None
+    etag = results_etag({'identity': identity}, f"{kind}-published{'-gz' if gzipped else ''}")
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
 
-    # robust sort: coerce check_id to string so comparisons are consistent
-    top_failed.sort(key=lambda x: (0 if 'line_results' in x else 1, str(x.get('check_id') or '')))
+@BUILD_PROCESSED_SECONDS.time()
+def build_processed(raw_list):
+    # Same code the compliance engine publishes summary.json with
+    return summarize_results(raw_list, JSON_PATH)
 
-    top_failed = top_failed[:20]
+# Every completed scan is kept in the history database (see history.py),
+# written only by the leader's recorder
+scan_history = ScanHistory(HISTORY_DB_PATH, normalize_status)
 
-    per_file_out = {}
-    for src, counter in per_file.items():
-        per_file_out[src] = dict(counter)
+def current_results():
+    entry = cached_results()
+    return entry['identity'], entry['raw'] if isinstance(entry['raw'], list) else None
 
-    processed = {
-        'summary': {
-            'total_checks': totals['total'],
-            'counts': dict(totals['by_status']),
-        },
-        'per_file': per_file_out,
-        'top_failed': top_failed,
-        'counts_by_status': dict(totals['by_status']),
-        'meta': {'source_path': JSON_PATH}
-    }
-    return processed
+scan_recorder = ScanRecorder(scan_history, current_results, lambda: node_results.refresh(),
+                             reload_nodes=lambda: node_results.reload())
+
+# Kubernetes access: pooled API-server connections (or kubectl, see kube.py)
+# and an in-memory watch of the compliance Job
+COMPLIANCE_JOB = load_manifest(COMPLIANCE_JOB_YAML)
+kube_client = make_client()
+job_watcher = JobWatcher(kube_client, NAMESPACE, JOB_NAME)
+# Only the leader watches the Job; the other workers read the status it publishes
+if shared_state is not None:
+    shared_state.register('scan_job', job_watcher.snapshot, lambda: job_watcher.snapshot()['status'])
+
+def scan_job_status():
+    """Status of the compliance Job, looked up directly while no watch has listed it."""
+    status = shared_view('scan_job', job_watcher.snapshot)['status']
+    return job_status(kube_client.get_job(NAMESPACE, JOB_NAME)) if status is None else status
+# Live progress and partial results the compliance engine writes while it runs
+scan_progress = ScanProgress()
 
 @app.route("/api/scan/start", methods=["POST"])
 def start_scan():
-    # 1. Delete old results
+    # 1. Delete old results (recorded in the history first, if the recorder
+    # has not seen them yet). Any worker may serve this: a run is stored
+    # once per results file, so a leader that records it too adds nothing
+    scan_recorder.record_results()
     try:
         if os.path.exists(RESULTS_PATH):
             os.remove(RESULTS_PATH)
+        scan_progress.clear()
     except Exception as e:
         return jsonify({"error": f"Failed to delete results: {e}"}), 500
 
-    # 2. Delete existing job if present
-    run_cmd([
-        "kubectl", "delete", "job", JOB_NAME,
-        "-n", NAMESPACE, "--ignore-not-found=true"
-    ])
-
-    # 3. Apply job YAML via stdin
-    proc = subprocess.run(
-        ["kubectl", "apply", "-f", "-"],
-        input=COMPLIANCE_JOB_YAML,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        check=False
-    )
-    
-    if proc.returncode != 0:
-        return jsonify({"error": proc.stderr}), 500
+    # 2. Delete existing job if present, then create it again
+    try:
+        recreate_job(kube_client, NAMESPACE, COMPLIANCE_JOB)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
     return jsonify({"status": "started"})
 
-@app.route("/api/scan/status")
-def scan_status():
-    res = run_cmd([
-        "kubectl", "get", "job", JOB_NAME,
-        "-n", NAMESPACE,
-        "-o", "json"
-    ])
+# Targeted re-checks: only the checks affected by a runtime event, in a
+# separate Job; the compliance engine merges them into results.json
+RECHECK_JOB_NAME = "cis-k8s-recheck"
 
-    if res.returncode != 0:
-        return jsonify({"status": "not_found"})
+# Seconds a re-check may run before Kubernetes terminates it
+RECHECK_JOB_ACTIVE_DEADLINE = int(os.environ.get('RECHECK_JOB_ACTIVE_DEADLINE', '600'))
 
-    try:
-        job = json.loads(res.stdout)
-        status = job.get("status", {})
+def launch_recheck(node, check_ids):
+    if scan_job_status() == 'running':
+        raise RuntimeError("a full scan is running")
+    if job_status(kube_client.get_job(NAMESPACE, RECHECK_JOB_NAME)) == 'running':
+        raise RuntimeError("a re-check is already running")
+    manifest = copy.deepcopy(COMPLIANCE_JOB)
+    manifest['metadata']['name'] = RECHECK_JOB_NAME
+    manifest['spec']['ttlSecondsAfterFinished'] = 600
+    manifest['spec']['activeDeadlineSeconds'] = RECHECK_JOB_ACTIVE_DEADLINE
+    pod_spec = manifest['spec']['template']['spec']
+    if node:
+        # Pin by node name (the hostname label need not match it); the
+        # scheduler still applies the Job's own nodeSelector and tolerations
+        pod_spec.setdefault('affinity', {})['nodeAffinity'] = {
+            'requiredDuringSchedulingIgnoredDuringExecution': {
+                'nodeSelectorTerms': [{
+                    'matchFields': [{'key': 'metadata.name', 'operator': 'In', 'values': [node]}],
+                }],
+            },
+        }
+    container = pod_spec['containers'][0]
+    container.setdefault('env', []).append({'name': 'CHECK_IDS', 'value': ','.join(check_ids)})
+    recreate_job(kube_client, NAMESPACE, manifest)
+    return RECHECK_JOB_NAME
+
+def recheck_index_source():
+    """results.json and the control-plane node(s) it was scanned on."""
+    entry = cached_results()
+    raw = entry['raw']
+    # The re-check Job keeps the control-plane nodeSelector, so only those
+    # nodes can run it; worker nodes re-scan through their own DaemonSet
+    nodes = set()
+    manifest = published.current(entry['identity'])
+    if manifest and manifest.get('node'):
+        nodes.add(manifest['node'])
+    nodes.update(s['node'] for s in node_results.summaries() if s['role'] == 'control-plane')
+    return entry['identity'], raw if isinstance(raw, list) else [], nodes
 
-        if status.get("failed", 0) > 0:
-            return jsonify({"status": "failed"})
+def recheck_job_state():
+    job = kube_client.get_job(NAMESPACE, RECHECK_JOB_NAME)
+    if job is None:
+        return None
+    return {'pending': job_pending(job), 'age': job_age(job)}
 
-        if status.get("succeeded", 0) > 0:
-            return jsonify({"status": "completed"})
+def cancel_recheck():
+    kube_client.delete_job(NAMESPACE, RECHECK_JOB_NAME)
 
-        return jsonify({"status": "running"})
+recheck_trigger = RecheckTrigger(
+    launch_recheck, recheck_index_source, job_state=recheck_job_state, cancel=cancel_recheck
+) if RECHECK_ENABLED else None
+
+@app.route("/api/scan/status")
+def scan_status():
+    # Served from the watched Job state; no API round-trip per poll
+    try:
+        return jsonify({"status": scan_job_status(), "progress": progress_summary()})
     except Exception as e:
         return jsonify({"status": "error", "error": str(e)})
 
+def progress_summary():
+    record = scan_progress.progress()
+    if record is None:
+        return None
+    keys = ('state', 'checks_done', 'checks_total', 'percent', 'current', 'eta_seconds', 'elapsed_seconds', 'age_seconds')
+    return {k: record.get(k) for k in keys}
+
+@app.route("/api/scan/progress")
+def scan_progress_api():
+    """
+    Progress of the running scan and its results finished after the first
+    `since` ones; poll with `since` set to the previous response's `next`.
+    """
+    since = max(0, request.args.get('since', 0, type=int))
+    results, total = scan_progress.partial(since)
+    if since > total:
+        # The partial results were reset by a new scan
+        results, total = scan_progress.partial(0)
+    progress = scan_progress.progress()
+    # Dashboard statuses (PASS/FAIL/WARN/UNKNOWN) of every result so far
+    counts = Counter()
+    for status, n in ((progress or {}).get('counts') or {}).items():
+        counts[normalize_status(status)] += n
+    return jsonify({
+        "status": scan_job_status(),
+        "progress": progress,
+        "results": results,
+        "next": total,
+        "counts": counts,
+    })
+
 @app.route('/')
 def index():
     return render_template('base.html')
@@ -238,25 +413,214 @@ def compliance():
 def runtime():
     return render_template('runtime.html')
 
+def processed_results(entry):
+    """build_processed() output, memoized alongside the parsed results"""
+    if entry['processed'] is None:
+        CACHE_REQUESTS.inc(cache='processed', result='miss')
+        entry['processed'] = build_processed(entry['raw'])
+    else:
+        CACHE_REQUESTS.inc(cache='processed', result='hit')
+    return entry['processed']
+
+def check_index(entry):
+    """CheckIndex over the results, memoized alongside the parsed results"""
+    CACHE_REQUESTS.inc(cache='check_index', result='miss' if entry['index'] is None else 'hit')
+    if entry['index'] is None:
+        entry['index'] = CheckIndex(entry['raw'], normalize_status, results_etag(entry, 'index'))
+    return entry['index']
+
+def list_arg(name):
+    """Comma-separated and/or repeated query parameter as a list"""
+    return [v for value in request.args.getlist(name) for v in value.split(',') if v]
+
+CHECKS_PAGE_MAX = int(os.environ.get('CHECKS_PAGE_MAX', '500'))
+
+@app.route('/api/checks')
+def api_checks():
+    """
+    Filtered, projected and paginated checks:
+    status, source, group, prefix, q, fields, exclude, lines, limit, cursor
+    """
+    entry = cached_results()
+    raw = entry['raw']
+    if isinstance(raw, dict) and raw.get('error'):
+        return jsonify({'error': raw.get('error')}), 500
+    if entry['identity'] is None:
+        return jsonify({'items': [], 'total': 0, 'counts': {}, 'next_cursor': None})
+    etag = results_etag(entry, 'checks-' + hashlib.sha1(request.query_string).hexdigest()[:16])
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        try:
+            result = check_index(entry).query(
+                statuses=list_arg('status'), sources=list_arg('source'), groups=list_arg('group'),
+                prefix=request.args.get('prefix'), text=request.args.get('q'),
+                fields=list_arg('fields'), exclude=set(list_arg('exclude')),
+                lines=request.args.get('lines', type=int),
+                limit=max(1, min(request.args.get('limit', 50, type=int), CHECKS_PAGE_MAX)),
+                cursor=request.args.get('cursor'),
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        response = jsonify(result)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/checks/facets')
+def api_checks_facets():
+    """Values and counts available for the /api/checks filters"""
+    entry = cached_results()
+    raw = entry['raw']
+    if isinstance(raw, dict) and raw.get('error'):
+        return jsonify({'error': raw.get('error')}), 500
+    if entry['identity'] is None:
+        return jsonify({'status': {}, 'source': {}, 'group': {}})
+    return cached_json_response(entry, 'facets', lambda: check_index(entry).facets())
+
 @app.route('/api/data')
 def api_raw():
-    data = load_raw()
-    return jsonify(data)
+    entry = cached_results()
+    if entry['identity'] is None or (isinstance(entry['raw'], dict) and entry['raw'].get('error')):
+        return jsonify(entry['raw'])
+    return cached_json_response(entry, 'raw', lambda: entry['raw'])
 
 @app.route('/api/processed')
 def api_processed():
-    raw = load_raw()
+    response = published_response('summary.json', 'processed')
+    if response is not None:
+        return response
+    entry = cached_results()
+    raw = entry['raw']
     if isinstance(raw, dict) and raw.get('error'):
         return jsonify({'error': raw.get('error')}), 500
-    processed = build_processed(raw)
-    return jsonify(processed)
+    return cached_json_response(entry, 'processed', lambda: processed_results(entry))
+
+# Per-node results (control plane and workers), see compliance_store.py
+node_results = NodeResultsStore(NODE_RESULTS_DIR, build_processed, normalize_status, on_load=scan_recorder.node_loaded)
+NODE_UPLOAD_MAX_BYTES = int(os.environ.get('NODE_UPLOAD_MAX_BYTES', str(32 * 1024 * 1024)))
+# Shared secret the scanners send as a bearer token (the cis-node-upload
+# Secret); without it uploads are refused and only NODE_RESULTS_DIR is read
+NODE_UPLOAD_TOKEN = os.environ.get('NODE_UPLOAD_TOKEN', '')
+
+def upload_authorized():
+    auth = request.headers.get('Authorization', '')
+    scheme, _, token = auth.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), NODE_UPLOAD_TOKEN.encode())
+
+@app.route('/api/compliance/nodes/<node>', methods=['PUT', 'POST'])
+def upload_node_results(node):
+    """Scanners upload their results here, one document per node"""
+    if not NODE_UPLOAD_TOKEN:
+        return jsonify({'error': 'Node uploads are disabled (NODE_UPLOAD_TOKEN is not set)'}), 403
+    if not upload_authorized():
+        return jsonify({'error': 'Missing or invalid upload token'}), 401
+    if request.content_length and request.content_length > NODE_UPLOAD_MAX_BYTES:
+        return jsonify({'error': 'Results document too large'}), 413
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Expected a JSON body'}), 400
+    try:
+        node_results.save(node, payload)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'status': 'stored', 'node': node})
+
+@app.route('/api/compliance/nodes')
+def list_node_results():
+    return jsonify({'nodes': node_results.summaries()})
+
+@app.route('/api/compliance/nodes/<node>')
+def get_node_results(node):
+    result = node_results.node(node)
+    if result is None:
+        return jsonify({'error': f"No results for node {node}"}), 404
+    return jsonify(result)
+
+@app.route('/api/compliance/cluster')
+def cluster_results():
+    """Per-check pass rate across nodes and the nodes with most failures"""
+    worst = request.args.get('worst', 10, type=int)
+    version = node_results.refresh()
+    etag = f"cluster-{version}-{worst}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(node_results.cluster(worst))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/history/runs')
+def history_runs():
+    try:
+        runs = scan_history.runs(
+            request.args.get('source'), time_arg('since'), time_arg('until'),
+            limit=min(request.args.get('limit', 100, type=int), 5000)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'runs': runs, 'sources': scan_history.sources()})
+
+@app.route('/api/history/trend')
+def history_trend():
+    """Status of one check across runs"""
+    check_id = request.args.get('check_id')
+    if not check_id:
+        return jsonify({'error': "Missing 'check_id'"}), 400
+    try:
+        trend = scan_history.trend(
+            check_id, request.args.get('source'), time_arg('since'), time_arg('until'),
+            limit=min(request.args.get('limit', 100, type=int), 5000)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if trend is None:
+        return jsonify({'error': f"Unknown check {check_id}"}), 404
+    return jsonify(trend)
+
+@app.route('/api/history/diff')
+def history_diff():
+    """Checks that regressed or were fixed between two runs (default: the last two of a source)"""
+    from_run = request.args.get('from', type=int)
+    to_run = request.args.get('to', type=int)
+    if from_run is None or to_run is None:
+        previous, latest = scan_history.latest_pair(request.args.get('source', DEFAULT_SOURCE))
+        from_run = previous if from_run is None else from_run
+        to_run = latest if to_run is None else to_run
+    if from_run is None or to_run is None:
+        return jsonify({'error': 'Need at least two recorded runs'}), 404
+    result = scan_history.diff(from_run, to_run)
+    if result is None:
+        return jsonify({'error': 'Unknown run id'}), 404
+    return jsonify(result)
 
 @app.route('/result.json')
 def serve_result():
-    if os.path.exists(JSON_PATH):
-        return send_from_directory(os.path.dirname(os.path.abspath(JSON_PATH)) or '.', os.path.basename(JSON_PATH))
+    response = published_response(os.path.basename(JSON_PATH), 'file')
+    if response is not None:
+        return response
+    identity = results_identity()
+    if identity is not None:
+        # send_file handles If-None-Match / If-Modified-Since with this ETag
+        response = send_from_directory(
+            os.path.dirname(os.path.abspath(JSON_PATH)) or '.', os.path.basename(JSON_PATH),
+            etag=results_etag({'identity': identity}, 'file'), conditional=True, max_age=0
+        )
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     return ("Not found", 404)
 
+def count_decisions(fn):
+    """Count accepted / rejected alerts (one counter update per call)"""
+    def wrapper(alert):
+        accepted = fn(alert)
+        ALERT_FILTER.inc(result='accepted' if accepted else 'rejected')
+        return accepted
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+@count_decisions
 def should_include_alert(alert):
     """
     Determine if an alert should be included based on filters.
@@ -300,131 +664,525 @@ def should_include_alert(alert):
     
     return True
 
+def time_arg(name):
+    """Read a time-range query parameter given as epoch seconds or RFC3339."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        ts = parse_time(value)
+        if ts is None:
+            raise ValueError(f"Invalid '{name}' time: {value}")
+        return ts
+
+def parse_alert_lines(lines, since=None, until=None):
+    """Parse NDJSON lines and yield alerts that pass the filters and time range."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            alert = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not should_include_alert(alert):
+            continue
+        if since is not None or until is not None:
+            ts = parse_time(alert.get('time'))
+            if ts is None or (since is not None and ts < since) or (until is not None and ts > until):
+                continue
+        yield alert
+
+@RUNTIME_READ_SECONDS.time(operation='alerts')
+def load_runtime_alerts(since=None, until=None, limit=None):
+    """
+    Load filtered runtime alerts. Only segments overlapping [since, until] are
+    opened; with a limit, segments are read newest first and reading stops once
+    older segments cannot contribute to the newest `limit` alerts.
+    Returns None if there are no runtime logs.
+    """
+    if segments.is_segment_dir(RUNTIME_LOG_DIR):
+        entries = segments.select_segments(segments.load_index(RUNTIME_LOG_DIR), since, until)
+        alerts = []
+        for entry in reversed(entries):
+            if limit and len(alerts) >= limit and entry.get('sealed'):
+                alerts.sort(key=lambda x: x.get('time', ''), reverse=True)
+                del alerts[limit:]
+                cutoff = parse_time(alerts[-1].get('time'))
+                if cutoff is not None and entry['max_ts'] is not None and entry['max_ts'] < cutoff:
+                    break
+            alerts.extend(parse_alert_lines(segments.read_segment(RUNTIME_LOG_DIR, entry), since, until))
+        return alerts
+
+    if not os.path.exists(RUNTIME_LOGS_PATH):
+        return None
+    with open(RUNTIME_LOGS_PATH, 'r', encoding='utf-8') as f:
+        return list(parse_alert_lines(f, since, until))
+
+def runtime_logs_exist():
+    return segments.is_segment_dir(RUNTIME_LOG_DIR) or os.path.exists(RUNTIME_LOGS_PATH)
+
+def iter_runtime_alerts(since=None, until=None):
+    """Yield filtered runtime alerts in [since, until] without holding them in memory."""
+    if segments.is_segment_dir(RUNTIME_LOG_DIR):
+        for entry in segments.select_segments(segments.load_index(RUNTIME_LOG_DIR), since, until):
+            yield from parse_alert_lines(segments.read_segment(RUNTIME_LOG_DIR, entry), since, until)
+    elif os.path.exists(RUNTIME_LOGS_PATH):
+        with open(RUNTIME_LOGS_PATH, 'r', encoding='utf-8') as f:
+            yield from parse_alert_lines(f, since, until)
+
+# In-memory state fed incrementally from the runtime log
+# Under overload, lower-severity events are sampled; `exact` consumers still
+# count every event from a skimmed skeleton
+# Events, bytes and ingest time per TracingPolicy (policy_cost.py)
+policy_profiler = PolicyProfiler() if POLICY_PROFILE_ENABLED else None
+runtime_ingester = RuntimeIngester(RUNTIME_LOG_DIR, RUNTIME_LOGS_PATH, accept=should_include_alert,
+                                   shedder=LoadShedder() if SHED_ENABLED else None,
+                                   profiler=policy_profiler)
+runtime_rollups = Rollups()
+runtime_ingester.add_consumer(runtime_rollups, exact=True)
+# Compact columns of recent alerts; payloads are re-read from the log on demand
+runtime_events = EventStore(location=lambda: runtime_ingester.location)
+runtime_ingester.add_consumer(runtime_events)
+# Posting lists per namespace/pod/node/binary/event type/policy over the store
+runtime_facets = FacetIndex(runtime_events)
+# Top-K stats kept up to date at ingest, exact counters or sketches per
+# dimension (TOPK_MODE / TOPK_MODE_BINARY / TOPK_MODE_POD / TOPK_MODE_CALL)
+runtime_heavy_hitters = HeavyHitters()
+runtime_ingester.add_consumer(runtime_heavy_hitters, exact=True)
+# Per-binary/pod/call rate baselines; bursts become synthetic anomaly alerts
+rate_detector = RateDetector() if ANOMALY_ENABLED else None
+if rate_detector is not None:
+    runtime_ingester.add_consumer(rate_detector, exact=True)
+# Process tree from every event (before filtering) for alert ancestry
+process_tree = ProcessTree()
+runtime_ingester.add_consumer(process_tree, raw=True)
+if recheck_trigger is not None:
+    runtime_ingester.add_consumer(recheck_trigger, raw=True)
+    if runtime_ingester.shedder is not None:
+        runtime_ingester.shedder.protect(RECHECK_CALLS)
+LINEAGE_PUBLISH_INTERVAL = float(os.environ.get('LINEAGE_PUBLISH_INTERVAL', '5'))
+# Newest alerts served from the event store (and published to other workers)
+RUNTIME_ALERT_LIMIT = 1000
+
+def recent_events_view():
+    # Not ready until the first poll has replayed the existing log
+    return dict(runtime_events.recent(RUNTIME_ALERT_LIMIT), ready=runtime_ingester.stats['polls'] > 0)
+
+# With several workers only the elected leader tails the log; it publishes
+# its views and the other workers serve from those snapshots
+if shared_state is not None:
+    ingest_version = lambda: runtime_ingester.stats['ingested']
+    shared_state.register('rollups', runtime_rollups.snapshot, ingest_version)
+    shared_state.register('ingest', runtime_ingester.status)
+    shared_state.register('events', recent_events_view, lambda: runtime_events.next_id, interval=1.0)
+    shared_state.register('heavy_hitters', runtime_heavy_hitters.stats, ingest_version)
+    # The full tree only when its generation changes, else just what changed
+    shared_state.register('lineage', process_tree.snapshot, lambda: process_tree.generation)
+    shared_state.register('lineage-delta', process_tree.delta, lambda: process_tree.version,
+                          interval=LINEAGE_PUBLISH_INTERVAL)
+    if recheck_trigger is not None:
+        shared_state.register('recheck', recheck_trigger.status)
+    if policy_profiler is not None:
+        shared_state.register('policies', policy_profiler.report, lambda: runtime_ingester.stats['lines'],
+                              interval=2.0)
+    if rate_detector is not None:
+        shared_state.register('anomalies', rate_detector.snapshot, lambda: rate_detector.stats['events'],
+                              interval=2.0)
+
+def shared_view(name, local, loader=None):
+    """Return this worker's own state if it ingests, else the leader's published copy."""
+    if shared_state is None or shared_state.is_leader:
+        return local()
+    published = shared_state.read(name, loader)
+    return local() if published is None else published
+
+def lineage_view():
+    """The leader's process tree: the shared base snapshot with the latest delta applied."""
+    if shared_state is None or shared_state.is_leader:
+        return process_tree
+    tree = shared_state.read('lineage', ProcessTree.from_snapshot)
+    if tree is None:
+        return process_tree
+    delta = shared_state.read('lineage-delta')
+    if delta is not None:
+        tree.apply_delta(delta)
+    return tree
+
+def start_leader():
+    """Background work done by one process only: ingest, scan history and the Job watch."""
+    runtime_ingester.start()
+    scan_recorder.start()
+    job_watcher.start()
+
+@app.before_request
+def start_runtime_ingest():
+    if shared_state is not None:
+        shared_state.start(on_leader=start_leader)
+    else:
+        start_leader()
+
+def shutdown():
+    """Stop background ingestion; called by the server when a worker exits."""
+    runtime_ingester.stop()
+    if recheck_trigger is not None:
+        recheck_trigger.stop()
+    if shared_state is not None:
+        # Final metrics, so the counters of this worker outlive it
+        shared_state.publish_local()
+
+def stored_events(since=None, until=None, limit=RUNTIME_ALERT_LIMIT, after=None):
+    """
+    Newest alerts in [since, until] (and newer than the event id `after`)
+    from the event store as (row, location) pairs, plus the id of the newest
+    stored event; None if the store does not hold the whole range.
+    """
+    if shared_state is None or shared_state.is_leader:
+        if runtime_ingester.stats['polls'] == 0:
+            return None
+        ids = runtime_events.newest_ids(limit, since, until, after=after)
+        # Everything after the cursor is still held, whatever its age
+        held = after is not None and after + 1 >= runtime_events.oldest_id
+        if len(ids) < limit and not held and not runtime_events.covers(since):
+            return None
+        locations = runtime_events.locations(ids)
+        pairs = [(row, locations[row['id']]) for row in runtime_events.rows(ids) if row['id'] in locations]
+        return pairs, runtime_events.next_id - 1
+    view = shared_state.read('events')
+    if view is None or not view['ready']:
+        return None
+    found = [r for r in view['rows']
+             if (since is None or r['loc'][2] >= since) and (until is None or r['loc'][2] <= until)
+             and (after is None or r['id'] > after)]
+    held = after is not None and (not view['rows'] or view['rows'][-1]['id'] <= after + 1)
+    if len(found) < limit and not view['complete'] and not held:
+        return None
+    pairs = [({k: v for k, v in r.items() if k != 'loc'}, tuple(r['loc'])) for r in found[:limit]]
+    return pairs, view['next_id'] - 1
+
 @app.route('/api/runtime/alerts')
 def runtime_alerts():
-    """Fetch runtime security alerts from Tetragon logs"""
+    """
+    Fetch runtime security alerts from Tetragon logs. With `after` (the
+    `cursor` of a previous response) only newer alerts are returned; `reset`
+    tells the client to replace its list instead of merging.
+    """
     try:
-        if not os.path.exists(RUNTIME_LOGS_PATH):
-            return jsonify({'alerts': [], 'total': 0, 'error': 'No runtime logs found'})
-        
-        with open(RUNTIME_LOGS_PATH, 'r', encoding='utf-8') as f:
+        since, until = time_arg('since'), time_arg('until')
+        after = request.args.get('after', type=int)
+        stored = stored_events(since, until, after=after) if runtime_logs_exist() else None
+        if stored is not None and after is not None and after > stored[1]:
+            # Cursor from before a restart: ids start over
+            stored = stored_events(since, until)
+            after = None
+        if stored is None:
+            after = None
+        stored, cursor = stored if stored is not None else (None, None)
+        if stored is not None and request.args.get('compact') == '1':
+            # Columns only, no log reads
+            rows = [row for row, _ in stored]
+            return jsonify({'alerts': rows, 'total': len(rows), 'compact': True, 'cursor': cursor,
+                            'reset': after is None, 'timestamp': time.time()})
+        if stored is not None:
+            payloads = read_payloads({row['id']: loc for row, loc in stored}, RUNTIME_LOG_DIR, RUNTIME_LOGS_PATH)
             alerts = []
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    alert = json.loads(line)
-                    
-                    # Apply filters
-                    if should_include_alert(alert):
-                        alerts.append(alert)
-                        
-                except json.JSONDecodeError:
-                    continue
-            
-            # Sort by timestamp (most recent first)
-            alerts.sort(key=lambda x: x.get('time', ''), reverse=True)
-            
-            # Limit to last 1000 alerts
-            alerts = alerts[:1000]
-            
-            return jsonify({
-                'alerts': alerts,
-                'total': len(alerts),
-                'timestamp': time.time()
-            })
+            for row, _ in stored:
+                if row['id'] in payloads:
+                    payloads[row['id']]['event_id'] = row['id']
+                    alerts.append(payloads[row['id']])
+        else:
+            alerts = load_runtime_alerts(since, until, limit=RUNTIME_ALERT_LIMIT)
+            if alerts is None:
+                return jsonify({'alerts': [], 'total': 0, 'error': 'No runtime logs found'})
+
+        # Sort by timestamp (most recent first)
+        alerts.sort(key=lambda x: x.get('time', ''), reverse=True)
+
+        # Limit to last 1000 alerts
+        alerts = alerts[:RUNTIME_ALERT_LIMIT]
+        ALERT_BUFFER.set(len(alerts))
+
+        if request.args.get('lineage', '1') != '0':
+            tree = lineage_view()
+            for alert in alerts:
+                tree.enrich(alert)
+
+        return jsonify({
+            'alerts': alerts,
+            'total': len(alerts),
+            'cursor': cursor,
+            'reset': after is None,
+            'anomalies': recent_anomalies(limit=20),
+            'source': 'store' if stored is not None else 'scan',
+            'shedding': shedding_summary(),
+            'timestamp': time.time()
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e), 'alerts': [], 'total': 0}), 400
     except Exception as e:
         return jsonify({'error': str(e), 'alerts': [], 'total': 0}), 500
 
+def shedding_summary():
+    """Whether stored alerts are currently a sample, and at which rates."""
+    shedding = shared_view('ingest', runtime_ingester.status).get('shedding')
+    if not shedding:
+        return None
+    return {k: shedding[k] for k in ('degraded', 'sample_rates', 'shed_total')}
+
+def recent_anomalies(limit=50, dimension=None):
+    if rate_detector is None:
+        return []
+    snap = shared_view('anomalies', rate_detector.snapshot)
+    items = [a for a in reversed(snap['anomalies']) if dimension is None or a['anomaly']['dimension'] == dimension]
+    return items[:limit]
+
+@app.route('/api/runtime/anomalies')
+def runtime_anomalies():
+    """Rate anomalies per binary, pod and call, newest first"""
+    if rate_detector is None:
+        return jsonify({'enabled': False, 'anomalies': []})
+    snap = shared_view('anomalies', rate_detector.snapshot)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
+    return jsonify({
+        'enabled': True,
+        'anomalies': recent_anomalies(limit, request.args.get('dimension') or None),
+        'stats': snap['stats'],
+        'tracked_keys': snap['tracked_keys'],
+        'baselines': snap['baselines'],
+        'timestamp': time.time(),
+    })
+
+@app.route('/api/runtime/policies')
+def runtime_policies():
+    """Ingest cost per TracingPolicy: events/s, bytes and share of ingest time"""
+    if policy_profiler is None:
+        return jsonify({'enabled': False, 'policies': []})
+    report = dict(shared_view('policies', policy_profiler.report))
+    report['policies'] = report['policies'][:max(1, min(request.args.get('limit', 50, type=int), 500))]
+    return jsonify(dict(report, enabled=True, timestamp=time.time()))
+
+@app.route('/api/runtime/search')
+def runtime_search():
+    """
+    Stored alerts matching a facet query, with facet counts over all matches.
+    `q` takes facet:value terms with AND/OR/NOT and parentheses; each facet is
+    also a parameter (`pod=a,b` matches either pod).
+    """
+    try:
+        since, until = time_arg('since'), time_arg('until')
+        query = query_from_params(request.args.get('q'), request.args)
+        limit = max(0, min(request.args.get('limit', 100, type=int), RUNTIME_ALERT_LIMIT))
+        top = max(1, min(request.args.get('top', 20, type=int), 500))
+        facets = [f for f in (request.args.get('facets') or ','.join(FACETS)).split(',') if f]
+        unknown = [f for f in facets if f not in FACETS]
+        if unknown:
+            raise ValueError(f"Unknown facet '{unknown[0]}' (expected one of {', '.join(FACETS)})")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if shared_state is None or shared_state.is_leader:
+        found = runtime_facets.search(query, since, until, limit, facets, top)
+        rows = runtime_events.rows(found['ids'])
+        locations = runtime_events.locations(found['ids'])
+        result = {'total': found['total'], 'facets': found['facets'], 'source': 'index', 'partial': False}
+    else:
+        # The index lives with the ingest leader: search its published recent rows
+        view = shared_state.read('events') or {'rows': [], 'complete': True}
+        matched = [r for r in view['rows']
+                   if (since is None or r['loc'][2] >= since) and (until is None or r['loc'][2] <= until)
+                   and (query is None or match_row(query, r))]
+        locations = {r['id']: tuple(r['loc']) for r in matched[:limit]}
+        rows = [{k: v for k, v in r.items() if k != 'loc'} for r in matched[:limit]]
+        result = {'total': len(matched), 'facets': count_rows(matched, facets, top),
+                  'source': 'recent', 'partial': not view['complete']}
+
+    if request.args.get('compact') == '1':
+        alerts = rows
+    else:
+        payloads = read_payloads(locations, RUNTIME_LOG_DIR, RUNTIME_LOGS_PATH)
+        alerts = [dict(payloads[r['id']], event_id=r['id']) for r in rows if r['id'] in payloads]
+        if request.args.get('lineage', '1') != '0':
+            tree = lineage_view()
+            for alert in alerts:
+                tree.enrich(alert)
+    result.update({'query': format_query(query), 'alerts': alerts, 'shedding': shedding_summary(),
+                   'timestamp': time.time()})
+    return jsonify(result)
+
+@app.route('/api/runtime/events/<int:event_id>')
+def runtime_event(event_id):
+    """One stored alert: its compact row and the full payload read back from the log"""
+    if shared_state is None or shared_state.is_leader:
+        row = runtime_events.row(event_id)
+        location = runtime_events.locations([event_id]).get(event_id)
+    else:
+        view = shared_state.read('events') or {'rows': []}
+        found = next((r for r in view['rows'] if r['id'] == event_id), None)
+        row = None if found is None else {k: v for k, v in found.items() if k != 'loc'}
+        location = None if found is None else tuple(found['loc'])
+    if row is None:
+        return jsonify({'error': f"Event {event_id} is no longer held"}), 404
+    payload = read_payloads({event_id: location}, RUNTIME_LOG_DIR, RUNTIME_LOGS_PATH).get(event_id)
+    if payload is None:
+        return jsonify({'error': f"Event {event_id} is no longer in the runtime log", 'event': row}), 404
+    return jsonify({'event': row, 'payload': payload})
+
 @app.route('/api/runtime/stats')
 def runtime_stats():
     """Get statistics about runtime alerts"""
     try:
-        if not os.path.exists(RUNTIME_LOGS_PATH):
+        since, until = time_arg('since'), time_arg('until')
+        if not runtime_logs_exist():
             return jsonify({'error': 'No runtime logs found'})
-        
-        with open(RUNTIME_LOGS_PATH, 'r', encoding='utf-8') as f:
-            alerts = []
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    alert = json.loads(line)
-                    
-                    # Apply filters
-                    if should_include_alert(alert):
-                        alerts.append(alert)
-                        
-                except json.JSONDecodeError:
-                    continue
-        
-        # Calculate statistics
-        total = len(alerts)
-        by_type = Counter()
-        by_process = Counter()
-        by_severity = Counter()
-        
-        for alert in alerts:
-            # Extract event info based on type
-            if 'process_tracepoint' in alert:
-                tp = alert['process_tracepoint']
-                # Tetragon tracepoint: subsys="syscalls", call="sys_enter_clone"
-                call = tp.get('call') or tp.get('event') or 'unknown'
-                subsys = tp.get('subsys', '')
-                event_type = call if call != 'unknown' else (f"{subsys}/{call}" if subsys else 'unknown')
-                process_name = tp.get('process', {}).get('binary', 'unknown')
-            elif 'process_exec' in alert:
-                event_type = 'execve'
-                process_name = alert['process_exec'].get('process', {}).get('binary', 'unknown')
-            elif 'process_kprobe' in alert:
-                event_type = alert['process_kprobe'].get('function_name', 'kprobe')
-                process_name = alert['process_kprobe'].get('process', {}).get('binary', 'unknown')
-            else:
-                event_type = 'unknown'
-                process_name = 'unknown'
-            
-            by_type[event_type] += 1
-            by_process[process_name] += 1
-            
-            # Determine severity based on event type / function name
-            event_lower = event_type.lower()
-            if any(x in event_lower for x in [
-                'setuid', 'capset', 'sigkill', 'mount',
-                'setns', 'unshare',                          # namespace/container escape
-                'security_inode_unlink',                     # file deletion at LSM
-                'security_inode_rename',                     # file rename at LSM
-                '__x64_sys_setns', '__x64_sys_unshare',
-            ]):
-                by_severity['critical'] += 1
-            elif any(x in event_lower for x in [
-                'clone', 'accept', 'connect', 'bind',        # DoS / network (tracepoint call names)
-                'security_socket_connect',                   # socket connect LSM
-                'fd_install',                                # fd creation (DoS)
-                'security_bprm_check',                       # binary exec check
-            ]):
-                by_severity['high'] += 1
-            elif any(x in event_lower for x in [
-                'execve', 'x64_sys_execve',                  # process execution
-                '__x64_sys_execve',
-                'chmod', 'fchmodat',                         # permission changes
-                'chown', 'fchownat',                         # ownership changes
-                'security_file_open',                        # file open LSM
-            ]):
-                by_severity['medium'] += 1
-            else:
-                by_severity['low'] += 1
-        
-        return jsonify({
-            'total': total,
-            'by_type': dict(by_type.most_common(10)),
-            'by_process': dict(by_process.most_common(10)),
-            'by_severity': dict(by_severity),
-            'timestamp': time.time()
-        })
+
+        if since is None and until is None:
+            # Answered from the ingest-time counters
+            stats = dict(shared_view('heavy_hitters', runtime_heavy_hitters.stats))
+            stats['source'] = 'stream'
+        else:
+            # A time range the ingest-time counters cannot answer: one pass
+            # over the log, memory bounded by the configured trackers
+            started = time.perf_counter()
+            counter = HeavyHitters()
+            for alert in iter_runtime_alerts(since, until):
+                counter(alert)
+            RUNTIME_READ_SECONDS.observe(time.perf_counter() - started, operation='stats_scan')
+            stats = counter.stats()
+            stats['source'] = 'scan'
+
+        stats['storage'] = segments.usage(RUNTIME_LOG_DIR) if segments.is_segment_dir(RUNTIME_LOG_DIR) else None
+        if shared_state is None or shared_state.is_leader:
+            stats['store'] = dict(runtime_events.memory(), **runtime_facets.memory())
+        else:
+            stats['store'] = None
+        stats['timestamp'] = time.time()
+        return jsonify(stats)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/runtime/process/<path:exec_id>')
+def runtime_process(exec_id):
+    """A process with its ancestry and descendants from the lineage index"""
+    tree = lineage_view()
+    depth = max(0, min(request.args.get('depth', 2, type=int), 10))
+    node = tree.subtree(exec_id, depth=depth, limit=min(request.args.get('limit', 200, type=int), 5000))
+    if node is None:
+        return jsonify({'error': f"Unknown process {exec_id}"}), 404
+    ancestry, complete = tree.ancestry(exec_id)
+    return jsonify({
+        'process': node,
+        'ancestry': ancestry,
+        'ancestry_complete': complete,
+        'index': tree.stats(),
+    })
+
+@app.route('/api/recheck')
+def recheck_status():
+    """Watched paths and binaries, pending and recent targeted re-checks"""
+    if recheck_trigger is None:
+        return jsonify({'enabled': False})
+    return jsonify(shared_view('recheck', recheck_trigger.status))
+
+@app.route('/api/runtime/timeseries')
+def runtime_timeseries():
+    """Event rates from the per-minute / per-hour rollups"""
+    try:
+        dimensions = request.args.get('dimensions')
+        dimensions = [d for d in dimensions.split(',') if d in DIMENSIONS] if dimensions else DIMENSIONS
+        top = request.args.get('top', type=int)
+        rollups = shared_view('rollups', lambda: runtime_rollups, Rollups.from_snapshot)
+        result = rollups.query(
+            request.args.get('resolution', 'minute'),
+            time_arg('since'), time_arg('until'), dimensions, top
+        )
+        result['timestamp'] = time.time()
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                route=route, method=request.method, status=response.status_code)
+    return response
+
+def cluster_metrics():
+    """Metrics about shared state, computed at scrape time rather than summed per worker"""
+    scrape = metrics.Registry()
+    ingest = shared_view('ingest', runtime_ingester.status)
+    for key, help in (('lines', 'Runtime log lines read'), ('ingested', 'Alerts passed to ingest consumers'),
+                      ('filtered', 'Alerts dropped by should_include_alert'), ('invalid', 'Unparseable runtime log lines'),
+                      ('polls', 'Runtime log polls')):
+        scrape.counter(f'dashboard_ingest_{key}_total', help).inc(ingest.get(key, 0))
+    scrape.counter('dashboard_ingest_poll_seconds_total', 'Time spent polling the runtime log').inc(ingest.get('poll_seconds', 0.0))
+    scrape.counter('dashboard_ingest_shed_total', 'Alerts counted but not decoded under load').inc(ingest.get('shed', 0))
+    scrape.gauge('dashboard_ingest_backlog_bytes', 'Unread runtime log bytes').set(ingest.get('backlog_bytes', 0))
+    if ingest.get('lag_seconds') is not None:
+        scrape.gauge('dashboard_ingest_lag_seconds', 'Ingest lag behind the newest event').set(ingest['lag_seconds'])
+    shedding = ingest.get('shedding')
+    if shedding:
+        rates = scrape.gauge('dashboard_ingest_sample_rate', 'Share of events decoded, by severity', ('severity',))
+        for severity, rate in shedding['sample_rates'].items():
+            rates.set(rate, severity=severity)
+    if policy_profiler is not None:
+        report = shared_view('policies', policy_profiler.report)
+        events = scrape.counter('dashboard_policy_events_total', 'Runtime events per TracingPolicy', ('policy',))
+        size = scrape.counter('dashboard_policy_bytes_total', 'Runtime log bytes per TracingPolicy', ('policy',))
+        cpu = scrape.counter('dashboard_policy_ingest_seconds_total', 'Ingest time per TracingPolicy', ('policy',))
+        for p in report['policies']:
+            events.inc(p['events'], policy=p['policy'])
+            size.inc(p['bytes'], policy=p['policy'])
+            cpu.inc(p['cpu_seconds'], policy=p['policy'])
+    if ingest.get('last_poll'):
+        scrape.gauge('dashboard_ingest_last_poll_age_seconds', 'Seconds since the last ingest poll').set(
+            round(time.time() - ingest['last_poll'], 3))
+    try:
+        with open(COLLECTOR_STATS_PATH, 'r', encoding='utf-8') as f:
+            collector = json.load(f)
+    except (OSError, ValueError):
+        collector = None
+    if collector:
+        scrape.counter('tetragon_collector_events_total', 'Events parsed by the collector').inc(collector.get('events', 0))
+        scrape.counter('tetragon_collector_skipped_total', 'Lines the collector could not parse').inc(collector.get('skipped', 0))
+        scrape.gauge('tetragon_collector_events_per_second', 'Collector event rate').set(collector.get('events_per_sec', 0))
+        if collector.get('lag_seconds') is not None:
+            scrape.gauge('tetragon_collector_lag_seconds', 'Collector lag behind Tetragon event time').set(collector['lag_seconds'])
+        scrape.gauge('tetragon_collector_report_age_seconds', 'Seconds since the collector last reported').set(
+            round(time.time() - collector.get('timestamp', time.time()), 3))
+        coalesce = collector.get('coalesce')
+        if coalesce:
+            scrape.counter('tetragon_collector_collapsed_total', 'Events folded into coalesced records').inc(coalesce.get('collapsed', 0))
+            scrape.gauge('tetragon_collector_open_windows', 'Open coalescing windows').set(coalesce.get('open_windows', 0))
+    return scrape.snapshot()
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text format: per-worker metrics merged across workers, plus shared state"""
+    snapshots = [registry.snapshot(), cluster_metrics()]
+    if shared_state is not None:
+        snapshots.extend(shared_state.read_all('metrics', metrics.fold_exited))
+    return app.response_class(metrics.render(metrics.merge(snapshots)), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    return jsonify({
+        'status': 'ok',
+        'pid': os.getpid(),
+        'shared': shared_state.status() if shared_state is not None else None,
+        'ingest': shared_view('ingest', runtime_ingester.status),
+    })
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000, threaded=True)
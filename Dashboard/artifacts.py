@@ -0,0 +1,99 @@
+"""
+Artifacts the compliance engine publishes with each results.json.
+
+At the end of a scan the engine writes results.json, summary.json (the
+build_processed() output) and gzip copies of both, each via a temp file and
+rename, and then manifest.json. The manifest names the results.json it was
+built from (inode, mtime, size) and the sha256 of every artifact. An
+artifact is served only if the manifest matches the current results.json
+and the bytes match their hash, so the dashboard never serves a summary of
+older results or a file that is being replaced; otherwise callers fall back
+to parsing results.json.
+"""
+import hashlib
+import json
+import os
+import threading
+
+MANIFEST_PATH = os.environ.get('RESULT_MANIFEST_PATH', '/output/manifest.json')
+
+
+class PublishedArtifacts:
+    def __init__(self, manifest_path=MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self.directory = os.path.dirname(os.path.abspath(manifest_path))
+        self.lock = threading.Lock()
+        self.manifest_identity = None
+        self.manifest = None
+        # name -> bytes, for the manifest version in self.version
+        self.version = None
+        self.bodies = {}
+        self.stats = {'served': 0, 'rejected': 0}
+
+    def _load_manifest(self):
+        try:
+            st = os.stat(self.manifest_path)
+        except OSError:
+            self.manifest_identity, self.manifest = None, None
+            return None
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if identity != self.manifest_identity:
+            self.manifest_identity = identity
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self.manifest = json.load(f)
+            except (OSError, ValueError):
+                self.manifest = None
+        return self.manifest
+
+    def current(self, results_identity):
+        """The manifest if it describes the results.json with this (inode, mtime_ns, size)."""
+        with self.lock:
+            manifest = self._load_manifest()
+        if not isinstance(manifest, dict) or results_identity is None:
+            return None
+        results = manifest.get('results') or {}
+        if (results.get('inode'), results.get('mtime_ns'), results.get('size')) != tuple(results_identity):
+            return None
+        return manifest
+
+    def body(self, name, results_identity):
+        """Bytes of a published artifact of the current results, or None."""
+        manifest = self.current(results_identity)
+        if manifest is None:
+            return None
+        expected = (manifest.get('artifacts') or {}).get(name)
+        if expected is None:
+            return None
+        with self.lock:
+            if manifest.get('version') != self.version:
+                self.version, self.bodies = manifest.get('version'), {}
+            body = self.bodies.get(name)
+            if body is not None:
+                self.stats['served'] += 1
+                return body
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        if len(body) != expected.get('bytes') or hashlib.sha256(body).hexdigest() != expected.get('sha256'):
+            # Replaced by a newer scan after the manifest was read
+            with self.lock:
+                self.stats['rejected'] += 1
+            return None
+        with self.lock:
+            if manifest.get('version') == self.version:
+                self.bodies[name] = body
+            self.stats['served'] += 1
+        return body
+
+    def snapshot(self):
+        with self.lock:
+            manifest = self.manifest or {}
+            return {
+                'version': manifest.get('version'),
+                'generated_at': manifest.get('generated_at'),
+                'cached_bytes': sum(len(b) for b in self.bodies.values()),
+                **self.stats,
+            }
@@ -0,0 +1,153 @@
+"""
+In-memory index over compliance check results.
+
+Built once per results file and used by /api/checks for filtering by status,
+source file, group and check-ID prefix, free-text search over description
+and reason, field projection and cursor pagination. Every filter resolves to
+a set of positions from a prebuilt posting list, so a query touches only the
+matching checks.
+"""
+import base64
+import re
+from bisect import bisect_left
+from collections import defaultdict, Counter
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def natural_key(check_id):
+    """'1.2.10' sorts after '1.2.9'."""
+    return tuple((0, int(p), '') if p.isdigit() else (1, 0, p) for p in str(check_id or '').split('.'))
+
+
+def check_group(check_id):
+    """Group of a check: '1.2.10' -> '1.2'."""
+    parts = str(check_id or '').split('.')
+    return '.'.join(parts[:2]) if len(parts) > 2 else '.'.join(parts[:1])
+
+
+def tokens(text):
+    return TOKEN_RE.findall(str(text).lower()) if text else []
+
+
+def _prefix_range(sorted_keys, prefix):
+    start = bisect_left(sorted_keys, prefix)
+    end = bisect_left(sorted_keys, prefix + '\uffff')
+    return start, end
+
+
+class CheckIndex:
+    def __init__(self, raw_list, normalize, version=''):
+        self.version = version
+        items = [i for i in raw_list if isinstance(i, dict)]
+        items.sort(key=lambda i: natural_key(i.get('check_id')))
+        self.items = items
+        self.statuses = [normalize(i.get('status')) for i in items]
+        self.by_status = defaultdict(set)
+        self.by_source = defaultdict(set)
+        self.by_group = defaultdict(set)
+        words = defaultdict(set)
+        ids = []
+        for pos, item in enumerate(items):
+            self.by_status[self.statuses[pos]].add(pos)
+            self.by_source[item.get('_source_file') or item.get('source') or 'unknown'].add(pos)
+            self.by_group[check_group(item.get('check_id'))].add(pos)
+            ids.append((str(item.get('check_id') or ''), pos))
+            for field in ('check_id', 'description', 'reason'):
+                for word in tokens(item.get(field)):
+                    words[word].add(pos)
+        ids.sort()
+        self.id_keys = [k for k, _ in ids]
+        self.id_positions = [p for _, p in ids]
+        self.vocabulary = sorted(words)
+        self.postings = [words[w] for w in self.vocabulary]
+
+    def _with_prefix(self, prefix):
+        start, end = _prefix_range(self.id_keys, prefix)
+        return set(self.id_positions[start:end])
+
+    def _matching_text(self, query):
+        """Positions whose words start with every query token."""
+        result = None
+        for token in tokens(query):
+            start, end = _prefix_range(self.vocabulary, token)
+            found = set().union(*self.postings[start:end]) if end > start else set()
+            result = found if result is None else result & found
+            if not result:
+                return set()
+        return result
+
+    def _union(self, postings, values):
+        return set().union(*(postings.get(v, ()) for v in values))
+
+    def match(self, statuses=None, sources=None, groups=None, prefix=None, text=None):
+        """Sorted positions matching every given filter."""
+        selected = None
+        filters = []
+        if statuses:
+            filters.append(lambda: self._union(self.by_status, [s.upper() for s in statuses]))
+        if sources:
+            filters.append(lambda: self._union(self.by_source, sources))
+        if groups:
+            filters.append(lambda: self._union(self.by_group, groups))
+        if prefix:
+            filters.append(lambda: self._with_prefix(prefix))
+        # Text with no indexable words (only punctuation) filters nothing
+        if tokens(text):
+            filters.append(lambda: self._matching_text(text))
+        for build in filters:
+            found = build()
+            selected = found if selected is None else selected & found
+            if not selected:
+                return []
+        return sorted(selected) if selected is not None else list(range(len(self.items)))
+
+    def encode_cursor(self, pos):
+        return base64.urlsafe_b64encode(f"{self.version}:{pos}".encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Position after which the next page starts; ValueError if invalid or stale."""
+        try:
+            text = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            version, pos = text.rsplit(':', 1)
+            pos = int(pos)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError('Invalid cursor')
+        if version != self.version:
+            raise ValueError('Cursor is from an older scan, start again without a cursor')
+        return pos
+
+    def project(self, pos, fields=None, exclude=(), lines=None):
+        item = self.items[pos]
+        if fields:
+            out = {f: item.get(f) for f in fields if f in item or f == 'status'}
+        else:
+            out = {k: v for k, v in item.items() if k not in exclude}
+        if 'status' in out:
+            out['status'] = self.statuses[pos]
+        if lines is not None and isinstance(out.get('line_results'), list):
+            out['line_results'] = out['line_results'][:lines]
+        return out
+
+    def query(self, statuses=None, sources=None, groups=None, prefix=None, text=None,
+              fields=None, exclude=(), lines=None, limit=50, cursor=None):
+        positions = self.match(statuses, sources, groups, prefix, text)
+        start = 0
+        if cursor:
+            after = self.decode_cursor(cursor)
+            start = bisect_left(positions, after + 1)
+        page = positions[start:start + limit]
+        more = start + limit < len(positions)
+        return {
+            'items': [self.project(p, fields, exclude, lines) for p in page],
+            'total': len(positions),
+            'counts': dict(Counter(self.statuses[p] for p in positions)),
+            'next_cursor': self.encode_cursor(page[-1]) if more and page else None,
+        }
+
+    def facets(self):
+        return {
+            'status': {k: len(v) for k, v in self.by_status.items()},
+            'source': {k: len(v) for k, v in self.by_source.items()},
+            'group': {k: len(v) for k, v in sorted(self.by_group.items(), key=lambda kv: natural_key(kv[0]))},
+        }
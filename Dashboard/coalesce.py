@@ -0,0 +1,141 @@
+"""
+Burst collapsing for high-volume DoS tracepoint events.
+
+The dos-* policies post one event per syscall, so a fork bomb or connect
+flood produces millions of near-identical lines. The Coalescer sits between
+parsing and writing in the collector: events for the configured calls that
+share (call, binary, pod, parent binary) within a window are collapsed into
+the first event of the window, annotated with
+
+    "coalesced": {"count": ..., "first_time": ..., "last_time": ...,
+                  "rate_per_sec": ..., "window_seconds": ...}
+
+Other events pass straight through. A window that only saw one event is
+written unchanged.
+"""
+import json
+import os
+import threading
+import time
+
+from events import EVENT_TYPES
+
+COALESCE_WINDOW = float(os.environ.get('COALESCE_WINDOW', '5'))
+# Calls from dos-clone/accept/connect/fd-detect (and bind-detect)
+COALESCE_CALLS = [c for c in os.environ.get(
+    'COALESCE_CALLS',
+    'sys_enter_clone,sys_enter_accept,sys_enter_connect,fd_install,sys_enter_bind'
+).split(',') if c]
+# Open windows kept before the oldest is flushed early
+COALESCE_MAX_KEYS = int(os.environ.get('COALESCE_MAX_KEYS', '10000'))
+
+
+def coalesce_key(event):
+    """Return (call, binary, pod, parent binary) for an event, or None."""
+    for kind in EVENT_TYPES:
+        body = event.get(kind)
+        if body is not None:
+            break
+    else:
+        return None
+    call = body.get('event') or body.get('call') or body.get('function_name')
+    if not call:
+        return None
+    process = body.get('process') or {}
+    pod = process.get('pod') or {}
+    parent = body.get('parent') or {}
+    return (
+        call,
+        process.get('binary', ''),
+        f"{pod.get('namespace', '')}/{pod.get('name', '')}" if pod else '',
+        parent.get('binary', ''),
+    )
+
+
+class Window:
+    __slots__ = ('text', 'event', 'first_ts', 'last_ts', 'first_time', 'last_time', 'count', 'opened')
+
+    def __init__(self, text, event, ts):
+        self.text = text
+        self.event = event
+        self.first_ts = self.last_ts = ts
+        self.first_time = self.last_time = event.get('time')
+        self.count = 1
+        self.opened = time.monotonic()
+
+
+class Coalescer:
+    """Collapses repeated events per key and window, passing records to `emit(text, ts)`."""
+
+    def __init__(self, emit, window=COALESCE_WINDOW, calls=COALESCE_CALLS, max_keys=COALESCE_MAX_KEYS):
+        self.emit = emit
+        self.window = window
+        self.calls = frozenset(calls)
+        self.max_keys = max_keys
+        self.open = {}
+        self.lock = threading.Lock()
+        self.events_in = 0
+        self.records_out = 0
+        self.collapsed = 0
+
+    def add(self, text, event, ts):
+        self.events_in += 1
+        key = coalesce_key(event) if self.window > 0 else None
+        if key is None or key[0] not in self.calls:
+            self.records_out += 1
+            self.emit(text, ts)
+            return
+        with self.lock:
+            win = self.open.get(key)
+            if win is not None and ts is not None and win.first_ts is not None and ts - win.first_ts >= self.window:
+                # Event time moved past the window (e.g. replaying a file)
+                self._close(key)
+                win = None
+            if win is None:
+                if len(self.open) >= self.max_keys:
+                    # dicts keep insertion order, so this is the oldest window
+                    self._close(next(iter(self.open)))
+                self.open[key] = Window(text, event, ts)
+                return
+            win.count += 1
+            self.collapsed += 1
+            if ts is not None and (win.last_ts is None or ts > win.last_ts):
+                win.last_ts = ts
+                win.last_time = event.get('time', win.last_time)
+
+    def flush_expired(self):
+        """Close windows that have been open longer than the window (wall clock)."""
+        deadline = time.monotonic() - self.window
+        with self.lock:
+            for key in [k for k, w in self.open.items() if w.opened <= deadline]:
+                self._close(key)
+
+    def flush(self):
+        with self.lock:
+            for key in list(self.open):
+                self._close(key)
+
+    def _close(self, key):
+        win = self.open.pop(key)
+        self.records_out += 1
+        if win.count == 1:
+            self.emit(win.text, win.first_ts)
+            return
+        span = (win.last_ts - win.first_ts) if win.first_ts is not None and win.last_ts is not None else 0.0
+        event = win.event
+        event['coalesced'] = {
+            'count': win.count,
+            'first_time': win.first_time,
+            'last_time': win.last_time,
+            'rate_per_sec': round(win.count / span, 2) if span > 0 else None,
+            'window_seconds': self.window,
+        }
+        self.emit(json.dumps(event, separators=(',', ':')), win.first_ts)
+
+    def snapshot(self):
+        return {
+            'events_in': self.events_in,
+            'records_out': self.records_out,
+            'collapsed': self.collapsed,
+            'open_windows': len(self.open),
+        }
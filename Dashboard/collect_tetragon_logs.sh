@@ -1,36 +1,21 @@
 #!/usr/bin/env bash
-# Collect Tetragon logs and save to shared volume for dashboard
+# Collect Tetragon logs and save to shared volume for dashboard.
+# The parsing and batched writing is done by collector.py in a single
+# long-lived process; this wrapper only waits for Tetragon to come up.
 
-OUTPUT_FILE="/output/runtime_alerts.json"
-NAMESPACE="tetragon"
+NAMESPACE="${TETRAGON_NAMESPACE:-tetragon}"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
 echo "[+] Starting Tetragon log collection..."
 
-# Clear existing file
-> "$OUTPUT_FILE"
-
-# Stream Tetragon logs and extract JSON events.
-# Tetragon log lines look like:
-#   time="..." level=info msg="..." node_name="..." event={"process_kprobe":...}
-# OR the entire line is raw JSON (when --export-file-perm is used).
-# We handle both: try to parse the whole line as JSON first,
-# then fall back to extracting the last {...} object on the line.
-kubectl logs -n "$NAMESPACE" -l app.kubernetes.io/name=tetragon --follow --tail=1000 2>/dev/null | while IFS= read -r line; do
-  # Skip empty lines
-  [ -z "$line" ] && continue
+# Wait for Tetragon to be ready
+until kubectl get pods -n "$NAMESPACE" -l app.kubernetes.io/name=tetragon 2>/dev/null | grep -q Running; do
+  echo "Waiting for Tetragon pods..."
+  sleep 5
+done
 
-  # Try the whole line as JSON first (raw export mode)
-  if echo "$line" | python3 -c "import sys,json; json.load(sys.stdin)" 2>/dev/null; then
-    echo "$line" >> "$OUTPUT_FILE"
-    continue
-  fi
+echo "[+] Tetragon pods found, starting log collection..."
 
-  # Fall back: extract the JSON object from a structured log line.
-  # Tetragon structured logs embed the event as the last JSON blob.
-  json_part=$(echo "$line" | grep -oP '\{.*\}' | tail -1)
-  if [ -n "$json_part" ]; then
-    if echo "$json_part" | python3 -c "import sys,json; json.load(sys.stdin)" 2>/dev/null; then
-      echo "$json_part" >> "$OUTPUT_FILE"
-    fi
-  fi
-done
+# Each Tetragon pod is followed separately and resumed from its checkpoint,
+# so the existing log is kept across restarts (pass --truncate to clear it)
+exec python3 "$SCRIPT_DIR/collector.py" "$@"
@@ -0,0 +1,344 @@
+"""
+Tetragon log collector.
+
+Follows the Tetragon pod logs (or a local file / pipe) in a single long-lived
+process, extracts the JSON events in-process and appends them to the runtime
+log in batches. Replaces the old bash loop that forked python3/grep per line.
+
+By default every Tetragon pod is followed by its own asyncio task and resumes
+from a checkpoint after a restart (see pod_streams.py); `--mode merged` keeps
+the single `kubectl logs -l` stream.
+
+Usage:
+    python3 collector.py                              # follow each Tetragon pod
+    python3 collector.py --pods-dir streams/          # one <pod>.log file per pod
+    python3 collector.py --input tetragon.log         # replay a file
+    cat tetragon.log | python3 collector.py --input - # read from a pipe
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from events import parse_line, event_timestamp
+from segments import SegmentWriter
+from coalesce import Coalescer, COALESCE_WINDOW
+from pod_streams import Checkpoints, PodCollector, KubectlPods, DirectoryPods, CHECKPOINT_PATH
+
+OUTPUT_PATH = os.environ.get('RUNTIME_LOGS_PATH', '/output/runtime_alerts.json')
+SEGMENT_DIR = os.environ.get('RUNTIME_LOG_DIR', '/output/runtime_log')
+# 'segments' (rotated, indexed, compressed) or 'file' (single NDJSON file)
+STORAGE = os.environ.get('RUNTIME_STORAGE', 'segments')
+STATS_PATH = os.environ.get('COLLECTOR_STATS_PATH', '/output/collector_stats.json')
+NAMESPACE = os.environ.get('TETRAGON_NAMESPACE', 'tetragon')
+SELECTOR = 'app.kubernetes.io/name=tetragon'
+# 'per-pod' (one resumable stream per Tetragon pod) or 'merged' (one kubectl logs -l stream)
+MODE = os.environ.get('COLLECTOR_MODE', 'per-pod')
+
+BATCH_SIZE = int(os.environ.get('COLLECTOR_BATCH_SIZE', '500'))
+FLUSH_INTERVAL = float(os.environ.get('COLLECTOR_FLUSH_INTERVAL', '1.0'))
+REPORT_INTERVAL = float(os.environ.get('COLLECTOR_REPORT_INTERVAL', '10'))
+
+
+class BatchWriter:
+    """Buffers event lines and appends them to the output file in batches."""
+
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, truncate=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.bytes_written = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.f = open(path, 'w' if truncate else 'a', encoding='utf-8')
+
+    def write(self, text, ts=None):
+        with self.lock:
+            self.pending.append(text)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush_if_due(self):
+        with self.lock:
+            if self.pending and time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            data = '\n'.join(self.pending) + '\n'
+            self.f.write(data)
+            self.f.flush()
+            self.bytes_written += len(data)
+            self.batches += 1
+            self.pending = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+
+class CollectorStats:
+    """Throughput and lag counters for the collector."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.lines = 0
+        self.events = 0
+        self.skipped = 0
+        self.last_event_time = None
+        self.lag = None
+        self._window_start = time.monotonic()
+        self._window_events = 0
+        self.rate = 0.0
+
+    def record_event(self, ts):
+        self.events += 1
+        self._window_events += 1
+        if ts is not None:
+            self.last_event_time = ts
+            self.lag = max(0.0, time.time() - ts)
+
+    def roll_window(self):
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed > 0:
+            self.rate = self._window_events / elapsed
+        self._window_start = now
+        self._window_events = 0
+
+    def snapshot(self, writer=None, coalescer=None, pods=None):
+        elapsed = max(time.time() - self.started, 1e-9)
+        snap = {
+            'lines': self.lines,
+            'events': self.events,
+            'skipped': self.skipped,
+            'events_per_sec': round(self.rate, 1),
+            'avg_events_per_sec': round(self.events / elapsed, 1),
+            'lag_seconds': round(self.lag, 3) if self.lag is not None else None,
+            'last_event_time': self.last_event_time,
+            'uptime_seconds': round(elapsed, 1),
+            'timestamp': time.time(),
+        }
+        if writer is not None:
+            snap['batches'] = writer.batches
+            snap['bytes_written'] = writer.bytes_written
+        if coalescer is not None:
+            snap['coalesce'] = coalescer.snapshot()
+        if pods is not None:
+            snap['pods'] = pods.snapshot()
+        return snap
+
+
+def write_stats(path, snap):
+    """Write the stats snapshot atomically so readers never see a partial file."""
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snap, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[-] Could not write collector stats: {e}", file=sys.stderr)
+
+
+def report(stats, writer, stats_path, coalescer=None, pods=None):
+    stats.roll_window()
+    snap = stats.snapshot(writer, coalescer, pods)
+    write_stats(stats_path, snap)
+    lag = f"{snap['lag_seconds']}s" if snap['lag_seconds'] is not None else 'n/a'
+    print(f"[+] events={snap['events']} skipped={snap['skipped']} "
+          f"rate={snap['events_per_sec']}/s lag={lag}", flush=True)
+    return snap
+
+
+def collect(stream, writer, stats, stats_path=None, report_interval=REPORT_INTERVAL, coalescer=None):
+    """
+    Read log lines from `stream` until EOF, writing extracted events.
+    With a coalescer, bursts of DoS events are collapsed before writing.
+    """
+    stop = threading.Event()
+    sink = coalescer.add if coalescer is not None else None
+
+    def background():
+        # Flush on a timer so a quiet stream does not leave events buffered
+        next_report = time.monotonic() + report_interval
+        while not stop.wait(min(writer.flush_interval, report_interval)):
+            if coalescer is not None:
+                coalescer.flush_expired()
+            writer.flush_if_due()
+            if time.monotonic() >= next_report:
+                report(stats, writer, stats_path, coalescer)
+                next_report = time.monotonic() + report_interval
+
+    ticker = threading.Thread(target=background, daemon=True)
+    ticker.start()
+    try:
+        for line in stream:
+            stats.lines += 1
+            parsed = parse_line(line)
+            if parsed is None:
+                stats.skipped += 1
+                continue
+            text, event = parsed
+            ts = event_timestamp(event)
+            if sink is not None:
+                sink(text, event, ts)
+            else:
+                writer.write(text, ts)
+            stats.record_event(ts)
+    finally:
+        stop.set()
+        ticker.join()
+        if coalescer is not None:
+            coalescer.flush()
+        writer.flush()
+    return stats
+
+
+def collect_pods(pods, writer, stats_path=None, report_interval=REPORT_INTERVAL, coalescer=None):
+    """
+    Follow every pod of a PodCollector concurrently until interrupted (or,
+    for a non-following source, until every stream ends). Checkpoints are
+    saved only after the writer has flushed what they cover, so with
+    checkpoints the coalescer closes every open window at each save and
+    bursts are collapsed over at most the checkpoint interval.
+    """
+    stats, checkpoints = pods.stats, pods.checkpoints
+    next_report = [time.monotonic() + report_interval]
+
+    def tick():
+        if coalescer is not None:
+            # The checkpoint already covers buffered events; they must be
+            # written before it is saved or a crash would lose them
+            if checkpoints.path:
+                coalescer.flush()
+            else:
+                coalescer.flush_expired()
+        writer.flush()
+        if time.monotonic() >= next_report[0]:
+            report(stats, writer, stats_path, coalescer, pods)
+            next_report[0] = time.monotonic() + report_interval
+
+    try:
+        asyncio.run(pods.run(on_tick=tick))
+    finally:
+        if coalescer is not None:
+            coalescer.flush()
+        writer.flush()
+        checkpoints.save()
+
+
+def kubectl_stream(namespace=NAMESPACE, tail=1000):
+    """Start `kubectl logs --follow` across all Tetragon pods."""
+    return subprocess.Popen(
+        [
+            "kubectl", "logs", "-n", namespace, "-l", SELECTOR,
+            "--follow", f"--tail={tail}", "--max-log-requests=100",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        bufsize=1 << 16,
+    )
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect Tetragon events into the runtime log")
+    parser.add_argument('--input', help="read log lines from a file, or '-' for stdin (default: kubectl logs)")
+    parser.add_argument('--mode', choices=('per-pod', 'merged'), default=MODE,
+                        help="follow each Tetragon pod separately, or one merged kubectl stream")
+    parser.add_argument('--pods-dir', help="follow <pod>.log files in a directory instead of kubectl (per-pod mode)")
+    parser.add_argument('--no-follow', action='store_true', help="with --pods-dir, stop at the end of the files")
+    parser.add_argument('--checkpoint-file', default=CHECKPOINT_PATH,
+                        help="per-pod resume positions ('' to disable)")
+    parser.add_argument('--storage', choices=('segments', 'file'), default=STORAGE)
+    parser.add_argument('--segment-dir', default=SEGMENT_DIR, help="segment directory (segments storage)")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="runtime log to append events to (file storage)")
+    parser.add_argument('--stats-file', default=STATS_PATH, help="where to write throughput/lag stats ('' to disable)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL)
+    parser.add_argument('--report-interval', type=float, default=REPORT_INTERVAL)
+    parser.add_argument('--truncate', action='store_true',
+                        help="clear existing events (and per-pod checkpoints) before collecting")
+    parser.add_argument('--tail', type=int, default=1000,
+                        help="lines of history per pod when following kubectl without a checkpoint")
+    parser.add_argument('--coalesce-window', type=float, default=COALESCE_WINDOW,
+                        help="seconds to collapse repeated DoS events over (0 disables)")
+    args = parser.parse_args(argv)
+
+    if args.storage == 'segments':
+        writer = SegmentWriter(args.segment_dir, args.batch_size, args.flush_interval, truncate=args.truncate)
+    else:
+        writer = BatchWriter(args.output, args.batch_size, args.flush_interval, truncate=args.truncate)
+    stats = CollectorStats()
+    coalescer = Coalescer(writer.write, args.coalesce_window) if args.coalesce_window > 0 else None
+    proc = None
+
+    if not args.input and (args.pods_dir or args.mode == 'per-pod'):
+        if args.pods_dir:
+            source = DirectoryPods(args.pods_dir, follow=not args.no_follow)
+        else:
+            print("[+] Starting per-pod Tetragon log collection...", flush=True)
+            source = KubectlPods(NAMESPACE, SELECTOR, tail=args.tail)
+        sink = coalescer.add if coalescer is not None else (lambda text, event, ts: writer.write(text, ts))
+        pods = PodCollector(source, sink, stats, Checkpoints(args.checkpoint_file, reset=args.truncate))
+        # Stop cleanly on SIGTERM too, so the final checkpoint matches the log
+        signal.signal(signal.SIGTERM, interrupt)
+        try:
+            collect_pods(pods, writer, args.stats_file, args.report_interval, coalescer)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            writer.close()
+        snap = report(stats, writer, args.stats_file, coalescer, pods)
+        if args.pods_dir:
+            print(json.dumps(snap, indent=2))
+        return 0
+
+    if args.input == '-':
+        stream = sys.stdin
+    elif args.input:
+        stream = open(args.input, 'r', encoding='utf-8', errors='replace')
+    else:
+        print("[+] Starting Tetragon log collection...", flush=True)
+        proc = kubectl_stream(tail=args.tail)
+        stream = proc.stdout
+
+    try:
+        collect(stream, writer, stats, args.stats_file, args.report_interval, coalescer)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        if proc is not None:
+            proc.terminate()
+        elif stream is not sys.stdin:
+            stream.close()
+
+    snap = report(stats, writer, args.stats_file, coalescer)
+    if args.input:
+        print(json.dumps(snap, indent=2))
+    return 0 if proc is None else (proc.wait() or 0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Compliance results from many nodes.
+
+Each node's scan lives in NODE_RESULTS_DIR/<node>.json, written either by the
+scanner on that node or through the dashboard's upload endpoint. A file holds
+either the plain results list or
+
+    {"node": ..., "role": ..., "scanned_at": ..., "results": [...]}
+
+The store re-reads only files whose (inode, mtime, size) changed, processes
+each node once, and keeps cluster-wide per-check status counts up to date by
+subtracting a node's previous contribution and adding the new one.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+NODE_RESULTS_DIR = os.environ.get('NODE_RESULTS_DIR', '/output/nodes')
+NODE_NAME_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,252}$')
+
+
+def results_list(data):
+    """Find the list of check results in a results document."""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for k in ('findings', 'results', 'checks'):
+            if k in data and isinstance(data[k], list):
+                return data[k]
+        for v in data.values():
+            if isinstance(v, list):
+                return v
+    return []
+
+
+def valid_node_name(name):
+    return bool(name) and bool(NODE_NAME_RE.match(name))
+
+
+class NodeResultsStore:
+    def __init__(self, directory, process, normalize, on_load=None):
+        """
+        `process(results)` builds the per-node view (build_processed) and
+        `normalize(status)` maps raw statuses to PASS/FAIL/WARN/UNKNOWN.
+        `on_load(node, results, scanned_at, identity)` is called for every
+        node document read, e.g. to record it in the scan history.
+        """
+        self.directory = directory
+        self.process = process
+        self.normalize = normalize
+        self.on_load = on_load
+        self.lock = threading.Lock()
+        self.nodes = {}
+        # check_id -> Counter(status -> nodes)
+        self.check_counts = defaultdict(Counter)
+        self.descriptions = {}
+        self.version = None
+        self._cluster = {}
+        # node -> identity of the file that last failed to load
+        self.failed = {}
+
+    def _path(self, node):
+        return os.path.join(self.directory, f"{node}.json")
+
+    def refresh(self):
+        """Pick up new, changed and removed node files. Returns the store version."""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith('.json')]
+        except FileNotFoundError:
+            names = []
+        seen = {}
+        for name in names:
+            node = name[:-5]
+            if not valid_node_name(node):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            seen[node] = (st.st_ino, st.st_mtime_ns, st.st_size)
+        # Same files on every worker give the same version, so it can back an ETag
+        version = hashlib.sha1(repr(sorted(seen.items())).encode()).hexdigest()[:16]
+        with self.lock:
+            if version == self.version:
+                return version
+            for node in [n for n in self.nodes if n not in seen]:
+                self._apply(self.nodes.pop(node), -1)
+            failed = []
+            for node, identity in seen.items():
+                current = self.nodes.get(node)
+                if current is not None and current['identity'] == identity:
+                    continue
+                entry = self._load(node, identity)
+                if entry is None:
+                    failed.append(node)
+                    continue
+                if current is not None:
+                    self._apply(current, -1)
+                self.nodes[node] = entry
+                self._apply(entry, 1)
+            self._cluster = {}
+            if failed:
+                # Not recorded, so files read mid-write (or still malformed)
+                # are read again next time; the ETag differs from a full load
+                self.version = None
+                return f"{version}-{len(failed)}"
+            self.version = version
+        return version
+
+    def reload(self):
+        """Load every node file again on the next refresh, calling on_load for each."""
+        with self.lock:
+            self.version = None
+            for entry in self.nodes.values():
+                entry['identity'] = None
+
+    def _load(self, node, identity):
+        try:
+            with open(self._path(node), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # Logged once per file version, though retried on every refresh
+            if self.failed.get(node) != identity:
+                self.failed[node] = identity
+                print(f"[-] Could not load results for node {node}: {e}", flush=True)
+            return None
+        self.failed.pop(node, None)
+        results = results_list(data)
+        meta = data if isinstance(data, dict) else {}
+        statuses = {}
+        for item in results:
+            if isinstance(item, dict) and item.get('check_id'):
+                cid = str(item['check_id'])
+                statuses[cid] = self.normalize(item.get('status'))
+                if item.get('description'):
+                    self.descriptions.setdefault(cid, item['description'])
+        processed = self.process(results)
+        scanned_at = meta.get('scanned_at') or identity[1] / 1e9
+        if self.on_load is not None:
+            self.on_load(node, results, scanned_at, identity)
+        return {
+            'identity': identity,
+            'node': node,
+            'role': meta.get('role', 'unknown'),
+            'scanned_at': scanned_at,
+            'statuses': statuses,
+            'processed': processed,
+        }
+
+    def _apply(self, entry, sign):
+        for cid, status in entry['statuses'].items():
+            counts = self.check_counts[cid]
+            counts[status] += sign
+            if counts[status] <= 0:
+                del counts[status]
+            if not counts:
+                del self.check_counts[cid]
+
+    def save(self, node, payload):
+        """Store an uploaded results document for `node` atomically."""
+        if not valid_node_name(node):
+            raise ValueError(f"Invalid node name: {node}")
+        if not isinstance(payload, (list, dict)):
+            raise ValueError("Expected a results list or object")
+        if isinstance(payload, dict):
+            payload = dict(payload, node=node)
+            payload.setdefault('scanned_at', time.time())
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(node)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+        self.refresh()
+
+    @staticmethod
+    def _summary(entry):
+        counts = entry['processed']['summary']['counts']
+        return {
+            'node': entry['node'],
+            'role': entry['role'],
+            'scanned_at': entry['scanned_at'],
+            'total_checks': entry['processed']['summary']['total_checks'],
+            'counts': counts,
+            'fail': counts.get('FAIL', 0),
+        }
+
+    def summaries(self):
+        self.refresh()
+        with self.lock:
+            return sorted((self._summary(e) for e in self.nodes.values()), key=lambda s: s['node'])
+
+    def node(self, name):
+        """Processed results of one node, or None."""
+        self.refresh()
+        with self.lock:
+            entry = self.nodes.get(name)
+            return dict(self._summary(entry), processed=entry['processed']) if entry else None
+
+    def cluster(self, worst=10):
+        """Cluster-wide rollup, computed once per store version."""
+        version = self.refresh()
+        with self.lock:
+            cached = self._cluster.get(worst)
+            if cached is not None:
+                return cached
+            totals = Counter()
+            for entry in self.nodes.values():
+                totals.update(entry['processed']['summary']['counts'])
+            checks = []
+            for cid, counts in self.check_counts.items():
+                nodes = sum(counts.values())
+                checks.append({
+                    'check_id': cid,
+                    'description': self.descriptions.get(cid),
+                    'nodes': nodes,
+                    'counts': dict(counts),
+                    'pass_rate': round(counts.get('PASS', 0) / nodes, 4) if nodes else None,
+                })
+            checks.sort(key=lambda c: (c['pass_rate'] if c['pass_rate'] is not None else 1, c['check_id']))
+            worst_nodes = sorted(
+                (self._summary(e) for e in self.nodes.values()),
+                key=lambda s: (-s['fail'], s['node'])
+            )[:worst]
+            result = self._cluster[worst] = {
+                'version': version,
+                'nodes': len(self.nodes),
+                'roles': dict(Counter(e['role'] for e in self.nodes.values())),
+                'counts': dict(totals),
+                'checks': checks,
+                'worst_nodes': worst_nodes,
+            }
+            return result
@@ -0,0 +1,302 @@
+"""
+Compact in-memory store of recent runtime events.
+
+Each accepted event is reduced at ingest to a row of fixed-width columns
+(`array` typed arrays) whose string fields (binary, pod, namespace, node,
+event type, policy) are interned in a StringTable, so a repeated binary path
+or pod name costs four bytes per event instead of a new string. A row takes
+about 60 bytes against several kilobytes for the decoded JSON dict, which lets
+a small dashboard pod keep millions of recent events.
+
+Rows also keep the event's position in the runtime log (segment and byte
+offset); the full Tetragon payload is read back from the log only when it is
+asked for (`rehydrate`), many at a time, one pass per segment.
+
+The store is a ring of RUNTIME_STORE_CAPACITY rows: event ids increase
+forever and an id is valid while it is among the newest `capacity`.
+"""
+import json
+import os
+import posixpath
+import threading
+from array import array
+from datetime import datetime, timezone
+
+import segments
+from events import EVENT_TYPES, classify_event, severity_of, event_count, event_timestamp
+
+RUNTIME_STORE_CAPACITY = int(os.environ.get('RUNTIME_STORE_CAPACITY', '1000000'))
+
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+SEVERITY_CODES = {s: i for i, s in enumerate(SEVERITIES)}
+KINDS = EVENT_TYPES + ('unknown',)
+KIND_CODES = {k: i for i, k in enumerate(KINDS)}
+# Interned string columns
+STRING_COLUMNS = ('event_type', 'binary', 'binary_name', 'pod', 'namespace', 'node', 'policy', 'segment')
+
+
+def iso_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class StringTable:
+    """
+    Interns strings to small integer ids (0 is the empty string). Ids are
+    reference counted: release() frees an id once no row uses it, and freed
+    ids are reused, so the table only holds the strings of the rows in the
+    ring.
+    """
+
+    def __init__(self):
+        self.ids = {'': 0}
+        self.strings = ['']
+        self.refs = [0]
+        self.free = []
+
+    def intern(self, value):
+        if not value:
+            return 0
+        i = self.ids.get(value)
+        if i is None:
+            if self.free:
+                i = self.free.pop()
+                self.strings[i] = value
+            else:
+                i = len(self.strings)
+                self.strings.append(value)
+                self.refs.append(0)
+            self.ids[value] = i
+        self.refs[i] += 1
+        return i
+
+    def release(self, i):
+        if not i:
+            return
+        self.refs[i] -= 1
+        if self.refs[i] == 0:
+            del self.ids[self.strings[i]]
+            self.strings[i] = None
+            self.free.append(i)
+
+    def __getitem__(self, i):
+        return self.strings[i]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def extract(alert):
+    """The fields kept per event, pulled once from the type-specific body."""
+    kind = next((k for k in EVENT_TYPES if k in alert), 'unknown')
+    body = alert.get(kind) or {}
+    process = body.get('process') or {}
+    pod = process.get('pod') or {}
+    event_type, binary = classify_event(alert)
+    binary = binary if binary != 'unknown' else process.get('binary', '')
+    return {
+        'kind': kind,
+        'event_type': event_type,
+        'binary': binary,
+        'binary_name': posixpath.basename(binary),
+        'pod': pod.get('name', ''),
+        'namespace': pod.get('namespace', ''),
+        'node': alert.get('node_name', ''),
+        'policy': body.get('policy_name', ''),
+        'pid': process.get('pid') or 0,
+        'severity': severity_of(event_type),
+        'count': event_count(alert),
+    }
+
+
+class EventStore:
+    def __init__(self, capacity=RUNTIME_STORE_CAPACITY, location=None):
+        self.capacity = capacity
+        # Callable returning the (segment, offset) of the event being ingested
+        self.location = location
+        self.lock = threading.Lock()
+        self.strings = StringTable()
+        self.ts = array('d')
+        self.kind = array('B')
+        self.severity = array('B')
+        self.count = array('I')
+        self.pid = array('I')
+        self.offset = array('Q')
+        self.columns = {name: array('I') for name in STRING_COLUMNS}
+        # Id of the next event; ids below next_id - capacity have been overwritten
+        self.next_id = 0
+        # Secondary index kept in step with the ring (facets.FacetIndex)
+        self.index = None
+
+    def __call__(self, alert):
+        ts = event_timestamp(alert)
+        fields = extract(alert)
+        segment, offset = self.location() if self.location is not None else ('', 0)
+        fields['segment'] = segment
+        intern = self.strings.intern
+        with self.lock:
+            slot = self.next_id % self.capacity
+            values = (
+                (self.ts, ts or 0.0),
+                (self.kind, KIND_CODES[fields['kind']]),
+                (self.severity, SEVERITY_CODES[fields['severity']]),
+                (self.count, min(fields['count'], 0xFFFFFFFF)),
+                (self.pid, fields['pid'] & 0xFFFFFFFF if isinstance(fields['pid'], int) else 0),
+                (self.offset, offset),
+            ) + tuple((self.columns[name], intern(fields[name])) for name in STRING_COLUMNS)
+            if slot == len(self.ts):
+                for column, value in values:
+                    column.append(value)
+            else:
+                if self.index is not None:
+                    self.index.remove(self.next_id - self.capacity, slot)
+                replaced = [self.columns[name][slot] for name in STRING_COLUMNS]
+                for column, value in values:
+                    column[slot] = value
+                # After the new row took its references, so a shared string stays put
+                for sid in replaced:
+                    self.strings.release(sid)
+            if self.index is not None:
+                self.index.add(self.next_id, slot)
+            self.next_id += 1
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def oldest_id(self):
+        return max(0, self.next_id - self.capacity)
+
+    def _slot(self, event_id):
+        if event_id < self.oldest_id or event_id >= self.next_id:
+            return None
+        return event_id % self.capacity
+
+    def row(self, event_id):
+        """Compact dict for one event id, or None if it is no longer held."""
+        with self.lock:
+            slot = self._slot(event_id)
+            return None if slot is None else self._row(event_id, slot)
+
+    def _row(self, event_id, slot):
+        s = self.strings
+        c = self.columns
+        ts = self.ts[slot]
+        return {
+            'id': event_id,
+            'time': iso_time(ts) if ts else None,
+            'type': KINDS[self.kind[slot]],
+            'event_type': s[c['event_type'][slot]],
+            'binary': s[c['binary'][slot]],
+            'pod': s[c['pod'][slot]],
+            'namespace': s[c['namespace'][slot]],
+            'node': s[c['node'][slot]],
+            'policy': s[c['policy'][slot]],
+            'pid': self.pid[slot],
+            'severity': SEVERITIES[self.severity[slot]],
+            'count': self.count[slot],
+        }
+
+    def newest_ids(self, limit, since=None, until=None, match=None, after=None):
+        """
+        Ids of the newest events (newest first) within [since, until] that
+        satisfy match(slot), if given, and are newer than the id `after`.
+        Events are held in ingest order, which is time order up to small
+        reorderings across pods.
+        """
+        out = []
+        with self.lock:
+            event_id = self.next_id - 1
+            oldest = self.oldest_id if after is None else max(self.oldest_id, after + 1)
+            while event_id >= oldest and len(out) < limit:
+                slot = event_id % self.capacity
+                ts = self.ts[slot]
+                if (since is None or ts >= since) and (until is None or ts <= until) \
+                        and (match is None or match(slot)):
+                    out.append(event_id)
+                event_id -= 1
+        return out
+
+    def covers(self, since):
+        """True if every ingested event at or after `since` is still held."""
+        with self.lock:
+            if self.next_id <= self.capacity:
+                return True
+            oldest = self.ts[self.oldest_id % self.capacity]
+            return since is not None and since > oldest
+
+    def rows(self, ids):
+        with self.lock:
+            return [self._row(i, self._slot(i)) for i in ids if self._slot(i) is not None]
+
+    def locations(self, ids):
+        """{id: (segment, offset, ts)} for the ids still held."""
+        with self.lock:
+            out = {}
+            for i in ids:
+                slot = self._slot(i)
+                if slot is not None:
+                    out[i] = (self.strings[self.columns['segment'][slot]], self.offset[slot], self.ts[slot])
+            return out
+
+    def rehydrate(self, ids, log_dir, log_path):
+        """
+        Full Tetragon payloads for event ids, read back from the runtime log.
+        Returns {id: dict}; events whose segment was dropped are missing.
+        """
+        return read_payloads(self.locations(ids), log_dir, log_path)
+
+    def recent(self, limit):
+        """Newest rows with their log locations, for sharing with other workers."""
+        ids = self.newest_ids(limit)
+        locations = self.locations(ids)
+        rows = [dict(r, loc=list(locations[r['id']])) for r in self.rows(ids) if r['id'] in locations]
+        return {'rows': rows, 'complete': self.next_id <= limit, 'next_id': self.next_id}
+
+    def memory(self):
+        """Approximate bytes held by the columns and the string table."""
+        with self.lock:
+            arrays = [self.ts, self.kind, self.severity, self.count, self.pid, self.offset] + list(self.columns.values())
+            column_bytes = sum(a.itemsize * len(a) for a in arrays)
+            string_bytes = sum(len(v) + 49 for v in self.strings.ids)
+            return {
+                'events': len(self.ts),
+                'capacity': self.capacity,
+                'oldest_id': self.oldest_id,
+                'next_id': self.next_id,
+                'strings': len(self.strings),
+                'column_bytes': column_bytes,
+                'string_bytes': string_bytes,
+                'bytes_per_event': round((column_bytes + string_bytes) / len(self.ts), 1) if self.ts else None,
+            }
+
+
+def read_payloads(locations, log_dir, log_path):
+    """Decode the log lines at {id: (segment, offset, ts)}, one pass per segment."""
+    by_source = {}
+    for event_id, (source, offset, ts) in locations.items():
+        by_source.setdefault(source, []).append((offset, event_id, ts))
+    entries = {e['name']: e for e in segments.load_index(log_dir)} if segments.is_segment_dir(log_dir) else {}
+    out = {}
+    for source, wanted in by_source.items():
+        if source:
+            entry = entries.get(source)
+            f = segments.open_segment(log_dir, entry) if entry is not None else None
+        else:
+            try:
+                f = open(log_path, 'rb')
+            except OSError:
+                f = None
+        if f is None:
+            continue
+        with f:
+            # Ascending offsets: gzip segments only ever seek forward
+            for offset, event_id, ts in sorted(wanted):
+                try:
+                    f.seek(offset)
+                    payload = json.loads(f.readline())
+                except (OSError, ValueError):
+                    continue
+                # A replaced legacy file can hold a different event at the offset
+                if isinstance(payload, dict) and (event_timestamp(payload) or 0.0) == ts:
+                    out[event_id] = payload
+    return out
@@ -0,0 +1,204 @@
+"""
+Helpers for Tetragon events shared by the log collector and the dashboard.
+
+Tetragon log lines come in two shapes:
+  - raw JSON, one event per line (export mode)
+  - structured log lines that embed the event as the last JSON object:
+      time="..." level=info msg="..." node_name="..." event={"process_kprobe":...}
+"""
+import calendar
+import json
+from datetime import datetime, timezone
+
+EVENT_TYPES = ('process_tracepoint', 'process_kprobe', 'process_exec', 'process_exit')
+
+_decode = json.JSONDecoder().decode
+_last_second = (None, 0)
+
+
+def parse_line(line):
+    """
+    Extract the event from a Tetragon log line.
+    Returns (json_text, event_dict), or None when the line holds no JSON object.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    # Raw JSON export mode: the whole line is the event
+    if line[0] == '{':
+        try:
+            event = _decode(line)
+            if isinstance(event, dict):
+                return line, event
+        except ValueError:
+            pass
+
+    # Structured log line: take everything from the event marker (or the
+    # first brace) up to the last brace, same as the old grep -oP '\{.*\}'
+    start = line.find('event={')
+    start = start + 6 if start >= 0 else line.find('{')
+    end = line.rfind('}')
+    if start < 0 or end <= start:
+        return None
+    text = line[start:end + 1]
+    try:
+        event = _decode(text)
+    except ValueError:
+        return None
+    if not isinstance(event, dict):
+        return None
+    return text, event
+
+
+def parse_time(value):
+    """
+    Convert a Tetragon RFC3339 timestamp ("2024-05-01T12:34:56.123456789Z")
+    to epoch seconds. Returns None if the value cannot be parsed.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    global _last_second
+    base = value[:19]
+    # Events in a burst share the same second, so remember the last one
+    cached_base, seconds = _last_second
+    if base != cached_base:
+        try:
+            seconds = calendar.timegm((
+                int(base[0:4]), int(base[5:7]), int(base[8:10]),
+                int(base[11:13]), int(base[14:16]), int(base[17:19]), 0, 0, 0
+            ))
+        except (ValueError, IndexError):
+            return _parse_time_slow(value)
+        _last_second = (base, seconds)
+
+    rest = value[19:]
+    if rest in ('Z', ''):
+        return float(seconds)
+    if rest[0] == '.' and rest[-1] == 'Z':
+        frac = rest[1:-1]
+        if frac.isdigit():
+            return seconds + int(frac) / (10 ** len(frac))
+    return _parse_time_slow(value)
+
+
+def rfc3339(ts):
+    """Epoch seconds as a Tetragon-style timestamp with nanoseconds (the inverse of parse_time)."""
+    seconds = int(ts)
+    text = datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.')
+    return f"{text}{int((ts - seconds) * 1e9):09d}Z"
+
+
+def _parse_time_slow(value):
+    """Fallback for timestamps with explicit offsets or unusual precision."""
+    text = value.replace('Z', '+00:00')
+    head, dot, tail = text.partition('.')
+    if dot:
+        # datetime only understands up to microseconds
+        digits = ''.join(c for c in tail if c.isdigit())
+        tz = tail[len(digits):]
+        text = f"{head}.{digits[:6].ljust(6, '0')}{tz}"
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return None
+
+
+def event_timestamp(event):
+    """Epoch seconds of an event's `time` field, or None."""
+    return parse_time(event.get('time'))
+
+
+def event_count(event):
+    """Number of raw events a record stands for (collapsed bursts count more than one)."""
+    coalesced = event.get('coalesced')
+    if coalesced:
+        return coalesced.get('count', 1)
+    return 1
+
+
+def event_type(event):
+    """Return the Tetragon event type key of an event, or None."""
+    for key in EVENT_TYPES:
+        if key in event:
+            return key
+    return None
+
+
+# Severity keywords, matched as substrings of the lowercased event type
+CRITICAL_KEYWORDS = [
+    'setuid', 'capset', 'sigkill', 'mount',
+    'setns', 'unshare',                          # namespace/container escape
+    'security_inode_unlink',                     # file deletion at LSM
+    'security_inode_rename',                     # file rename at LSM
+    '__x64_sys_setns', '__x64_sys_unshare',
+]
+HIGH_KEYWORDS = [
+    'clone', 'accept', 'connect', 'bind',        # DoS / network (tracepoint call names)
+    'security_socket_connect',                   # socket connect LSM
+    'fd_install',                                # fd creation (DoS)
+    'security_bprm_check',                       # binary exec check
+]
+MEDIUM_KEYWORDS = [
+    'execve', 'x64_sys_execve',                  # process execution
+    '__x64_sys_execve',
+    'chmod', 'fchmodat',                         # permission changes
+    'chown', 'fchownat',                         # ownership changes
+    'security_file_open',                        # file open LSM
+]
+
+_severity_cache = {}
+
+
+# Prefixes of syscall kprobe symbols (__x64_sys_setns) and tracepoints
+# (sys_enter_setns) around the bare syscall name
+SYSCALL_PREFIXES = ('__x64_sys_', '__arm64_sys_', '__ia32_sys_', 'sys_enter_', 'sys_exit_', 'sys_')
+
+
+def call_key(name):
+    """The bare syscall name of a kprobe or tracepoint call, e.g. setns."""
+    for prefix in SYSCALL_PREFIXES:
+        if name.startswith(prefix):
+            return name[len(prefix):]
+    return name
+
+
+def classify_event(alert):
+    """Return (event_type, process_name) for an alert, as shown in the dashboard."""
+    if 'process_tracepoint' in alert:
+        tp = alert['process_tracepoint']
+        # Tetragon tracepoint: subsys="syscalls", call="sys_enter_clone"
+        call = tp.get('call') or tp.get('event') or 'unknown'
+        subsys = tp.get('subsys', '')
+        event_type = call if call != 'unknown' else (f"{subsys}/{call}" if subsys else 'unknown')
+        process_name = tp.get('process', {}).get('binary', 'unknown')
+    elif 'process_exec' in alert:
+        event_type = 'execve'
+        process_name = alert['process_exec'].get('process', {}).get('binary', 'unknown')
+    elif 'process_kprobe' in alert:
+        event_type = alert['process_kprobe'].get('function_name', 'kprobe')
+        process_name = alert['process_kprobe'].get('process', {}).get('binary', 'unknown')
+    else:
+        event_type = 'unknown'
+        process_name = 'unknown'
+    return event_type, process_name
+
+
+def severity_of(event_type):
+    """Determine severity based on event type / function name."""
+    severity = _severity_cache.get(event_type)
+    if severity is not None:
+        return severity
+    event_lower = event_type.lower()
+    if any(x in event_lower for x in CRITICAL_KEYWORDS):
+        severity = 'critical'
+    elif any(x in event_lower for x in HIGH_KEYWORDS):
+        severity = 'high'
+    elif any(x in event_lower for x in MEDIUM_KEYWORDS):
+        severity = 'medium'
+    else:
+        severity = 'low'
+    # Event types come from a small fixed set of policies
+    if len(_severity_cache) < 10000:
+        _severity_cache[event_type] = severity
+    return severity
@@ -0,0 +1,329 @@
+"""
+Faceted search over the event store.
+
+FacetIndex keeps, for every value of namespace, pod, node, binary basename,
+event type and policy, the ascending ids of the stored events that carry it
+(a posting list). It is updated by the EventStore as rows are written and
+overwritten, so a query is answered by intersecting and merging posting
+lists, and facet counts by reading the interned columns of the matching
+ids - never by scanning or decoding events.
+
+Queries combine `facet:value` terms with AND, OR, NOT and parentheses
+(adjacent terms are ANDed):
+
+    namespace:prod AND (binary:curl OR binary:wget) NOT pod:debug-0
+"""
+import posixpath
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# Query facet -> EventStore string column
+FACETS = {
+    'namespace': 'namespace',
+    'pod': 'pod',
+    'node': 'node',
+    'binary': 'binary_name',
+    'event_type': 'event_type',
+    'policy': 'policy',
+}
+
+TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|([\w.\-]+):(?:"([^"]*)"|([^\s()]+))|(\S+))')
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if m is None:
+            break
+        pos = m.end()
+        lparen, rparen, facet, quoted, bare, word = m.groups()
+        if lparen:
+            tokens.append(('(',))
+        elif rparen:
+            tokens.append((')',))
+        elif facet:
+            if facet not in FACETS:
+                raise ValueError(f"Unknown facet '{facet}' (expected one of {', '.join(FACETS)})")
+            tokens.append(('term', facet, quoted if quoted is not None else bare))
+        elif word.upper() in ('AND', 'OR', 'NOT'):
+            tokens.append((word.upper(),))
+        else:
+            raise ValueError(f"Expected facet:value, got '{word}'")
+    return tokens
+
+
+def parse_query(text):
+    """
+    Parse a facet query into a tree of ('term', facet, value), ('and', [...]),
+    ('or', [...]) and ('not', node). Returns None for an empty query.
+    """
+    tokens = tokenize(text or '')
+    if not tokens:
+        return None
+    pos = 0
+
+    def peek():
+        return tokens[pos][0] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        parts = [parse_and()]
+        while peek() == 'OR':
+            take()
+            parts.append(parse_and())
+        return parts[0] if len(parts) == 1 else ('or', parts)
+
+    def parse_and():
+        parts = [parse_not()]
+        while peek() in ('AND', 'NOT', 'term', '('):
+            if peek() == 'AND':
+                take()
+            parts.append(parse_not())
+        return parts[0] if len(parts) == 1 else ('and', parts)
+
+    def parse_not():
+        if peek() == 'NOT':
+            take()
+            return ('not', parse_not())
+        if peek() == '(':
+            take()
+            node = parse_or()
+            if peek() != ')':
+                raise ValueError("Missing ')' in query")
+            take()
+            return node
+        if peek() == 'term':
+            return take()
+        raise ValueError(f"Unexpected {'end of query' if peek() is None else repr(tokens[pos][0])}")
+
+    node = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected {tokens[pos][0]!r} in query")
+    return node
+
+
+def query_from_params(q, params):
+    """Combine a `q` expression with per-facet params (`pod=a,b`: OR within, AND across)."""
+    parts = []
+    parsed = parse_query(q)
+    if parsed is not None:
+        parts.append(parsed)
+    for facet in FACETS:
+        values = [v for v in (params.get(facet) or '').split(',') if v]
+        if values:
+            terms = [('term', facet, v) for v in values]
+            parts.append(terms[0] if len(terms) == 1 else ('or', terms))
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ('and', parts)
+
+
+def format_query(node):
+    if node is None:
+        return ''
+    op = node[0]
+    if op == 'term':
+        value = node[2]
+        return f'{node[1]}:"{value}"' if re.search(r'[\s()"]', value) or not value else f'{node[1]}:{value}'
+    if op == 'not':
+        return f"NOT {format_query(node[1])}"
+    joined = f" {op.upper()} ".join(
+        f"({format_query(p)})" if p[0] in ('and', 'or') else format_query(p) for p in node[1])
+    return joined
+
+
+def intersect(a, b):
+    """Ids in both ascending sequences, ascending."""
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return []
+    if len(b) > 16 * len(a):
+        out = []
+        n = len(b)
+        for x in a:
+            i = bisect_left(b, x)
+            if i < n and b[i] == x:
+                out.append(x)
+        return out
+    members = set(b)
+    return [x for x in a if x in members]
+
+
+def union(lists):
+    if len(lists) == 1:
+        return lists[0]
+    merged = set()
+    for ids in lists:
+        merged.update(ids)
+    return sorted(merged)
+
+
+def difference(a, b):
+    if not b:
+        return a
+    excluded = set(b)
+    return [x for x in a if x not in excluded]
+
+
+def row_value(row, facet):
+    if facet == 'binary':
+        return posixpath.basename(row.get('binary') or '')
+    return row.get(facet) or ''
+
+
+def match_row(node, row):
+    """Evaluate a query against one compact row (for rows outside the index)."""
+    op = node[0]
+    if op == 'term':
+        return row_value(row, node[1]) == node[2]
+    if op == 'not':
+        return not match_row(node[1], row)
+    if op == 'and':
+        return all(match_row(p, row) for p in node[1])
+    return any(match_row(p, row) for p in node[1])
+
+
+def count_rows(rows, facets, top):
+    """Facet counts over compact rows, in the same shape as FacetIndex.search."""
+    out = {}
+    for facet in facets:
+        counts = Counter(row_value(r, facet) for r in rows)
+        counts.pop('', None)
+        out[facet] = top_values(counts.items(), top, len(counts))
+    return out
+
+
+def top_values(items, top, distinct):
+    ranked = sorted(items, key=lambda kv: (-kv[1], kv[0]))[:top]
+    return {'values': [{'value': v, 'count': c} for v, c in ranked], 'distinct': distinct}
+
+
+class FacetIndex:
+    """
+    Posting lists over an EventStore's string columns. All access happens
+    under the store's lock: the store calls add/remove while writing a row.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        # column -> {string id: [array of ascending event ids, index of first live id]}
+        self.postings = {column: {} for column in FACETS.values()}
+        with store.lock:
+            store.index = self
+            for event_id in range(store.oldest_id, store.next_id):
+                self.add(event_id, event_id % store.capacity)
+
+    def add(self, event_id, slot):
+        columns = self.store.columns
+        for column, postings in self.postings.items():
+            sid = columns[column][slot]
+            if sid:
+                entry = postings.get(sid)
+                if entry is None:
+                    postings[sid] = [array('Q', (event_id,)), 0]
+                else:
+                    entry[0].append(event_id)
+
+    def remove(self, event_id, slot):
+        """Drop the oldest event (always the head of its posting lists) before its slot is reused."""
+        columns = self.store.columns
+        for column, postings in self.postings.items():
+            sid = columns[column][slot]
+            entry = postings.get(sid) if sid else None
+            if entry is None or entry[0][entry[1]] != event_id:
+                continue
+            entry[1] += 1
+            ids = entry[0]
+            if entry[1] == len(ids):
+                del postings[sid]
+            elif entry[1] > 4096 and entry[1] * 2 > len(ids):
+                del ids[:entry[1]]
+                entry[1] = 0
+
+    def _posting(self, facet, value):
+        column = FACETS[facet]
+        sid = self.store.strings.ids.get(value)
+        entry = self.postings[column].get(sid) if sid else None
+        if entry is None:
+            return array('Q')
+        return entry[0][entry[1]:]
+
+    def _evaluate(self, node):
+        """(negated, ascending ids): negated results stand for every id except those."""
+        op = node[0]
+        if op == 'term':
+            return False, self._posting(node[1], node[2])
+        if op == 'not':
+            negated, ids = self._evaluate(node[1])
+            return not negated, ids
+        parts = [self._evaluate(p) for p in node[1]]
+        positive = [ids for negated, ids in parts if not negated]
+        negative = [ids for negated, ids in parts if negated]
+        if op == 'and':
+            if not positive:
+                # NOT a AND NOT b = NOT (a OR b)
+                return True, union(negative)
+            positive.sort(key=len)
+            result = positive[0]
+            for ids in positive[1:]:
+                result = intersect(result, ids)
+            for ids in negative:
+                result = difference(result, ids)
+            return False, result
+        if not negative:
+            return False, union(positive)
+        # a OR NOT b OR NOT c = NOT ((b AND c) minus a)
+        excluded = negative[0]
+        for ids in negative[1:]:
+            excluded = intersect(excluded, ids)
+        return True, difference(excluded, union(positive)) if positive else excluded
+
+    def search(self, query, since=None, until=None, limit=100, facets=tuple(FACETS), top=20):
+        """
+        Ids of the newest `limit` matching events (newest first), the total
+        number of matches and facet counts over all matches.
+        """
+        store = self.store
+        with store.lock:
+            everything = range(store.oldest_id, store.next_id)
+            if query is None:
+                ids = everything
+            else:
+                negated, ids = self._evaluate(query)
+                if negated:
+                    ids = difference(everything, ids)
+            if since is not None or until is not None:
+                ts, capacity = store.ts, store.capacity
+                ids = [i for i in ids if (since is None or ts[i % capacity] >= since)
+                       and (until is None or ts[i % capacity] <= until)]
+            counts = {}
+            for facet in facets:
+                column = FACETS[facet]
+                if ids is everything:
+                    # Unfiltered: the posting list lengths are the counts
+                    items = [(store.strings[sid], len(e[0]) - e[1]) for sid, e in self.postings[column].items()]
+                    counts[facet] = top_values(items, top, len(items))
+                else:
+                    values = store.columns[column]
+                    capacity = store.capacity
+                    tally = Counter(values[i % capacity] for i in ids)
+                    tally.pop(0, None)
+                    counts[facet] = top_values(((store.strings[sid], c) for sid, c in tally.items()), top, len(tally))
+            newest = list(ids[-limit:])[::-1] if limit else []
+            return {'ids': newest, 'total': len(ids), 'facets': counts}
+
+    def memory(self):
+        with self.store.lock:
+            lists = sum(len(p) for p in self.postings.values())
+            ids = sum(len(e[0]) for p in self.postings.values() for e in p.values())
+            return {'posting_lists': lists, 'posting_bytes': ids * 8}
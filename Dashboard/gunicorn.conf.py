@@ -0,0 +1,31 @@
+"""
+Production server settings: gunicorn -c gunicorn.conf.py app:app
+
+Each worker is a process with a pool of threads, so slow or long-lived
+requests do not block other users. Runtime ingestion happens in one elected
+worker and is shared with the others through SHARED_STATE_DIR (see shared.py).
+On SIGTERM workers stop accepting connections and finish in-flight requests
+within graceful_timeout.
+"""
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get('DASHBOARD_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+worker_class = 'gthread'
+threads = int(os.environ.get('DASHBOARD_THREADS', '8'))
+timeout = int(os.environ.get('DASHBOARD_TIMEOUT', '120'))
+graceful_timeout = int(os.environ.get('DASHBOARD_GRACEFUL_TIMEOUT', '25'))
+keepalive = 5
+accesslog = os.environ.get('DASHBOARD_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Workers inherit this when they import the app
+os.environ.setdefault('SHARED_STATE_DIR', '/dev/shm/k8s-dashboard')
+
+
+def worker_exit(server, worker):
+    dashboard = sys.modules.get('app')
+    if dashboard is not None:
+        dashboard.shutdown()
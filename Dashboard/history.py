@@ -0,0 +1,347 @@
+"""
+History of completed compliance scans.
+
+Every scan seen by the dashboard (results.json or a node upload) is stored in
+a SQLite database as one row per check per run. Each row is a small integer
+status plus ids into a table of deduplicated texts (descriptions and
+reasons), so thousands of runs stay compact. Indexes on (source, time) and
+(check, run) keep trend and diff queries to a few index lookups.
+
+Scans are written by a ScanRecorder running in one process (the leader),
+once per new results file; request handlers only read.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', '/output/history.db')
+# Source name for the single results.json produced by the scan Job
+DEFAULT_SOURCE = 'default'
+# How often the recorder looks for a new results.json
+SCAN_RECORD_INTERVAL = float(os.environ.get('SCAN_RECORD_INTERVAL', '2'))
+
+STATUS_CODES = {'PASS': 0, 'WARN': 1, 'UNKNOWN': 2, 'FAIL': 3}
+STATUS_NAMES = {v: k for k, v in STATUS_CODES.items()}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    fingerprint TEXT NOT NULL UNIQUE,
+    total INTEGER NOT NULL,
+    pass INTEGER NOT NULL,
+    fail INTEGER NOT NULL,
+    warn INTEGER NOT NULL,
+    unknown INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_source_time ON runs (source, completed_at);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (completed_at);
+CREATE TABLE IF NOT EXISTS texts (
+    id INTEGER PRIMARY KEY,
+    digest BLOB NOT NULL UNIQUE,
+    body TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checks (
+    id INTEGER PRIMARY KEY,
+    check_id TEXT NOT NULL UNIQUE,
+    description_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL,
+    check_pk INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    reason_id INTEGER,
+    PRIMARY KEY (run_id, check_pk)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_by_check ON results (check_pk, run_id);
+"""
+
+
+class ScanHistory:
+    def __init__(self, path=HISTORY_DB_PATH, normalize=None):
+        self.path = path
+        self.normalize = normalize or (lambda s: str(s or 'UNKNOWN').upper())
+        self._local = threading.local()
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            with self._init_lock:
+                if not self._ready:
+                    db.executescript(SCHEMA)
+                    self._ready = True
+        return db
+
+    def _text_id(self, db, cache, text):
+        if not text:
+            return None
+        if not isinstance(text, str):
+            text = str(text)
+        if text in cache:
+            return cache[text]
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        db.execute('INSERT OR IGNORE INTO texts (digest, body) VALUES (?, ?)', (digest, text))
+        tid = cache[text] = db.execute('SELECT id FROM texts WHERE digest = ?', (digest,)).fetchone()[0]
+        return tid
+
+    def record(self, results, source=DEFAULT_SOURCE, completed_at=None, fingerprint=None):
+        """
+        Store one completed scan. `fingerprint` identifies the scan (e.g. the
+        results file identity) so recording it again is a no-op. Returns the
+        run id, or None if it was already stored.
+        """
+        rows = {}
+        for item in results:
+            if isinstance(item, dict) and item.get('check_id'):
+                rows[str(item['check_id'])] = item
+        if fingerprint is None:
+            fingerprint = hashlib.sha1(repr(sorted(
+                (cid, self.normalize(r.get('status')), str(r.get('reason'))) for cid, r in rows.items()
+            )).encode('utf-8')).hexdigest()
+        fingerprint = f"{source}:{fingerprint}"
+        counts = dict.fromkeys(STATUS_CODES, 0)
+        statuses = {}
+        for cid, item in rows.items():
+            status = self.normalize(item.get('status'))
+            status = status if status in STATUS_CODES else 'UNKNOWN'
+            statuses[cid] = status
+            counts[status] += 1
+
+        db = self._db()
+        with db:
+            cur = db.execute(
+                'INSERT OR IGNORE INTO runs (source, completed_at, fingerprint, total, pass, fail, warn, unknown) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (source, completed_at or time.time(), fingerprint, len(rows),
+                 counts['PASS'], counts['FAIL'], counts['WARN'], counts['UNKNOWN'])
+            )
+            if cur.rowcount == 0:
+                return None
+            run_id = cur.lastrowid
+            texts = {}
+            known = dict(db.execute('SELECT check_id, id FROM checks'))
+            values = []
+            for cid, item in rows.items():
+                pk = known.get(cid)
+                if pk is None:
+                    pk = db.execute(
+                        'INSERT INTO checks (check_id, description_id) VALUES (?, ?)',
+                        (cid, self._text_id(db, texts, item.get('description')))
+                    ).lastrowid
+                values.append((run_id, pk, STATUS_CODES[statuses[cid]], self._text_id(db, texts, item.get('reason'))))
+            db.executemany('INSERT INTO results (run_id, check_pk, status, reason_id) VALUES (?, ?, ?, ?)', values)
+        return run_id
+
+    @staticmethod
+    def _run_dict(row):
+        rid, source, completed_at, total, passed, failed, warn, unknown = row
+        return {
+            'id': rid, 'source': source, 'completed_at': completed_at, 'total': total,
+            'counts': {'PASS': passed, 'FAIL': failed, 'WARN': warn, 'UNKNOWN': unknown},
+        }
+
+    def runs(self, source=None, since=None, until=None, limit=100):
+        """Runs newest first, optionally for one source and time range."""
+        sql = 'SELECT id, source, completed_at, total, pass, fail, warn, unknown FROM runs WHERE 1=1'
+        args = []
+        if source:
+            sql += ' AND source = ?'
+            args.append(source)
+        if since is not None:
+            sql += ' AND completed_at >= ?'
+            args.append(since)
+        if until is not None:
+            sql += ' AND completed_at <= ?'
+            args.append(until)
+        sql += ' ORDER BY completed_at DESC, id DESC LIMIT ?'
+        args.append(limit)
+        return [self._run_dict(r) for r in self._db().execute(sql, args)]
+
+    def sources(self):
+        return [r[0] for r in self._db().execute('SELECT DISTINCT source FROM runs ORDER BY source')]
+
+    def trend(self, check_id, source=None, since=None, until=None, limit=100):
+        """Status of one check in each run, newest first."""
+        db = self._db()
+        row = db.execute(
+            'SELECT c.id, t.body FROM checks c LEFT JOIN texts t ON t.id = c.description_id WHERE c.check_id = ?',
+            (check_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        check_pk, description = row
+        sql = ('SELECT r.id, r.source, r.completed_at, res.status, t.body FROM results res '
+               'JOIN runs r ON r.id = res.run_id LEFT JOIN texts t ON t.id = res.reason_id '
+               'WHERE res.check_pk = ?')
+        args = [check_pk]
+        if source:
+            sql += ' AND r.source = ?'
+            args.append(source)
+        if since is not None:
+            sql += ' AND r.completed_at >= ?'
+            args.append(since)
+        if until is not None:
+            sql += ' AND r.completed_at <= ?'
+            args.append(until)
+        sql += ' ORDER BY res.run_id DESC LIMIT ?'
+        args.append(limit)
+        points = [
+            {'run_id': rid, 'source': src, 'completed_at': ts, 'status': STATUS_NAMES[status], 'reason': reason}
+            for rid, src, ts, status, reason in db.execute(sql, args)
+        ]
+        return {'check_id': check_id, 'description': description, 'points': points}
+
+    def latest_pair(self, source=DEFAULT_SOURCE):
+        """Ids of the two most recent runs of a source (previous, latest)."""
+        ids = [r[0] for r in self._db().execute(
+            'SELECT id FROM runs WHERE source = ? ORDER BY completed_at DESC, id DESC LIMIT 2', (source,)
+        )]
+        if len(ids) < 2:
+            return None, ids[0] if ids else None
+        return ids[1], ids[0]
+
+    def _statuses(self, db, run_id):
+        return {
+            check_pk: (status, reason)
+            for check_pk, status, reason in db.execute(
+                'SELECT res.check_pk, res.status, t.body FROM results res '
+                'LEFT JOIN texts t ON t.id = res.reason_id WHERE res.run_id = ?', (run_id,)
+            )
+        }
+
+    def diff(self, from_run, to_run):
+        """
+        Checks whose status changed between two runs. A move to a worse
+        status (PASS < WARN < UNKNOWN < FAIL) is a regression.
+        """
+        db = self._db()
+        runs = {r[0]: self._run_dict(r) for r in db.execute(
+            'SELECT id, source, completed_at, total, pass, fail, warn, unknown FROM runs WHERE id IN (?, ?)',
+            (from_run, to_run)
+        )}
+        if from_run not in runs or to_run not in runs:
+            return None
+        before, after = self._statuses(db, from_run), self._statuses(db, to_run)
+        changed = set(before) ^ set(after) | {pk for pk in before.keys() & after.keys() if before[pk][0] != after[pk][0]}
+        names = {}
+        if changed:
+            marks = ','.join('?' * len(changed))
+            names = {pk: (cid, desc) for pk, cid, desc in db.execute(
+                f'SELECT c.id, c.check_id, t.body FROM checks c LEFT JOIN texts t ON t.id = c.description_id '
+                f'WHERE c.id IN ({marks})', list(changed)
+            )}
+        out = {'regressed': [], 'fixed': [], 'added': [], 'removed': []}
+        for pk in changed:
+            cid, desc = names.get(pk, (None, None))
+            old, new = before.get(pk), after.get(pk)
+            item = {
+                'check_id': cid,
+                'description': desc,
+                'from': STATUS_NAMES[old[0]] if old else None,
+                'to': STATUS_NAMES[new[0]] if new else None,
+                'reason': new[1] if new else None,
+            }
+            if old is None:
+                out['added'].append(item)
+            elif new is None:
+                out['removed'].append(item)
+            elif new[0] > old[0]:
+                out['regressed'].append(item)
+            else:
+                out['fixed'].append(item)
+        for items in out.values():
+            items.sort(key=lambda i: str(i['check_id']))
+        out['from'] = runs[from_run]
+        out['to'] = runs[to_run]
+        return out
+
+
+def identity_fingerprint(identity):
+    """Fingerprint of a results file from its (inode, mtime_ns, size)."""
+    return '-'.join(f"{v:x}" for v in identity)
+
+
+class ScanRecorder:
+    """
+    Records each completed scan once. `results()` returns (identity, result
+    list or None) of results.json and is polled every `interval` seconds;
+    node uploads arrive through node_loaded() (the NodeResultsStore's
+    on_load) and `refresh_nodes()` makes the store pick up new files. Only
+    a started recorder queues node loads; on start `reload_nodes()` makes
+    the store load every node file again, so scans it read before this
+    process became the leader are recorded too. Runs are keyed by the
+    results file identity, so recording one twice (from any process) is a
+    no-op.
+    """
+
+    def __init__(self, history, results, refresh_nodes=None, interval=SCAN_RECORD_INTERVAL, reload_nodes=None):
+        self.history = history
+        self.results = results
+        self.refresh_nodes = refresh_nodes
+        self.reload_nodes = reload_nodes
+        self.interval = interval
+        self.active = False
+        self.results_identity = None
+        # (source, results, completed_at, identity) loaded but not yet recorded
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self._thread = None
+        self.stats = {'recorded': 0, 'errors': 0}
+
+    def start(self):
+        with self.lock:
+            if self._thread is not None:
+                return
+            self.active = True
+            if self.reload_nodes is not None:
+                # Loads before now were dropped; replay them
+                self.reload_nodes()
+            self._thread = threading.Thread(target=self._run, name='scan-recorder', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[-] Scan recorder failed: {e}", flush=True)
+            time.sleep(self.interval)
+
+    def node_loaded(self, node, results, scanned_at, identity):
+        if self.active:
+            self.pending.append((node, results, scanned_at, identity))
+
+    def record_results(self):
+        """Record the current results.json if it is new (idempotent per results file)."""
+        identity, results = self.results()
+        if identity is None or results is None or identity == self.results_identity:
+            return False
+        self._record(DEFAULT_SOURCE, results, identity[1] / 1e9, identity)
+        self.results_identity = identity
+        return True
+
+    def run_once(self):
+        self.record_results()
+        if self.refresh_nodes is not None:
+            self.refresh_nodes()
+        while self.pending:
+            self._record(*self.pending.popleft())
+
+    def _record(self, source, results, completed_at, identity):
+        try:
+            if self.history.record(results, source, completed_at, identity_fingerprint(identity)) is not None:
+                self.stats['recorded'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"[-] Could not record scan history for {source}: {e}", flush=True)
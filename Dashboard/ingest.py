@@ -0,0 +1,262 @@
+"""
+Incremental ingestion of the runtime event log into in-memory state.
+
+RuntimeIngester tails the segmented log (or the legacy single NDJSON file)
+from a remembered position, parses only the new lines and hands each alert
+to the registered consumers (rollups, etc.). Request handlers read from the
+consumers' state instead of rescanning raw events.
+
+Each poll reads at most INGEST_MAX_POLL_BYTES; whatever is left is the
+backlog, read by the next poll right away. The backlog and the lag behind
+the newest event drive the LoadShedder (shedding.py), which samples
+lower-severity events when ingest cannot keep up.
+"""
+import json
+import os
+import threading
+import time
+
+import segments
+from events import event_timestamp
+from shedding import skim
+
+INGEST_POLL_INTERVAL = float(os.environ.get('INGEST_POLL_INTERVAL', '1.0'))
+INGEST_CHUNK_BYTES = 4 * 1024 * 1024
+INGEST_MAX_POLL_BYTES = int(os.environ.get('INGEST_MAX_POLL_BYTES', str(16 * 1024 * 1024)))
+
+
+class RuntimeIngester:
+    """Tails the runtime log and feeds new alerts to consumers."""
+
+    def __init__(self, log_dir, log_path, accept=None, poll_interval=INGEST_POLL_INTERVAL,
+                 max_poll_bytes=INGEST_MAX_POLL_BYTES, shedder=None, profiler=None):
+        self.log_dir = log_dir
+        self.log_path = log_path
+        self.accept = accept
+        self.poll_interval = poll_interval
+        self.max_poll_bytes = max_poll_bytes
+        self.shedder = shedder
+        # Charged with each line's size and processing time (policy_cost.py)
+        self.profiler = profiler
+        self.consumers = []
+        self.exact_consumers = []
+        self.raw_consumers = []
+        self.lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        # Position in the segmented log: (segment name, uncompressed offset)
+        self.segment = None
+        self.offset = 0
+        # Position in the legacy file
+        self.file_id = None
+        # (segment name, or '' for the legacy file; byte offset) of the line
+        # being ingested, for consumers that keep a pointer back into the log
+        self.location = None
+        # Newest event handed to consumers, for the lag
+        self.last_event = None
+        self.caught_up = False
+        self.stats = {
+            'lines': 0,
+            'ingested': 0,
+            'filtered': 0,
+            'invalid': 0,
+            'polls': 0,
+            'last_poll': None,
+            'poll_seconds': 0.0,
+            'last_poll_seconds': None,
+            'backlog_bytes': 0,
+            'lag_seconds': None,
+            'shed': 0,
+        }
+
+    def add_consumer(self, consumer, raw=False, exact=False):
+        """
+        Register a callable invoked as consumer(alert) for each accepted alert,
+        or with raw=True for every parsed event before filtering. With
+        exact=True it is also called with the skimmed skeleton of alerts shed
+        under load, for counters that must stay exact.
+        """
+        (self.raw_consumers if raw else self.consumers).append(consumer)
+        if exact and not raw:
+            self.exact_consumers.append(consumer)
+
+    def start(self):
+        """Start the background polling thread (idempotent)."""
+        with self.lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='runtime-ingest', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[-] Runtime ingest failed: {e}", flush=True)
+            # With a backlog, only pause long enough to let requests in
+            self._stop.wait(0.01 if self.stats['backlog_bytes'] else self.poll_interval)
+
+    def poll(self):
+        """Ingest everything appended since the last poll. Returns lines read."""
+        with self.lock:
+            started = time.perf_counter()
+            if segments.is_segment_dir(self.log_dir):
+                n, backlog = self._poll_segments()
+            elif os.path.exists(self.log_path):
+                n, backlog = self._poll_file()
+            else:
+                n, backlog = 0, 0
+            elapsed = time.perf_counter() - started
+            now = time.time()
+            self.stats['polls'] += 1
+            self.stats['last_poll'] = now
+            self.stats['poll_seconds'] += elapsed
+            self.stats['last_poll_seconds'] = elapsed
+            self.stats['backlog_bytes'] = backlog
+            if backlog == 0:
+                self.caught_up = True
+            ts = event_timestamp(self.last_event) if self.last_event is not None else None
+            if ts is not None:
+                self.stats['lag_seconds'] = round(max(0.0, now - ts), 3)
+            if self.shedder is not None:
+                self.shedder.update(backlog, self.stats['lag_seconds'], self.caught_up)
+            return n
+
+    def status(self):
+        """Ingest counters plus the load shedder's state."""
+        status = dict(self.stats)
+        status['caught_up'] = self.caught_up
+        status['shedding'] = self.shedder.snapshot() if self.shedder is not None else None
+        return status
+
+    def _poll_segments(self):
+        entries = segments.load_index(self.log_dir)
+        if self.segment is not None:
+            # Names sort in write order; segments dropped by retention are skipped
+            entries = [e for e in entries if e['name'] >= self.segment]
+            if not entries or entries[0]['name'] != self.segment:
+                self.offset = 0
+        total = 0
+        budget = self.max_poll_bytes
+        backlog = 0
+        for entry in entries:
+            if budget <= 0:
+                # Unread segments (compressed sizes for sealed ones)
+                backlog += entry['bytes']
+                continue
+            if entry['name'] != self.segment:
+                self.segment = entry['name']
+                self.offset = 0
+            f = segments.open_segment(self.log_dir, entry)
+            if f is None:
+                continue
+            start = self.offset
+            with f:
+                n, self.offset = self._consume(f, self.offset, entry['name'], budget)
+            budget -= self.offset - start
+            total += n
+            if budget <= 0:
+                # Stopped inside this segment; a sealed one counts its compressed size
+                backlog += entry['bytes'] if entry.get('compressed') else max(0, entry['bytes'] - self.offset)
+            if not entry.get('sealed'):
+                break
+        return total, backlog
+
+    def _poll_file(self):
+        st = os.stat(self.log_path)
+        file_id = (st.st_dev, st.st_ino)
+        if file_id != self.file_id or st.st_size < self.offset:
+            # Replaced or truncated by the collector
+            self.file_id = file_id
+            self.offset = 0
+        with open(self.log_path, 'rb') as f:
+            n, self.offset = self._consume(f, self.offset, '', self.max_poll_bytes)
+        return n, max(0, st.st_size - self.offset)
+
+    def _consume(self, f, offset, source, budget=None):
+        """
+        Read complete lines from `offset`, stopping after about `budget`
+        bytes; returns (lines, new offset).
+        """
+        if offset:
+            f.seek(offset)
+        count = 0
+        carry = b''
+        start = offset
+        while budget is None or offset - start < budget:
+            chunk = f.read(INGEST_CHUNK_BYTES)
+            if not chunk:
+                break
+            data = carry + chunk
+            end = data.rfind(b'\n')
+            if end < 0:
+                carry = data
+                continue
+            lines = data[:end].split(b'\n')
+            pos = offset
+            for line in lines:
+                self.location = (source, pos)
+                self._ingest_line(line)
+                pos += len(line) + 1
+            count += len(lines)
+            offset += end + 1
+            carry = data[end + 1:]
+        # A trailing partial line is left for the next poll
+        return count, offset
+
+    def _ingest_line(self, line):
+        if self.profiler is None:
+            self._process_line(line)
+            return
+        started = time.perf_counter()
+        event, shed = self._process_line(line)
+        if event is not None:
+            self.profiler.record(event, len(line) + 1, time.perf_counter() - started, shed)
+
+    def _process_line(self, line):
+        """Decode a line and hand it to the consumers; returns (event, shed)."""
+        stats = self.stats
+        stats['lines'] += 1
+        if not line.strip():
+            return None, False
+        if self.shedder is not None and self.shedder.degraded:
+            skeleton = skim(line)
+            if skeleton is not None and not self.shedder.admit(skeleton):
+                self._shed(skeleton)
+                return skeleton, True
+        try:
+            alert = json.loads(line)
+        except ValueError:
+            stats['invalid'] += 1
+            return None, False
+        if not isinstance(alert, dict):
+            stats['invalid'] += 1
+            return None, False
+        for consumer in self.raw_consumers:
+            consumer(alert)
+        if self.accept is not None and not self.accept(alert):
+            stats['filtered'] += 1
+            return alert, False
+        stats['ingested'] += 1
+        self.last_event = alert
+        for consumer in self.consumers:
+            consumer(alert)
+        return alert, False
+
+    def _shed(self, skeleton):
+        """Count a shed event: only the exact consumers see (its skeleton)."""
+        stats = self.stats
+        if self.accept is not None and not self.accept(skeleton):
+            stats['filtered'] += 1
+            return
+        stats['ingested'] += 1
+        stats['shed'] += 1
+        self.last_event = skeleton
+        for consumer in self.exact_consumers:
+            consumer(skeleton)
@@ -0,0 +1,338 @@
+"""
+Kubernetes client layer for the dashboard.
+
+Two interchangeable clients:
+  - ApiServerClient: talks to the API server directly over a small pool of
+    persistent (keep-alive) connections, using the in-cluster service
+    account, or KUBE_API_URL (e.g. `kubectl proxy` or a local fake server)
+  - KubectlClient:   shells out to kubectl, as the dashboard used to
+
+JobWatcher keeps the status of one Job in memory from a single long-lived
+watch, so status requests never touch the API server or fork a process.
+"""
+import calendar
+import http.client
+import json
+import os
+import queue
+import ssl
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit, quote
+
+import yaml
+
+SA_DIR = '/var/run/secrets/kubernetes.io/serviceaccount'
+# 'api', 'kubectl' or 'auto' (api when running in-cluster or KUBE_API_URL is set)
+KUBE_CLIENT = os.environ.get('KUBE_CLIENT', 'auto')
+KUBE_API_URL = os.environ.get('KUBE_API_URL', '')
+KUBE_POOL_SIZE = int(os.environ.get('KUBE_POOL_SIZE', '4'))
+KUBE_TIMEOUT = float(os.environ.get('KUBE_TIMEOUT', '10'))
+WATCH_TIMEOUT = int(os.environ.get('KUBE_WATCH_TIMEOUT', '300'))
+
+
+class KubeError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def job_status(job):
+    """Map a Job object to 'running', 'completed' or 'failed'."""
+    if not job:
+        return 'not_found'
+    status = job.get('status', {})
+    if status.get('failed', 0) > 0:
+        return 'failed'
+    if status.get('succeeded', 0) > 0:
+        return 'completed'
+    return 'running'
+
+
+def job_pending(job):
+    """True if a Job has not finished and none of its pods is ready (e.g. unschedulable)."""
+    if job_status(job) != 'running':
+        return False
+    return not job.get('status', {}).get('ready')
+
+
+def job_age(job):
+    """Seconds since the Job was created, or None."""
+    created = (job or {}).get('metadata', {}).get('creationTimestamp')
+    try:
+        return time.time() - calendar.timegm(time.strptime(created, '%Y-%m-%dT%H:%M:%SZ'))
+    except (TypeError, ValueError):
+        return None
+
+
+def jobs_path(namespace, name=None):
+    path = f"/apis/batch/v1/namespaces/{quote(namespace)}/jobs"
+    return f"{path}/{quote(name)}" if name else path
+
+
+class ConnectionPool:
+    """A few keep-alive HTTP(S) connections to one host, reused across requests."""
+
+    def __init__(self, url, ssl_context=None, size=KUBE_POOL_SIZE, timeout=KUBE_TIMEOUT):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=size)
+        self.created = 0
+
+    def connect(self, timeout=None):
+        self.created += 1
+        timeout = self.timeout if timeout is None else timeout
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """Send a request and return (status, body bytes)."""
+        for attempt in (0, 1):
+            try:
+                conn = self.idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self.connect()
+                reused = False
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # A pooled connection may have been closed by the server; retry once fresh
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                try:
+                    self.idle.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            return resp.status, data
+
+
+class ApiServerClient:
+    """Minimal Kubernetes API client over pooled persistent connections."""
+
+    def __init__(self, url=None, token=None, ca_file=None, pool_size=KUBE_POOL_SIZE):
+        if not url:
+            host = os.environ.get('KUBERNETES_SERVICE_HOST')
+            port = os.environ.get('KUBERNETES_SERVICE_PORT', '443')
+            if not host:
+                raise KubeError(None, 'Not running in-cluster and KUBE_API_URL is not set')
+            url = f"https://{host}:{port}"
+            ca_file = ca_file or os.path.join(SA_DIR, 'ca.crt')
+        self.url = url
+        self.token = token or os.environ.get('KUBE_TOKEN')
+        self.token_file = None if self.token else os.path.join(SA_DIR, 'token')
+        self._token_read = 0
+        context = None
+        if url.startswith('https'):
+            context = ssl.create_default_context(cafile=ca_file if ca_file and os.path.exists(ca_file) else None)
+        self.ssl_context = context
+        self.pool = ConnectionPool(url, context, size=pool_size)
+
+    def _headers(self, content_type=None):
+        headers = {'Accept': 'application/json'}
+        if content_type:
+            headers['Content-Type'] = content_type
+        token = self._bearer()
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        return headers
+
+    def _bearer(self):
+        # Projected service account tokens rotate, so re-read the file now and then
+        if self.token_file and time.monotonic() - self._token_read > 60:
+            try:
+                with open(self.token_file, 'r', encoding='utf-8') as f:
+                    self.token = f.read().strip()
+            except OSError:
+                self.token = None
+            self._token_read = time.monotonic()
+        return self.token
+
+    def request(self, method, path, obj=None):
+        body = json.dumps(obj).encode('utf-8') if obj is not None else None
+        status, data = self.pool.request(method, path, body, self._headers('application/json' if body else None))
+        try:
+            payload = json.loads(data) if data else {}
+        except ValueError:
+            payload = {'message': data[:200].decode('utf-8', 'replace')}
+        if status >= 400:
+            raise KubeError(status, payload.get('message') or f"HTTP {status}")
+        return payload
+
+    def get_job(self, namespace, name):
+        try:
+            return self.request('GET', jobs_path(namespace, name))
+        except KubeError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def delete_job(self, namespace, name):
+        try:
+            self.request('DELETE', jobs_path(namespace, name), {'propagationPolicy': 'Background'})
+        except KubeError as e:
+            if e.status != 404:
+                raise
+
+    def create_job(self, namespace, manifest):
+        return self.request('POST', jobs_path(namespace), manifest)
+
+    def list_jobs(self, namespace, name):
+        return self.request('GET', f"{jobs_path(namespace)}?fieldSelector=metadata.name%3D{quote(name)}")
+
+    def watch_jobs(self, namespace, name, resource_version, timeout=WATCH_TIMEOUT):
+        """Yield watch events for one Job until the server ends the stream."""
+        path = (f"{jobs_path(namespace)}?watch=1&fieldSelector=metadata.name%3D{quote(name)}"
+                f"&resourceVersion={quote(resource_version or '')}&timeoutSeconds={timeout}"
+                f"&allowWatchBookmarks=true")
+        # The watch holds its own connection for the life of the stream
+        conn = self.pool.connect(timeout=timeout + 30)
+        try:
+            conn.request('GET', path, headers=self._headers())
+            resp = conn.getresponse()
+            if resp.status >= 400:
+                raise KubeError(resp.status, resp.read().decode('utf-8', 'replace'))
+            while True:
+                line = resp.readline()
+                if not line:
+                    return
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+
+class KubectlClient:
+    """Same interface as ApiServerClient, implemented with kubectl subprocesses."""
+
+    def _run(self, cmd, input=None):
+        return subprocess.run(cmd, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False)
+
+    def get_job(self, namespace, name):
+        res = self._run(["kubectl", "get", "job", name, "-n", namespace, "-o", "json"])
+        if res.returncode != 0:
+            return None
+        return json.loads(res.stdout)
+
+    def delete_job(self, namespace, name):
+        self._run(["kubectl", "delete", "job", name, "-n", namespace, "--ignore-not-found=true"])
+
+    def create_job(self, namespace, manifest):
+        res = self._run(["kubectl", "apply", "-n", namespace, "-f", "-"], input=json.dumps(manifest))
+        if res.returncode != 0:
+            raise KubeError(None, res.stderr)
+        return manifest
+
+
+def make_client(kind=KUBE_CLIENT):
+    if kind == 'kubectl':
+        return KubectlClient()
+    if kind == 'api' or KUBE_API_URL or os.environ.get('KUBERNETES_SERVICE_HOST'):
+        return ApiServerClient(KUBE_API_URL or None)
+    return KubectlClient()
+
+
+def load_manifest(text):
+    return yaml.safe_load(text)
+
+
+def recreate_job(client, namespace, manifest, timeout=30):
+    """Delete the Job if present, wait for it to disappear, then create it."""
+    name = manifest['metadata']['name']
+    client.delete_job(namespace, name)
+    deadline = time.monotonic() + timeout
+    while client.get_job(namespace, name) is not None:
+        if time.monotonic() > deadline:
+            raise KubeError(409, f"Timed out waiting for job {name} to be deleted")
+        time.sleep(0.25)
+    return client.create_job(namespace, manifest)
+
+
+class JobWatcher:
+    """
+    Keeps one Job's status in memory. With an API client it lists the Job
+    once and then follows a watch stream, re-listing only when the watch
+    expires; with kubectl it falls back to a direct lookup per call.
+    """
+
+    def __init__(self, client, namespace, name, retry=1.0):
+        self.client = client
+        self.namespace = namespace
+        self.name = name
+        # First delay before listing again after an error; doubles up to 30s
+        self.retry = retry
+        self.job = None
+        self.synced = False
+        self.lock = threading.Lock()
+        self._thread = None
+        self.watches = 0
+        self.last_error = None
+
+    def start(self):
+        if not hasattr(self.client, 'watch_jobs'):
+            return
+        with self.lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='job-watch', daemon=True)
+            self._thread.start()
+
+    def snapshot(self):
+        """Watched status for other worker processes; None until the first list."""
+        return {'status': job_status(self.job) if self.synced else None}
+
+    def status(self):
+        if not self.synced:
+            # Before the first list completes (or without watch support)
+            return job_status(self.client.get_job(self.namespace, self.name))
+        return job_status(self.job)
+
+    def _run(self):
+        backoff = self.retry
+        while True:
+            try:
+                listing = self.client.list_jobs(self.namespace, self.name)
+                items = listing.get('items', [])
+                self.job = items[0] if items else None
+                self.synced = True
+                version = listing.get('metadata', {}).get('resourceVersion')
+                while True:
+                    self.watches += 1
+                    for event in self.client.watch_jobs(self.namespace, self.name, version):
+                        kind = event.get('type')
+                        obj = event.get('object', {})
+                        if kind == 'ERROR':
+                            # Usually 410 Gone: our resourceVersion is too old
+                            raise KubeError(obj.get('code', 410), obj.get('message', 'watch error'))
+                        version = obj.get('metadata', {}).get('resourceVersion', version)
+                        if kind in ('ADDED', 'MODIFIED'):
+                            self.job = obj
+                        elif kind == 'DELETED':
+                            self.job = None
+                        backoff = self.retry
+                    # The stream ended on its timeout: renew it from `version`
+                    backoff = self.retry
+            except Exception as e:
+                self.last_error = str(e)
+                if not (isinstance(e, KubeError) and e.status == 410):
+                    self.synced = False
+                # A 410 keeps the listed state, but the list is repeated after
+                # the same backoff so a stale version cannot spin the loop
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
@@ -0,0 +1,343 @@
+"""
+Process lineage from Tetragon exec and exit events.
+
+ProcessTree is a raw ingest consumer: it sees every event, before alert
+filtering, so shells and other excluded binaries still appear as ancestors.
+Processes are keyed by exec_id and linked by parent_exec_id; every event
+carrying `process` / `parent` fills in processes that started before the
+ingester did. Exited processes are kept for LINEAGE_EXIT_TTL seconds so
+late alerts can still be explained, and the table never holds more than
+LINEAGE_MAX_PROCESSES entries (exited first, then oldest).
+
+Children can arrive before their parent (a `process` seen before the event
+that names its parent); they wait in `orphans` under the parent's exec_id
+and are attached when the parent is inserted.
+
+For other worker processes the tree is shared as a base snapshot plus a
+delta of the processes changed or removed since. The base is rebuilt (a new
+`generation`) only once the delta holds LINEAGE_DELTA_MAX processes, so the
+frequent publishes stay small.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from events import EVENT_TYPES, event_timestamp
+
+LINEAGE_MAX_PROCESSES = int(os.environ.get('LINEAGE_MAX_PROCESSES', '100000'))
+LINEAGE_EXIT_TTL = float(os.environ.get('LINEAGE_EXIT_TTL', '600'))
+LINEAGE_MAX_DEPTH = int(os.environ.get('LINEAGE_MAX_DEPTH', '64'))
+LINEAGE_DELTA_MAX = int(os.environ.get('LINEAGE_DELTA_MAX', '5000'))
+
+
+class Process:
+    __slots__ = ('exec_id', 'parent_exec_id', 'binary', 'arguments', 'pid', 'uid',
+                 'start_time', 'pod', 'exited', 'children')
+
+    def __init__(self, exec_id, parent_exec_id=None, binary='', arguments='', pid=None, uid=None,
+                 start_time=None, pod='', exited=None):
+        self.exec_id = exec_id
+        self.parent_exec_id = parent_exec_id
+        self.binary = binary
+        self.arguments = arguments
+        self.pid = pid
+        self.uid = uid
+        self.start_time = start_time
+        self.pod = pod
+        self.exited = exited
+        self.children = set()
+
+    def to_dict(self):
+        return {
+            'exec_id': self.exec_id,
+            'parent_exec_id': self.parent_exec_id,
+            'binary': self.binary,
+            'arguments': self.arguments,
+            'pid': self.pid,
+            'uid': self.uid,
+            'start_time': self.start_time,
+            'pod': self.pod,
+            'exited': self.exited,
+        }
+
+    def to_row(self):
+        return [self.exec_id, self.parent_exec_id, self.binary, self.arguments, self.pid,
+                self.uid, self.start_time, self.pod, self.exited]
+
+
+def process_info(data):
+    """Fields kept for one Tetragon `process` object."""
+    pod = data.get('pod') or {}
+    return {
+        'parent_exec_id': data.get('parent_exec_id'),
+        'binary': data.get('binary', ''),
+        'arguments': data.get('arguments', ''),
+        'pid': data.get('pid'),
+        'uid': data.get('uid'),
+        'start_time': data.get('start_time'),
+        'pod': f"{pod.get('namespace', '')}/{pod.get('name', '')}" if pod else '',
+    }
+
+
+def event_body(event):
+    for kind in EVENT_TYPES:
+        body = event.get(kind)
+        if body is not None:
+            return kind, body
+    return None, None
+
+
+class ProcessTree:
+    def __init__(self, max_processes=LINEAGE_MAX_PROCESSES, exit_ttl=LINEAGE_EXIT_TTL,
+                 delta_max=LINEAGE_DELTA_MAX):
+        self.max_processes = max_processes
+        self.exit_ttl = exit_ttl
+        self.delta_max = delta_max
+        self.lock = threading.Lock()
+        self.processes = {}
+        # parent exec_id -> exec_ids of children whose parent is not known (yet)
+        self.orphans = {}
+        # (exit time, exec_id) in exit order, for pruning
+        self.exited = deque()
+        self.version = 0
+        self.evicted = 0
+        # Changes since the base snapshot of this generation
+        self.generation = 0
+        self.changed = set()
+        self.removed = set()
+        # (generation, version) of the last delta applied to a shared copy
+        self.applied = None
+
+    def __call__(self, event):
+        kind, body = event_body(event)
+        if body is None:
+            return
+        process = body.get('process')
+        if not process or not process.get('exec_id'):
+            return
+        parent = body.get('parent')
+        with self.lock:
+            if parent and parent.get('exec_id'):
+                self._upsert(parent['exec_id'], parent, refresh=False)
+            self._upsert(process['exec_id'], process, refresh=kind == 'process_exec')
+            if kind == 'process_exit':
+                ts = event_timestamp(event) or time.time()
+                node = self.processes[process['exec_id']]
+                if node.exited is None:
+                    node.exited = ts
+                    self.exited.append((ts, node.exec_id))
+                    self.changed.add(node.exec_id)
+                self._prune(ts)
+            if len(self.changed) + len(self.removed) >= self.delta_max:
+                # The next base snapshot carries everything
+                self.generation += 1
+                self.changed.clear()
+                self.removed.clear()
+            self.version += 1
+
+    def _upsert(self, exec_id, data, refresh):
+        node = self.processes.get(exec_id)
+        if node is not None and not refresh:
+            return node
+        info = process_info(data)
+        if node is None:
+            if len(self.processes) >= self.max_processes:
+                self._evict()
+            node = Process(exec_id, **info)
+            self._insert(node)
+        else:
+            if info['parent_exec_id'] != node.parent_exec_id:
+                self._unlink(node)
+                node.parent_exec_id = info['parent_exec_id']
+                self._link(node)
+            for key, value in info.items():
+                setattr(node, key, value)
+        self.changed.add(exec_id)
+        return node
+
+    def _insert(self, node):
+        self.processes[node.exec_id] = node
+        waiting = self.orphans.pop(node.exec_id, None)
+        if waiting:
+            node.children.update(waiting)
+        self._link(node)
+
+    def _link(self, node):
+        if not node.parent_exec_id:
+            return
+        parent = self.processes.get(node.parent_exec_id)
+        if parent is not None:
+            parent.children.add(node.exec_id)
+        else:
+            self.orphans.setdefault(node.parent_exec_id, set()).add(node.exec_id)
+
+    def _unlink(self, node):
+        if not node.parent_exec_id:
+            return
+        parent = self.processes.get(node.parent_exec_id)
+        if parent is not None:
+            parent.children.discard(node.exec_id)
+            return
+        waiting = self.orphans.get(node.parent_exec_id)
+        if waiting is not None:
+            waiting.discard(node.exec_id)
+            if not waiting:
+                del self.orphans[node.parent_exec_id]
+
+    def _remove(self, exec_id):
+        node = self.processes.pop(exec_id, None)
+        if node is None:
+            return
+        self._unlink(node)
+        # Its children wait for the parent again, should it come back
+        remaining = {c for c in node.children if c in self.processes}
+        if remaining:
+            self.orphans[exec_id] = remaining
+        self.changed.discard(exec_id)
+        self.removed.add(exec_id)
+
+    def _prune(self, now):
+        while self.exited and self.exited[0][0] <= now - self.exit_ttl:
+            _, exec_id = self.exited.popleft()
+            self._remove(exec_id)
+
+    def _evict(self):
+        """Make room: drop the oldest exited process, else the oldest process."""
+        while self.exited:
+            _, exec_id = self.exited.popleft()
+            if exec_id in self.processes:
+                self._remove(exec_id)
+                self.evicted += 1
+                return
+        # dicts keep insertion order, so this is the oldest entry
+        self._remove(next(iter(self.processes)))
+        self.evicted += 1
+
+    def get(self, exec_id):
+        with self.lock:
+            node = self.processes.get(exec_id)
+            return node.to_dict() if node else None
+
+    def ancestry(self, exec_id, max_depth=LINEAGE_MAX_DEPTH):
+        """
+        Ancestors of a process, root first, excluding the process itself.
+        Returns (chain, complete); complete is False if the chain ends at an
+        unknown or pruned parent.
+        """
+        chain = []
+        with self.lock:
+            node = self.processes.get(exec_id)
+            if node is None:
+                return chain, False
+            seen = {exec_id}
+            while node.parent_exec_id and len(chain) < max_depth:
+                parent = self.processes.get(node.parent_exec_id)
+                if parent is None or parent.exec_id in seen:
+                    return chain[::-1], False
+                seen.add(parent.exec_id)
+                chain.append({'exec_id': parent.exec_id, 'binary': parent.binary, 'pid': parent.pid})
+                node = parent
+            return chain[::-1], not node.parent_exec_id
+
+    def subtree(self, exec_id, depth=2, limit=200):
+        """A process with its descendants down to `depth` levels (at most `limit` nodes)."""
+        with self.lock:
+            root = self.processes.get(exec_id)
+            if root is None:
+                return None
+            budget = [limit]
+
+            def build(node, level):
+                out = node.to_dict()
+                out['child_count'] = len(node.children)
+                if level < depth:
+                    out['children'] = []
+                    for child_id in sorted(node.children):
+                        if budget[0] <= 0:
+                            out['truncated'] = True
+                            break
+                        child = self.processes.get(child_id)
+                        if child is not None:
+                            budget[0] -= 1
+                            out['children'].append(build(child, level + 1))
+                return out
+
+            return build(root, 0)
+
+    def enrich(self, alert):
+        """Attach the ancestry of the alert's process as alert['ancestry']."""
+        _, body = event_body(alert)
+        exec_id = ((body or {}).get('process') or {}).get('exec_id')
+        if exec_id:
+            chain, complete = self.ancestry(exec_id)
+            alert['ancestry'] = chain
+            alert['ancestry_complete'] = complete
+        return alert
+
+    def stats(self):
+        with self.lock:
+            return {
+                'processes': len(self.processes),
+                'exited': len(self.exited),
+                'evicted': self.evicted,
+                'max_processes': self.max_processes,
+            }
+
+    def snapshot(self):
+        """Base snapshot (compact rows) for sharing with other worker processes."""
+        with self.lock:
+            return {'rows': [p.to_row() for p in self.processes.values()], 'evicted': self.evicted,
+                    'generation': self.generation}
+
+    def delta(self):
+        """Processes changed or removed since the base snapshot of this generation."""
+        with self.lock:
+            return {
+                'generation': self.generation,
+                'version': self.version,
+                'rows': [self.processes[e].to_row() for e in self.changed],
+                'removed': list(self.removed),
+                'evicted': self.evicted,
+            }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        tree = cls(max_processes=max(LINEAGE_MAX_PROCESSES, len(snapshot['rows'])))
+        for row in snapshot['rows']:
+            node = Process(*row)
+            tree.processes[node.exec_id] = node
+        tree.exited.extend(sorted((p.exited, p.exec_id) for p in tree.processes.values() if p.exited is not None))
+        for node in tree.processes.values():
+            tree._link(node)
+        tree.evicted = snapshot.get('evicted', 0)
+        tree.generation = snapshot.get('generation', 0)
+        return tree
+
+    def apply_delta(self, delta):
+        """
+        Bring a copy made by from_snapshot() up to date. A delta for another
+        generation is ignored until the matching base snapshot is loaded.
+        """
+        with self.lock:
+            key = (delta['generation'], delta['version'])
+            if delta['generation'] != self.generation or key == self.applied:
+                return
+            for exec_id in delta['removed']:
+                self._remove(exec_id)
+            if delta['removed']:
+                self.exited = deque(e for e in self.exited if e[1] in self.processes)
+            for row in delta['rows']:
+                node = Process(*row)
+                old = self.processes.get(node.exec_id)
+                if old is not None:
+                    self._unlink(old)
+                    node.children = old.children
+                    self.processes[node.exec_id] = node
+                    self._link(node)
+                else:
+                    self._insert(node)
+                if node.exited is not None and (old is None or old.exited is None):
+                    self.exited.append((node.exited, node.exec_id))
+            self.evicted = delta['evicted']
+            self.applied = key
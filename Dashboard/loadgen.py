@@ -0,0 +1,314 @@
+"""
+Synthetic Tetragon event generator for load tests.
+
+Emits Tetragon-style NDJSON (process_exec, process_exit, process_tracepoint,
+process_kprobe) for the tracepoints and kprobes declared in the policies
+under Runtime/Tracepoints. A population of live processes is kept per pod:
+exec events start a child of a live process (or a container entrypoint),
+exit events end one, and tracepoint/kprobe events are raised by live
+processes, so exec_id / parent_exec_id chains are consistent.
+
+    python3 loadgen.py --count 100000 --pods 50 > events.ndjson
+    python3 loadgen.py --rate 2000 --duration 60 | python3 collector.py --input -
+
+Event times follow a simulated clock at --rate events/sec (or the real
+clock with --realtime), so files generated quickly still look like traffic
+spread over time.
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+
+import yaml
+
+from events import rfc3339
+
+POLICY_DIR = os.environ.get(
+    'POLICY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Runtime', 'Tracepoints'))
+
+# Default share of each event kind
+DEFAULT_MIX = {'exec': 2, 'exit': 2, 'tracepoint': 10, 'kprobe': 6}
+
+ENTRYPOINTS = ['/usr/local/bin/python3', '/usr/bin/node', '/app/server', '/usr/sbin/nginx', '/bin/sh']
+BINARIES = [
+    '/bin/bash', '/bin/sh', '/usr/bin/curl', '/usr/bin/wget', '/usr/bin/python3', '/usr/bin/perl',
+    '/usr/bin/nc', '/usr/bin/chmod', '/usr/bin/chown', '/usr/bin/mv', '/usr/bin/cat', '/usr/bin/ls',
+    '/usr/bin/find', '/usr/bin/tar', '/usr/bin/apt-get', '/usr/bin/stress', '/usr/bin/mount',
+]
+PATHS = [
+    '/etc/kubernetes/manifests/kube-apiserver.yaml', '/etc/kubernetes/manifests/etcd.yaml',
+    '/etc/kubernetes/pki/ca.key', '/etc/kubernetes/admin.conf', '/var/lib/kubelet/config.yaml',
+    '/etc/passwd', '/etc/shadow', '/tmp/payload.sh', '/app/config.json', '/var/log/app.log',
+]
+FILE_CALLS = ('security_file_open', 'security_inode_unlink', 'security_bprm_check')
+
+
+def load_policies(directory=POLICY_DIR):
+    """Return ([(policy, subsys, event)], [(policy, call)]) from TracingPolicy files."""
+    tracepoints, kprobes = [], []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(('.yaml', '.yml')):
+            continue
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+            for doc in yaml.safe_load_all(f):
+                if not doc:
+                    continue
+                policy = doc.get('metadata', {}).get('name', name)
+                spec = doc.get('spec', {})
+                for tp in spec.get('tracepoints', []):
+                    tracepoints.append((policy, tp.get('subsystem'), tp.get('event')))
+                for kp in spec.get('kprobes', []):
+                    kprobes.append((policy, kp.get('call')))
+    return tracepoints, kprobes
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for part in (text or '').split(','):
+        if '=' in part:
+            key, value = part.split('=', 1)
+            if key not in DEFAULT_MIX:
+                raise ValueError(f"Unknown event kind '{key}', expected one of: {', '.join(DEFAULT_MIX)}")
+            mix[key] = float(value)
+    return mix
+
+
+class EventGenerator:
+    def __init__(self, seed=1, pods=20, namespaces=4, binaries=len(BINARIES), processes=2000,
+                 nodes=3, mix=None, burst=0.0, policies=None, start=None, rate=1000.0):
+        self.rng = random.Random(seed)
+        self.tracepoints, self.kprobes = policies or load_policies()
+        self.binaries = BINARIES[:binaries] if binaries <= len(BINARIES) else \
+            BINARIES + [f"/opt/tools/bin/tool{i}" for i in range(binaries - len(BINARIES))]
+        self.nodes = [f"worker-{i}" for i in range(nodes)]
+        self.pods = [self._pod(i, namespaces) for i in range(pods)]
+        self.max_processes = processes
+        self.mix = mix or dict(DEFAULT_MIX)
+        self.kinds = list(self.mix)
+        self.weights = [self.mix[k] for k in self.kinds]
+        # Share of tracepoint events coming from one hot process (DoS-like bursts)
+        self.burst = burst
+        self.clock = time.time() if start is None else start
+        self.step = 1.0 / rate if rate > 0 else 0.001
+        self.live = {}
+        self.live_ids = []
+        self.serial = 0
+        self.hot = None
+        self.counts = dict.fromkeys(self.kinds, 0)
+
+    def _pod(self, i, namespaces):
+        namespace = f"ns-{i % namespaces}"
+        name = f"app-{i}-{self.rng.randrange(16 ** 5):05x}"
+        return {
+            'namespace': namespace,
+            'name': name,
+            'container': {
+                'id': f"containerd://{self.rng.getrandbits(128):032x}",
+                'name': 'app',
+                'image': {'id': f"docker.io/library/app@sha256:{self.rng.getrandbits(128):032x}", 'name': 'app:latest'},
+                'start_time': rfc3339(time.time() - 3600),
+                'pid': 1,
+            },
+            'pod_labels': {'app': f"app-{i}"},
+            'workload': f"app-{i}",
+            'node': self.nodes[i % len(self.nodes)],
+        }
+
+    def _new_process(self, parent, binary):
+        self.serial += 1
+        pod = parent['_pod'] if parent else self.rng.choice(self.pods)
+        node = pod['node']
+        exec_id = base64.b64encode(f"{node}:{self.serial}:{self.rng.getrandbits(32)}".encode()).decode()
+        process = {
+            'exec_id': exec_id,
+            'pid': 1000 + self.serial % 4000000,
+            'uid': self.rng.choice((0, 0, 1000)),
+            'cwd': '/app',
+            'binary': binary,
+            'arguments': self.rng.choice(('', '-c id', '--help', '/tmp/payload.sh', '-la /etc')),
+            'flags': 'execve clone',
+            'start_time': rfc3339(self.clock),
+            'auid': 4294967295,
+            'pod': {k: v for k, v in pod.items() if k != 'node'},
+            'docker': pod['container']['id'][13:44],
+            'parent_exec_id': parent['exec_id'] if parent else None,
+            'tid': 1000 + self.serial % 4000000,
+            '_pod': pod,
+            '_parent': parent,
+        }
+        if process['parent_exec_id'] is None:
+            del process['parent_exec_id']
+        return process
+
+    @staticmethod
+    def _public(process):
+        return {k: v for k, v in process.items() if not k.startswith('_')} if process else None
+
+    def _spawn(self):
+        parent = self.live[self.rng.choice(self.live_ids)] if self.live_ids and self.rng.random() < 0.8 else None
+        binary = self.rng.choice(ENTRYPOINTS) if parent is None else self.rng.choice(self.binaries)
+        process = self._new_process(parent, binary)
+        if len(self.live_ids) >= self.max_processes:
+            self._reap(self.rng.randrange(len(self.live_ids)))
+        self.live[process['exec_id']] = process
+        self.live_ids.append(process['exec_id'])
+        return process
+
+    def _reap(self, index):
+        exec_id = self.live_ids[index]
+        self.live_ids[index] = self.live_ids[-1]
+        self.live_ids.pop()
+        return self.live.pop(exec_id)
+
+    def _actor(self):
+        if not self.live_ids:
+            return self._spawn()
+        return self.live[self.rng.choice(self.live_ids)]
+
+    def _envelope(self, kind, body, node, process):
+        # Tetragon omits the parent for processes started outside any tracked parent
+        if process['_parent'] is not None:
+            body['parent'] = self._public(process['_parent'])
+        return {kind: body, 'node_name': node, 'time': rfc3339(self.clock)}
+
+    def _exec(self):
+        process = self._spawn()
+        body = {'process': self._public(process)}
+        return self._envelope('process_exec', body, process['_pod']['node'], process)
+
+    def _exit(self):
+        if not self.live_ids:
+            return self._exec()
+        process = self._reap(self.rng.randrange(len(self.live_ids)))
+        if self.hot is process:
+            self.hot = None
+        body = {
+            'process': self._public(process),
+            'signal': self.rng.choice(('', '', 'SIGKILL')),
+            'status': self.rng.choice((0, 0, 1)),
+            'time': rfc3339(self.clock),
+        }
+        return self._envelope('process_exit', body, process['_pod']['node'], process)
+
+    def _tracepoint(self):
+        if self.burst and self.rng.random() < self.burst:
+            if self.hot is None or self.hot['exec_id'] not in self.live:
+                self.hot = self._spawn()
+            process = self.hot
+            policy, subsys, event = next(
+                (t for t in self.tracepoints if t[2] == 'sys_enter_clone'), self.tracepoints[0])
+        else:
+            process = self._actor()
+            policy, subsys, event = self.rng.choice(self.tracepoints)
+        body = {
+            'process': self._public(process),
+            'subsys': subsys,
+            'event': event,
+            'args': [{'long_arg': self.rng.randrange(1 << 16)}, {'long_arg': self.rng.randrange(4096)}],
+            'policy_name': policy,
+            'action': 'KPROBE_ACTION_POST',
+        }
+        if event in ('sys_enter_chmod', 'sys_enter_fchmodat', 'sys_enter_chown', 'sys_enter_fchownat'):
+            body['args'].insert(0, {'string_arg': self.rng.choice(PATHS)})
+        return self._envelope('process_tracepoint', body, process['_pod']['node'], process)
+
+    def _kprobe(self):
+        process = self._actor()
+        policy, call = self.rng.choice(self.kprobes)
+        if call in FILE_CALLS:
+            args = [{'file_arg': {'path': self.rng.choice(PATHS), 'permission': '-rw-r--r--'}}]
+        elif call == 'security_inode_rename':
+            src = self.rng.choice(PATHS)
+            args = [{'path_arg': {'path': src + '.tmp'}}, {'path_arg': {'path': src}}]
+        elif call == 'security_socket_connect':
+            args = [{'sock_arg': {'family': 'AF_INET', 'type': 'SOCK_STREAM', 'protocol': 'IPPROTO_TCP',
+                                  'daddr': f"10.0.{self.rng.randrange(256)}.{self.rng.randrange(256)}",
+                                  'dport': self.rng.choice((80, 443, 4444, 6443))}}]
+        else:
+            args = [{'int_arg': self.rng.randrange(1 << 16)}]
+        body = {
+            'process': self._public(process),
+            'function_name': call,
+            'args': args,
+            'action': 'KPROBE_ACTION_POST',
+            'policy_name': policy,
+            'return_action': 'KPROBE_ACTION_POST',
+        }
+        return self._envelope('process_kprobe', body, process['_pod']['node'], process)
+
+    def event(self):
+        """Return the next event as a dict."""
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        self.clock += self.step
+        self.counts[kind] += 1
+        if kind == 'exec':
+            return self._exec()
+        if kind == 'exit':
+            return self._exit()
+        if kind == 'tracepoint':
+            return self._tracepoint()
+        return self._kprobe()
+
+    def lines(self, count=None, duration=None, realtime=False):
+        """Yield NDJSON lines until `count` events or `duration` seconds."""
+        n = 0
+        started = time.monotonic()
+        while True:
+            if count is not None and n >= count:
+                return
+            elapsed = time.monotonic() - started
+            if duration is not None and elapsed >= duration:
+                return
+            if realtime:
+                # Pace to the configured rate against the wall clock
+                ahead = n * self.step - elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+                self.clock = time.time() - self.step
+            yield json.dumps(self.event(), separators=(',', ':'))
+            n += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic Tetragon NDJSON events')
+    parser.add_argument('--count', type=int, help='number of events (default: until --duration, or 10000)')
+    parser.add_argument('--duration', type=float, help='seconds to generate for')
+    parser.add_argument('--rate', type=float, default=1000.0, help='events per second (event clock)')
+    parser.add_argument('--realtime', action='store_true', help='pace output to --rate on the wall clock')
+    parser.add_argument('--pods', type=int, default=20)
+    parser.add_argument('--namespaces', type=int, default=4)
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--binaries', type=int, default=len(BINARIES), help='distinct binaries')
+    parser.add_argument('--processes', type=int, default=2000, help='max live processes')
+    parser.add_argument('--mix', default='', help='event kind weights, e.g. exec=1,exit=1,tracepoint=10,kprobe=5')
+    parser.add_argument('--burst', type=float, default=0.0, help='share of tracepoints from one hot process')
+    parser.add_argument('--policies', default=POLICY_DIR, help='TracingPolicy directory')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--start', type=float, help='epoch time of the first event (default: now)')
+    parser.add_argument('--output', default='-', help="file to write, or '-' for stdout")
+    args = parser.parse_args(argv)
+
+    gen = EventGenerator(
+        seed=args.seed, pods=args.pods, namespaces=args.namespaces, binaries=args.binaries,
+        processes=args.processes, nodes=args.nodes, mix=parse_mix(args.mix), burst=args.burst,
+        policies=load_policies(args.policies), start=args.start, rate=args.rate,
+    )
+    count = args.count if args.count is not None else (None if args.duration else 10000)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for line in gen.lines(count, args.duration, args.realtime):
+            out.write(line + '\n')
+    except BrokenPipeError:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"[+] generated {sum(gen.counts.values())} events: {gen.counts}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
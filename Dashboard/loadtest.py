@@ -0,0 +1,307 @@
+"""
+Offline load test for the runtime pipeline and dashboard.
+
+  1. generate synthetic Tetragon events (loadgen.py) into a work directory
+  2. replay them through collector.py into a segmented log and time it
+  3. start the dashboard on that log (gunicorn, or the threaded dev server)
+  4. wait for the ingester to catch up, then drive the runtime endpoints
+     from concurrent clients over keep-alive connections
+  5. report ingest throughput, API latency percentiles and memory
+
+    python3 loadtest.py --events 200000 --clients 16 --duration 30
+    python3 loadtest.py --input events.ndjson --json report.json
+
+Nothing talks to a cluster: the dashboard runs with KUBE_CLIENT=kubectl and
+all paths point into the work directory.
+"""
+import argparse
+import http.client
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import loadgen
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ENDPOINTS = '/api/runtime/alerts,/api/runtime/stats'
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def rss_kb(pid):
+    """Resident memory of a process and its children, from /proc."""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status", 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+                        break
+            with open(f"/proc/{current}/task/{current}/children", 'r') as f:
+                pids.extend(int(c) for c in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def generate(path, args):
+    gen = loadgen.EventGenerator(
+        seed=args.seed, pods=args.pods, binaries=args.binaries, processes=args.processes,
+        mix=loadgen.parse_mix(args.mix), burst=args.burst, rate=args.rate,
+        start=time.time() - args.events / args.rate,
+    )
+    started = time.perf_counter()
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in gen.lines(args.events):
+            f.write(line + '\n')
+    return {'events': args.events, 'seconds': round(time.perf_counter() - started, 3), 'kinds': gen.counts}
+
+
+def replay(events_path, workdir, args):
+    """Run the collector over the events file; returns throughput and memory."""
+    stats_path = os.path.join(workdir, 'collector_stats.json')
+    cmd = [sys.executable, os.path.join(HERE, 'collector.py'), '--input', events_path,
+           '--segment-dir', os.path.join(workdir, 'runtime_log'), '--stats-file', stats_path,
+           '--coalesce-window', str(args.coalesce_window), '--truncate']
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    started = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    with open(stats_path, 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    return {
+        'seconds': round(elapsed, 3),
+        'events': stats.get('events'),
+        'events_per_sec': round((stats.get('events') or 0) / elapsed, 1),
+        'records_written': (stats.get('coalesce') or {}).get('records_out', stats.get('events')),
+        'bytes_written': stats.get('bytes_written'),
+        # ru_maxrss only grows; a smaller later child does not show up
+        'max_rss_mb': round(max(peak, before) / 1024, 1),
+    }
+
+
+def start_server(workdir, port, args):
+    env = dict(
+        os.environ,
+        RUNTIME_LOG_DIR=os.path.join(workdir, 'runtime_log'),
+        RUNTIME_LOGS_PATH=os.path.join(workdir, 'runtime_alerts.json'),
+        RESULT_JSON_PATH=os.path.join(workdir, 'results.json'),
+        HISTORY_DB_PATH=os.path.join(workdir, 'history.db'),
+        NODE_RESULTS_DIR=os.path.join(workdir, 'nodes'),
+        COLLECTOR_STATS_PATH=os.path.join(workdir, 'collector_stats.json'),
+        KUBE_CLIENT='kubectl',
+    )
+    if args.server == 'gunicorn':
+        env.update(SHARED_STATE_DIR=os.path.join(workdir, 'shared'), WEB_CONCURRENCY=str(args.workers),
+                   DASHBOARD_BIND=f"127.0.0.1:{port}", DASHBOARD_ACCESS_LOG='/dev/null')
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+    else:
+        env.pop('SHARED_STATE_DIR', None)
+        cmd = [sys.executable, '-c',
+               f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    proc = subprocess.Popen(cmd, cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Dashboard exited early, see {log.name}")
+        try:
+            status, _ = get('127.0.0.1', port, '/healthz')
+            if status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"Dashboard did not start, see {log.name}")
+
+
+def get(host, port, path, conn=None):
+    own = conn is None
+    conn = conn or http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        conn.request('GET', path)
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    finally:
+        if own:
+            conn.close()
+
+
+def wait_for_ingest(port, expected, timeout):
+    """Seconds until the dashboard ingester has read `expected` log lines."""
+    started = time.perf_counter()
+    lines = 0
+    while time.perf_counter() - started < timeout:
+        status, body = get('127.0.0.1', port, '/healthz')
+        if status == 200:
+            lines = (json.loads(body).get('ingest') or {}).get('lines', 0)
+            if lines >= expected:
+                return round(time.perf_counter() - started, 3), lines
+        time.sleep(0.1)
+    return None, lines
+
+
+def drive(port, endpoints, clients, duration, requests_per_client, server_pid):
+    latencies = {e: [] for e in endpoints}
+    errors = {e: 0 for e in endpoints}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration if duration else None
+    peak_rss = [0]
+    sampling = threading.Event()
+
+    def sample():
+        while not sampling.is_set():
+            peak_rss[0] = max(peak_rss[0], rss_kb(server_pid))
+            sampling.wait(0.2)
+
+    def client(index):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        n = 0
+        while True:
+            if stop_at is not None and time.monotonic() >= stop_at:
+                break
+            if stop_at is None and n >= requests_per_client:
+                break
+            endpoint = endpoints[(index + n) % len(endpoints)]
+            started = time.perf_counter()
+            try:
+                status, _ = get('127.0.0.1', port, endpoint, conn)
+                ok = status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies[endpoint].append(elapsed)
+                else:
+                    errors[endpoint] += 1
+            n += 1
+        conn.close()
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    wall = time.perf_counter() - started
+    sampling.set()
+    sampler.join()
+
+    report = {'seconds': round(wall, 3), 'clients': clients, 'endpoints': {},
+              'server_peak_rss_mb': round(peak_rss[0] / 1024, 1)}
+    for endpoint, values in latencies.items():
+        values.sort()
+        report['endpoints'][endpoint] = {
+            'requests': len(values),
+            'errors': errors[endpoint],
+            'req_per_sec': round(len(values) / wall, 1),
+            'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+            'p90_ms': round(percentile(values, 90) * 1000, 2) if values else None,
+            'p99_ms': round(percentile(values, 99) * 1000, 2) if values else None,
+            'max_ms': round(values[-1] * 1000, 2) if values else None,
+        }
+    return report
+
+
+def print_report(report):
+    gen, col, ing, load = report.get('generate'), report['collector'], report['ingest'], report['load']
+    if gen:
+        print(f"[+] generated {gen['events']} events in {gen['seconds']}s {gen['kinds']}")
+    print(f"[+] collector: {col['events']} events in {col['seconds']}s "
+          f"({col['events_per_sec']}/s), {col['records_written']} records, max RSS {col['max_rss_mb']} MB")
+    caught_up = f"{ing['seconds']}s" if ing['seconds'] is not None else 'timed out'
+    print(f"[+] dashboard ingest: {ing['lines']} lines, caught up in {caught_up}, "
+          f"RSS after ingest {ing['server_rss_mb']} MB")
+    print(f"[+] load: {load['clients']} clients for {load['seconds']}s, server peak RSS {load['server_peak_rss_mb']} MB")
+    for endpoint, e in load['endpoints'].items():
+        print(f"    {endpoint:28} {e['requests']:>7} req {e['req_per_sec']:>8}/s  "
+              f"p50 {e['p50_ms']} ms  p90 {e['p90_ms']} ms  p99 {e['p99_ms']} ms  errors {e['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline load test for collector + dashboard')
+    parser.add_argument('--input', help='existing NDJSON events file (default: generate)')
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--rate', type=float, default=2000.0, help='event clock rate for generated events')
+    parser.add_argument('--pods', type=int, default=50)
+    parser.add_argument('--binaries', type=int, default=len(loadgen.BINARIES))
+    parser.add_argument('--processes', type=int, default=2000)
+    parser.add_argument('--mix', default='')
+    parser.add_argument('--burst', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--coalesce-window', type=float, default=5.0)
+    parser.add_argument('--server', choices=('gunicorn', 'dev'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent API clients')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of API load (0 = use --requests)')
+    parser.add_argument('--requests', type=int, default=100, help='requests per client when --duration is 0')
+    parser.add_argument('--endpoints', default=DEFAULT_ENDPOINTS)
+    parser.add_argument('--ingest-timeout', type=float, default=120.0)
+    parser.add_argument('--workdir', help='keep files here instead of a temporary directory')
+    parser.add_argument('--json', help='also write the report as JSON to this path')
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='dashboard-loadtest-')
+    os.makedirs(workdir, exist_ok=True)
+    report = {'workdir': workdir}
+    proc = None
+    try:
+        events_path = args.input
+        if not events_path:
+            events_path = os.path.join(workdir, 'events.ndjson')
+            report['generate'] = generate(events_path, args)
+        report['collector'] = replay(events_path, workdir, args)
+
+        port = free_port()
+        proc = start_server(workdir, port, args)
+        seconds, lines = wait_for_ingest(port, report['collector']['records_written'] or 0, args.ingest_timeout)
+        report['ingest'] = {'seconds': seconds, 'lines': lines, 'server_rss_mb': round(rss_kb(proc.pid) / 1024, 1)}
+
+        endpoints = [e for e in args.endpoints.split(',') if e]
+        report['load'] = drive(port, endpoints, args.clients, args.duration, args.requests, proc.pid)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
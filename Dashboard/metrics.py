@@ -0,0 +1,194 @@
+"""
+Minimal Prometheus-style metrics for the dashboard.
+
+Counters, gauges and histograms with labels, kept in plain dicts so the hot
+paths only pay for a lock and a dict update. `snapshot()` returns a JSON-able
+copy; snapshots from several worker processes can be merged (counters and
+histograms summed, gauges by their maximum) and rendered in the Prometheus
+text exposition format.
+"""
+import bisect
+import threading
+import time
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _label_key(labelnames, values):
+    return '\x1f'.join(str(values.get(n, '')) for n in labelnames)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'kind': self.kind, 'help': self.help, 'labels': list(self.labelnames),
+                'values': {k: (list(v) if isinstance(v, list) else v) for k, v in self.values.items()},
+            }
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        # Per-bucket (not cumulative) counts, then sum and count
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def time(self, **labels):
+        """Decorator recording the wrapped function's duration."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, **labels)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        snap = super().snapshot()
+        snap['buckets'] = list(self.buckets)
+        return snap
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def snapshot(self):
+        return {name: m.snapshot() for name, m in self.metrics.items()}
+
+
+def merge(snapshots):
+    """
+    Merge several registry snapshots (e.g. one per worker process). Counters
+    and histograms add up; a gauge is a level each worker measures itself,
+    so the merged value is the highest one.
+    """
+    merged = {}
+    for snap in snapshots:
+        for name, metric in snap.items():
+            target = merged.get(name)
+            if target is None:
+                merged[name] = dict(metric, values={k: (list(v) if isinstance(v, list) else v)
+                                                    for k, v in metric['values'].items()})
+                continue
+            for key, value in metric['values'].items():
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['values'][key] = [a + b for a, b in zip(current, value)]
+                elif metric['kind'] == 'gauge':
+                    target['values'][key] = max(current, value)
+                else:
+                    target['values'][key] = current + value
+    return merged
+
+
+def fold_exited(total, snapshot):
+    """
+    Add an exited worker's last snapshot to the running total of exited
+    workers, so merged counters do not go backwards when it disappears. Its
+    gauges no longer describe anything and are dropped.
+    """
+    kept = {name: m for name, m in snapshot.items() if m['kind'] != 'gauge'}
+    return merge([total, kept]) if total else merge([kept])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, key, extra=None):
+    values = key.split('\x1f') if names else []
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        kind, names = metric['kind'], metric['labels']
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key in sorted(metric['values']):
+            value = metric['values'][key]
+            if kind != 'histogram':
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + [float('inf')], value[:-2]):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(names, key)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,321 @@
+"""
+Per-pod Tetragon log collection with resumable checkpoints.
+
+Instead of one `kubectl logs -l ... --follow` over every Tetragon pod (where
+one slow node stalls the merged stream), each pod is followed by its own
+asyncio task. Every task remembers the time of the last event it handed to
+the writer and the hashes of the events at that exact time, so after a
+restart it asks only for logs since that time and drops the overlap: no
+duplicates and no truncation of the runtime log.
+
+Pod streams come from a source:
+  - KubectlPods:   `kubectl get pods` for discovery, `kubectl logs <pod>
+                   --follow --since-time=...` per pod
+  - DirectoryPods: one file per pod in a local directory (`<pod>.log`),
+                   followed like `tail -f`; a stand-in for testing and replay
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+
+from events import parse_line, event_timestamp, rfc3339
+
+CHECKPOINT_PATH = os.environ.get('COLLECTOR_CHECKPOINT_PATH', '/output/collector_checkpoints.json')
+# How often pods are (re)discovered and checkpoints saved
+DISCOVERY_INTERVAL = float(os.environ.get('COLLECTOR_DISCOVERY_INTERVAL', '30'))
+CHECKPOINT_INTERVAL = float(os.environ.get('COLLECTOR_CHECKPOINT_INTERVAL', '5'))
+# Logs are requested from this long before the checkpoint: container log
+# timestamps are a little later than event times, the overlap is dropped
+RESUME_SLACK = float(os.environ.get('COLLECTOR_RESUME_SLACK', '5'))
+# Checkpoints of pods not seen for this long are forgotten
+CHECKPOINT_RETENTION = float(os.environ.get('COLLECTOR_CHECKPOINT_RETENTION', str(24 * 3600)))
+# Hashes of events without a timestamp remembered per pod, to drop them
+# when the resume overlap replays them
+UNTIMED_HASHES = 1024
+# Longest log line accepted from a pod stream
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+def event_hash(text):
+    return hashlib.blake2b(text.encode('utf-8', 'replace'), digest_size=8).hexdigest()
+
+
+class Checkpoints:
+    """
+    Per-pod resume positions: {pod: {'time', 'hashes', 'untimed', 'events', 'seen'}}.
+    `time` is the newest event time handed to the writer and `hashes` the
+    events at exactly that time, which is all that is needed to drop the
+    overlap when a stream is reopened from `time`. Events without a
+    timestamp cannot be placed against `time`; `untimed` holds [hash,
+    anchor time] of the recent ones, and while a reopened stream replays
+    its overlap those are dropped too.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, reset=False):
+        self.path = path
+        self.pods = {}
+        if path and not reset:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.pods = json.load(f).get('pods', {})
+            except (OSError, ValueError):
+                self.pods = {}
+        for entry in self.pods.values():
+            entry['hashes'] = set(entry.get('hashes', ()))
+            entry['untimed'] = [tuple(u) for u in entry.get('untimed', ())]
+
+    def get(self, pod):
+        entry = self.pods.get(pod)
+        if entry is None:
+            entry = self.pods[pod] = {'time': None, 'hashes': set(), 'untimed': [], 'events': 0,
+                                      'seen': time.time()}
+        return entry
+
+    def resume_time(self, pod):
+        """Where to reopen a pod's stream; what follows up to `time` is a replay."""
+        entry = self.pods.get(pod)
+        if entry is None:
+            return None
+        entry['replay'] = True
+        return entry['time']
+
+    def accept(self, pod, ts, text):
+        """True if the event is new for this pod (and record it), False if already collected."""
+        entry = self.get(pod)
+        if ts is None:
+            digest = event_hash(text)
+            if entry.get('replay') and any(h == digest for h, _ in entry['untimed']):
+                return False
+            entry['untimed'].append((digest, entry['time']))
+            del entry['untimed'][:-UNTIMED_HASHES]
+            entry['events'] += 1
+            return True
+        if entry['time'] is None or ts > entry['time']:
+            # Past the checkpoint: the stream is live again, and untimed
+            # events from before the resume window can no longer be replayed
+            entry['replay'] = False
+            if entry['untimed']:
+                horizon = ts - RESUME_SLACK
+                entry['untimed'] = [u for u in entry['untimed'] if u[1] is None or u[1] >= horizon]
+        if entry['time'] is not None:
+            if ts < entry['time']:
+                return False
+            digest = event_hash(text)
+            if ts == entry['time']:
+                if digest in entry['hashes']:
+                    return False
+                entry['hashes'].add(digest)
+            else:
+                entry['time'] = ts
+                entry['hashes'] = {digest}
+        else:
+            entry['time'] = ts
+            entry['hashes'] = {event_hash(text)}
+        entry['events'] += 1
+        return True
+
+    def touch(self, pods):
+        now = time.time()
+        for pod in pods:
+            self.get(pod)['seen'] = now
+        for pod in [p for p, e in self.pods.items() if now - e.get('seen', now) > CHECKPOINT_RETENTION]:
+            del self.pods[pod]
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        data = {'pods': {pod: {k: v for k, v in dict(e, hashes=sorted(e['hashes'])).items() if k != 'replay'}
+                         for pod, e in self.pods.items()}}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[-] Could not save collector checkpoints: {e}", file=sys.stderr)
+
+
+class KubectlPods:
+    """Tetragon pods and their logs through kubectl."""
+
+    def __init__(self, namespace, selector, tail=1000):
+        self.namespace = namespace
+        self.selector = selector
+        self.tail = tail
+        self.follow = True
+
+    async def pods(self):
+        proc = await asyncio.create_subprocess_exec(
+            'kubectl', 'get', 'pods', '-n', self.namespace, '-l', self.selector,
+            '--field-selector=status.phase=Running', '-o', 'jsonpath={.items[*].metadata.name}',
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        out, _ = await proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError('kubectl get pods failed')
+        return set(out.decode().split())
+
+    async def lines(self, pod, since=None):
+        cmd = ['kubectl', 'logs', '-n', self.namespace, pod, '--follow']
+        if since is not None:
+            cmd.append(f"--since-time={rfc3339(max(0.0, since - RESUME_SLACK))}")
+        else:
+            cmd.append(f"--tail={self.tail}")
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL, limit=LINE_LIMIT)
+        try:
+            while True:
+                line = await proc.stdout.readline()
+                if not line:
+                    break
+                yield line.decode('utf-8', 'replace')
+        finally:
+            if proc.returncode is None:
+                proc.terminate()
+            await proc.wait()
+
+
+class DirectoryPods:
+    """
+    Local stand-in for a set of pod streams: every `<pod>.log` file in a
+    directory is one pod. With follow=True files are tailed for new lines,
+    otherwise each stream ends at end of file.
+    """
+
+    def __init__(self, directory, follow=True, poll_interval=0.2):
+        self.directory = directory
+        self.follow = follow
+        self.poll_interval = poll_interval
+
+    async def pods(self):
+        return {name[:-4] for name in os.listdir(self.directory) if name.endswith('.log')}
+
+    async def lines(self, pod, since=None):
+        # The whole file is read; the checkpoint drops what was collected before
+        with open(os.path.join(self.directory, f"{pod}.log"), 'r', encoding='utf-8', errors='replace') as f:
+            partial = ''
+            while True:
+                line = f.readline()
+                if line.endswith('\n'):
+                    yield partial + line
+                    partial = ''
+                elif line:
+                    partial += line
+                elif not self.follow:
+                    break
+                else:
+                    await asyncio.sleep(self.poll_interval)
+            if partial:
+                yield partial
+
+
+class PodCollector:
+    """Follows every pod of a source concurrently and feeds the writer (or coalescer)."""
+
+    def __init__(self, source, sink, stats, checkpoints, discovery_interval=DISCOVERY_INTERVAL,
+                 checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.source = source
+        self.sink = sink
+        self.stats = stats
+        self.checkpoints = checkpoints
+        self.discovery_interval = discovery_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.tasks = {}
+        # pod -> {'lines', 'events', 'duplicates', 'restarts', 'last_event_time', 'lag_seconds', 'connected'}
+        self.pod_stats = {}
+
+    def _pod_stats(self, pod):
+        return self.pod_stats.setdefault(pod, {
+            'lines': 0, 'events': 0, 'duplicates': 0, 'restarts': 0,
+            'last_event_time': None, 'lag_seconds': None, 'connected': False,
+        })
+
+    async def follow(self, pod):
+        """Follow one pod, reopening its stream with backoff until it goes away."""
+        pstats = self._pod_stats(pod)
+        backoff = 1
+        while True:
+            since = self.checkpoints.resume_time(pod)
+            try:
+                pstats['connected'] = True
+                async for line in self.source.lines(pod, since):
+                    self.handle(pod, line, pstats)
+                    backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[-] Stream for {pod} failed: {e}", file=sys.stderr, flush=True)
+            finally:
+                pstats['connected'] = False
+            if not self.source.follow:
+                return
+            pstats['restarts'] += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def handle(self, pod, line, pstats):
+        self.stats.lines += 1
+        pstats['lines'] += 1
+        parsed = parse_line(line)
+        if parsed is None:
+            self.stats.skipped += 1
+            return
+        text, event = parsed
+        ts = event_timestamp(event)
+        if not self.checkpoints.accept(pod, ts, text):
+            pstats['duplicates'] += 1
+            return
+        self.sink(text, event, ts)
+        self.stats.record_event(ts)
+        pstats['events'] += 1
+        if ts is not None:
+            pstats['last_event_time'] = ts
+            pstats['lag_seconds'] = round(max(0.0, time.time() - ts), 3)
+
+    async def discover(self):
+        try:
+            pods = await self.source.pods()
+        except Exception as e:
+            print(f"[-] Pod discovery failed: {e}", file=sys.stderr, flush=True)
+            return
+        self.checkpoints.touch(pods)
+        for pod in pods:
+            task = self.tasks.get(pod)
+            if task is None or (task.done() and self.source.follow):
+                print(f"[+] Following {pod}", flush=True)
+                self.tasks[pod] = asyncio.ensure_future(self.follow(pod))
+        for pod in [p for p in self.tasks if p not in pods]:
+            self.tasks.pop(pod).cancel()
+            print(f"[+] Stopped following {pod}", flush=True)
+
+    async def run(self, on_tick=None):
+        """
+        Discover pods and follow them until cancelled (or, without follow,
+        until every stream ends). `on_tick` runs before each checkpoint save,
+        and must flush everything accepted so far to disk, including events
+        still buffered in a coalescing window: the checkpoint covers every
+        accepted event.
+        """
+        await self.discover()
+        next_discovery = time.monotonic() + self.discovery_interval
+        try:
+            while True:
+                if not self.source.follow and all(t.done() for t in self.tasks.values()):
+                    break
+                await asyncio.sleep(self.checkpoint_interval if self.source.follow else 0.05)
+                if on_tick is not None:
+                    on_tick()
+                self.checkpoints.save()
+                if self.source.follow and time.monotonic() >= next_discovery:
+                    await self.discover()
+                    next_discovery = time.monotonic() + self.discovery_interval
+        finally:
+            for task in self.tasks.values():
+                task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def snapshot(self):
+        return {pod: dict(s) for pod, s in sorted(self.pod_stats.items())}
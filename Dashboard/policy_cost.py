@@ -0,0 +1,239 @@
+"""
+Per-TracingPolicy cost of runtime ingest.
+
+Every line the ingester reads is attributed to the TracingPolicy that
+produced it: the event's `policy_name` when Tetragon sets it, otherwise the
+policy whose YAML (under POLICY_DIR) declares the tracepoint or kprobe call.
+process_exec / process_exit events come from Tetragon itself and are
+reported under their event kind. Per policy the profiler keeps events
+(coalesced bursts counted in full), log records and bytes, the ingest time
+spent on its lines (decode plus every consumer) and the busiest binaries, so
+selectors can be tightened where they cost the most.
+
+Served live on /api/runtime/policies, or offline over a log:
+
+    python3 policy_cost.py /output/runtime_log
+    python3 policy_cost.py events.ndjson --policies ../Runtime/Tracepoints --json report.json
+
+Offline, the time per policy is the json decode time only.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import segments
+from events import call_key, classify_event, event_count, event_timestamp, event_type
+from loadgen import POLICY_DIR, load_policies
+from sketches import SpaceSaving
+
+POLICY_PROFILE_ENABLED = os.environ.get('POLICY_PROFILE_ENABLED', '1') == '1'
+# Seconds of event time the recent rates are computed over
+POLICY_PROFILE_WINDOW = int(os.environ.get('POLICY_PROFILE_WINDOW', '60'))
+# Busiest binaries tracked per policy
+POLICY_PROFILE_BINARIES = 32
+
+def policy_calls(directory=POLICY_DIR):
+    """{('tracepoint', event) or ('kprobe', call): [policy, ...]} from the policy files."""
+    try:
+        tracepoints, kprobes = load_policies(directory)
+    except OSError:
+        return {}
+    calls = {}
+    for policy, _, event in tracepoints:
+        calls.setdefault(('tracepoint', event), []).append(policy)
+    for policy, call in kprobes:
+        calls.setdefault(('kprobe', call_key(call or '')), []).append(policy)
+    return calls
+
+
+class PolicyProfiler:
+    """Ingest cost per TracingPolicy; call record() once per log line."""
+
+    def __init__(self, calls=None, window=POLICY_PROFILE_WINDOW):
+        self.calls = policy_calls() if calls is None else calls
+        self.window = window
+        self.lock = threading.Lock()
+        # policy -> [events, records, bytes, seconds, shed]
+        self.totals = {}
+        self.binaries = {}
+        # (event second, {policy: [events, bytes, seconds]}), oldest first
+        self.buckets = deque()
+        self.first_ts = None
+        self.last_ts = None
+        self.seconds = 0.0
+        # (kind, call) -> policy, for events without a policy_name
+        self._attributed = {}
+
+    def attribute(self, event):
+        """Name of the policy (or event kind) an event is charged to."""
+        kind = event_type(event)
+        if kind in ('process_tracepoint', 'process_kprobe'):
+            policy = event[kind].get('policy_name')
+            if policy:
+                return policy
+            call, _ = classify_event(event)
+            key = (kind, call)
+            policy = self._attributed.get(key)
+            if policy is None:
+                short = 'tracepoint' if kind == 'process_tracepoint' else 'kprobe'
+                policies = self.calls.get((short, call if short == 'tracepoint' else call_key(call)))
+                policy = ' | '.join(sorted(set(policies))) if policies else f"unmatched:{call}"
+                self._attributed[key] = policy
+            return policy
+        return kind or 'unknown'
+
+    def record(self, event, nbytes, seconds, shed=False):
+        policy = self.attribute(event)
+        count = event_count(event)
+        ts = event_timestamp(event)
+        _, binary = classify_event(event)
+        if binary == 'unknown':
+            # process_exit and other kinds classify_event does not name
+            binary = ((event.get(event_type(event) or '') or {}).get('process') or {}).get('binary', binary)
+        with self.lock:
+            self.seconds += seconds
+            totals = self.totals.get(policy)
+            if totals is None:
+                totals = self.totals[policy] = [0, 0, 0, 0.0, 0]
+                self.binaries[policy] = SpaceSaving(POLICY_PROFILE_BINARIES)
+            totals[0] += count
+            totals[1] += 1
+            totals[2] += nbytes
+            totals[3] += seconds
+            if shed:
+                totals[4] += count
+            self.binaries[policy].add(binary, count)
+            if ts is None:
+                return
+            if self.first_ts is None or ts < self.first_ts:
+                self.first_ts = ts
+            if self.last_ts is None or ts > self.last_ts:
+                self.last_ts = ts
+            second = int(ts)
+            if not self.buckets or second > self.buckets[-1][0]:
+                self.buckets.append((second, {}))
+                while self.buckets[0][0] <= second - self.window:
+                    self.buckets.popleft()
+            # Late events land in the newest bucket
+            bucket = self.buckets[-1][1].get(policy)
+            if bucket is None:
+                bucket = self.buckets[-1][1][policy] = [0, 0, 0.0]
+            bucket[0] += count
+            bucket[1] += nbytes
+            bucket[2] += seconds
+
+    def report(self, top_binaries=5):
+        """Policies by ingest time, with rates over the whole run and the recent window."""
+        with self.lock:
+            span = (self.last_ts - self.first_ts) if self.first_ts is not None else 0.0
+            recent = {}
+            for _, bucket in self.buckets:
+                for policy, values in bucket.items():
+                    acc = recent.setdefault(policy, [0, 0, 0.0])
+                    for i, v in enumerate(values):
+                        acc[i] += v
+            window = self.buckets[-1][0] - self.buckets[0][0] + 1 if self.buckets else 1
+            total_bytes = sum(t[2] for t in self.totals.values())
+            total_events = sum(t[0] for t in self.totals.values())
+            policies = []
+            for policy, (events, records, nbytes, seconds, shed) in self.totals.items():
+                last = recent.get(policy, [0, 0, 0.0])
+                policies.append({
+                    'policy': policy,
+                    'events': events,
+                    'records': records,
+                    'bytes': nbytes,
+                    'shed': shed,
+                    'cpu_seconds': round(seconds, 4),
+                    'cpu_share': round(seconds / self.seconds, 4) if self.seconds else None,
+                    'event_share': round(events / total_events, 4) if total_events else None,
+                    'byte_share': round(nbytes / total_bytes, 4) if total_bytes else None,
+                    'events_per_second': round(events / span, 2) if span > 0 else None,
+                    'bytes_per_second': round(nbytes / span, 1) if span > 0 else None,
+                    'us_per_event': round(seconds / events * 1e6, 1) if events else None,
+                    'recent': {
+                        'events_per_second': round(last[0] / window, 2),
+                        'bytes_per_second': round(last[1] / window, 1),
+                        'cpu_seconds': round(last[2], 4),
+                    },
+                    'top_binaries': dict(self.binaries[policy].top(top_binaries)),
+                })
+            policies.sort(key=lambda p: (-p['cpu_seconds'], p['policy']))
+            return {
+                'policies': policies,
+                'totals': {
+                    'events': total_events,
+                    'bytes': total_bytes,
+                    'cpu_seconds': round(self.seconds, 4),
+                    'span_seconds': round(span, 1),
+                    'window_seconds': window,
+                },
+                'policy_files': len(set(p for ps in self.calls.values() for p in ps)),
+            }
+
+
+def profile_log(path, profiler):
+    """Feed every line of a segment directory or NDJSON file to the profiler."""
+    def lines():
+        if segments.is_segment_dir(path):
+            for entry in segments.load_index(path):
+                f = segments.open_segment(path, entry)
+                if f is None:
+                    continue
+                with f:
+                    yield from f
+        else:
+            with open(path, 'rb') as f:
+                yield from f
+
+    for line in lines():
+        if not line.strip():
+            continue
+        started = time.perf_counter()
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        elapsed = time.perf_counter() - started
+        if isinstance(event, dict):
+            profiler.record(event, len(line), elapsed)
+
+
+def format_report(report):
+    header = f"{'policy':<34} {'events':>10} {'ev/s':>9} {'MiB':>8} {'bytes%':>7} {'cpu%':>6} {'us/ev':>7}  top binary"
+    out = [header, '-' * len(header)]
+    for p in report['policies']:
+        top = next(iter(p['top_binaries']), '')
+        out.append(
+            f"{p['policy'][:34]:<34} {p['events']:>10} {p['events_per_second'] or 0:>9.1f} "
+            f"{p['bytes'] / 1048576:>8.2f} {100 * (p['byte_share'] or 0):>6.1f}% "
+            f"{100 * (p['cpu_share'] or 0):>5.1f}% {p['us_per_event'] or 0:>7.1f}  {top}")
+    t = report['totals']
+    out.append(f"\n{t['events']} events, {t['bytes'] / 1048576:.2f} MiB over {t['span_seconds']}s of event time, "
+               f"{t['cpu_seconds']:.2f}s decoding")
+    return '\n'.join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Events, bytes and ingest time per TracingPolicy in a runtime log')
+    parser.add_argument('log', help='segment directory or NDJSON file')
+    parser.add_argument('--policies', default=POLICY_DIR, help='directory of TracingPolicy YAML files')
+    parser.add_argument('--json', help='also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    profiler = PolicyProfiler(policy_calls(args.policies))
+    profile_log(args.log, profiler)
+    report = profiler.report()
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
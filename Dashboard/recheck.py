@@ -0,0 +1,326 @@
+"""
+Targeted compliance re-checks triggered by runtime events.
+
+CorrelationIndex maps the files and binaries that CIS checks audit to the
+check IDs, using the `audit_command` of each check in the latest results.
+For example, `stat ... /etc/kubernetes/manifests/kube-apiserver.yaml` maps
+to 1.1.1/1.1.2, `find /etc/kubernetes/pki/` to 1.1.19-1.1.21 and
+`ps -ef | grep kube-apiserver` to section 1.2.
+
+RecheckTrigger is a raw ingest consumer. When a chmod/chown/rename/unlink
+event touches a watched path, or a watched binary is exec'd (restarted with
+possibly different flags), the matching check IDs are queued per node.
+After RECHECK_DEBOUNCE seconds without new matches they are handed to
+`launch(node, check_ids)`, which runs only those checks; the compliance
+engine merges the new results into the current result set. Only nodes the
+current results were scanned on (the control plane) are re-checked; events
+from other nodes are counted and logged once per node. A re-check Job that
+stays pending past RECHECK_JOB_DEADLINE (e.g. unschedulable) is deleted so
+it does not block later re-checks.
+"""
+import os
+import posixpath
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from check_index import natural_key
+from events import event_timestamp
+from lineage import event_body
+
+# Off unless asked for: a re-check creates a privileged Job on the cluster
+RECHECK_ENABLED = os.environ.get('RECHECK_ENABLED', '0') == '1'
+# Wait this long after the last matching event before launching
+RECHECK_DEBOUNCE = float(os.environ.get('RECHECK_DEBOUNCE', '5'))
+# Minimum time between two launches for the same node
+RECHECK_COOLDOWN = float(os.environ.get('RECHECK_COOLDOWN', '30'))
+RECHECK_MAX_ATTEMPTS = int(os.environ.get('RECHECK_MAX_ATTEMPTS', '5'))
+# Events older than this (e.g. replayed at startup) never trigger a re-check
+RECHECK_MAX_AGE = float(os.environ.get('RECHECK_MAX_AGE', '300'))
+# A re-check Job still without a ready pod after this long (e.g. it cannot be
+# scheduled) is treated as failed and deleted
+RECHECK_JOB_DEADLINE = float(os.environ.get('RECHECK_JOB_DEADLINE', '300'))
+# Tracepoint events and kprobe calls that can change what a file check sees
+RECHECK_CALLS = set(os.environ.get(
+    'RECHECK_CALLS',
+    'sys_enter_chmod,sys_enter_fchmodat,sys_enter_chown,sys_enter_fchownat,'
+    'security_inode_rename,security_inode_unlink'
+).split(','))
+
+PATH_RE = re.compile(r"(?<![\w$.\-])(/(?:[\w.\-]+/?)+)")
+GREP_RE = re.compile(r"\bps\s+-\w+\s*\|\s*(?:/bin/)?grep\s+(?:--\s+)?([\w.\-]+)")
+# Audited files live under these roots; other path-like strings in audit
+# commands are tools (/bin/ps) or sed expressions (s%.*%\1%)
+WATCHED_ROOTS = ('/etc/', '/var/', '/opt/', '/srv/', '/run/', '/root/', '/usr/lib/', '/usr/local/etc/')
+
+
+def audit_targets(command):
+    """Return (paths, binaries) audited by a check's audit command."""
+    if not command:
+        return set(), set()
+    paths = set()
+    for path in PATH_RE.findall(command):
+        if path.startswith(WATCHED_ROOTS):
+            paths.add(path.rstrip('/'))
+    return paths, set(GREP_RE.findall(command))
+
+
+def event_paths(event):
+    """Absolute paths carried by an event's arguments."""
+    kind, body = event_body(event)
+    if body is None:
+        return []
+    paths = []
+    for arg in body.get('args') or []:
+        if not isinstance(arg, dict):
+            continue
+        for key in ('file_arg', 'path_arg'):
+            value = arg.get(key)
+            if isinstance(value, dict) and value.get('path'):
+                paths.append(value['path'])
+        value = arg.get('string_arg')
+        if isinstance(value, str) and value.startswith('/'):
+            paths.append(value)
+    if not paths:
+        # Tracepoints without declared args: fall back to the command line
+        # (`chmod 644 /etc/kubernetes/manifests/kube-apiserver.yaml`)
+        arguments = (body.get('process') or {}).get('arguments') or ''
+        paths = [a for a in arguments.split() if a.startswith('/')]
+    return [posixpath.normpath(p) for p in paths]
+
+
+def event_call(event):
+    kind, body = event_body(event)
+    if body is None:
+        return kind, ''
+    return kind, body.get('event') or body.get('function_name') or ''
+
+
+class CorrelationIndex:
+    def __init__(self, results=()):
+        self.by_path = {}
+        self.by_binary = {}
+        for item in results:
+            if not isinstance(item, dict) or not item.get('check_id'):
+                continue
+            paths, binaries = audit_targets(item.get('audit_command'))
+            for path in paths:
+                self.by_path.setdefault(path, set()).add(item['check_id'])
+            for binary in binaries:
+                self.by_binary.setdefault(binary, set()).add(item['check_id'])
+        self.paths = sorted(self.by_path)
+
+    def __len__(self):
+        return len(self.by_path) + len(self.by_binary)
+
+    def for_path(self, path):
+        """
+        Checks auditing `path`, a directory containing it (pki/ → every cert)
+        or a file below it (renaming manifests/ affects every manifest).
+        """
+        found = set()
+        parent = path
+        while parent and parent != '/':
+            found |= self.by_path.get(parent, set())
+            parent = posixpath.dirname(parent)
+        prefix = path.rstrip('/') + '/'
+        i = bisect_left(self.paths, prefix)
+        while i < len(self.paths) and self.paths[i].startswith(prefix):
+            found |= self.by_path[self.paths[i]]
+            i += 1
+        return found
+
+    def for_binary(self, binary):
+        return set(self.by_binary.get(posixpath.basename(binary or ''), ()))
+
+    def match(self, event):
+        """(check IDs, reason) affected by one runtime event."""
+        kind, call = event_call(event)
+        if kind == 'process_exec':
+            binary = (event_body(event)[1].get('process') or {}).get('binary', '')
+            found = self.for_binary(binary)
+            return found, f"{posixpath.basename(binary)} started" if found else ''
+        if call not in RECHECK_CALLS:
+            return set(), ''
+        found = set()
+        touched = []
+        for path in event_paths(event):
+            hits = self.for_path(path)
+            if hits:
+                found |= hits
+                touched.append(path)
+        return found, f"{call} {', '.join(touched)}" if found else ''
+
+
+class RecheckTrigger:
+    """Queues check IDs from matching events and launches them per node after a debounce."""
+
+    def __init__(self, launch, index_source, debounce=RECHECK_DEBOUNCE, cooldown=RECHECK_COOLDOWN,
+                 max_age=RECHECK_MAX_AGE, job_state=None, cancel=None, job_deadline=RECHECK_JOB_DEADLINE):
+        """
+        `index_source()` returns (version, results, nodes): the results the
+        index is built from and the nodes they were scanned on; events from
+        other nodes are not re-checked. `job_state()` returns
+        {'pending': bool, 'age': seconds} for the current re-check Job (or
+        None) and `cancel()` deletes it.
+        """
+        self.launch = launch
+        self.index_source = index_source
+        self.job_state = job_state
+        self.cancel = cancel
+        self.job_deadline = job_deadline
+        # Nodes the current results were scanned on
+        self.nodes = set()
+        # node -> events skipped because the results do not cover it
+        self.skipped = {}
+        self.debounce = debounce
+        self.cooldown = cooldown
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.index = CorrelationIndex()
+        self.index_version = None
+        self.index_checked = 0.0
+        # node -> {'checks': set, 'reasons': list, 'last_match': monotonic}
+        self.pending = {}
+        self.last_launch = {}
+        self.history = deque(maxlen=50)
+        self.stats = {'matched_events': 0, 'launches': 0, 'failed_launches': 0, 'skipped_events': 0,
+                      'stuck_jobs': 0}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh_index(self):
+        """Rebuild the index when the results it is derived from change (checked once a second)."""
+        now = time.monotonic()
+        if now - self.index_checked < 1.0:
+            return
+        self.index_checked = now
+        version, results, nodes = self.index_source()
+        self.nodes = set(nodes or ())
+        if version != self.index_version:
+            self.index = CorrelationIndex(results or ())
+            self.index_version = version
+
+    def __call__(self, event):
+        ts = event_timestamp(event)
+        if ts is not None and ts < time.time() - self.max_age:
+            return
+        self.refresh_index()
+        checks, reason = self.index.match(event)
+        if not checks:
+            return
+        node = event.get('node_name') or ''
+        if node not in self.nodes:
+            # The checks were matched against another node's results; a Job
+            # pinned to this node would re-run them where they do not apply
+            with self.lock:
+                self.stats['skipped_events'] += 1
+                first = node not in self.skipped
+                self.skipped[node] = self.skipped.get(node, 0) + 1
+            if first:
+                covered = ', '.join(sorted(self.nodes)) or 'unknown'
+                print(f"[-] Not re-checking {reason} on {node or 'unknown node'}: "
+                      f"compliance results cover {covered}", flush=True)
+            return
+        with self.lock:
+            self.stats['matched_events'] += 1
+            entry = self.pending.setdefault(node, {'checks': set(), 'reasons': [], 'last_match': 0.0})
+            entry['checks'] |= checks
+            if reason not in entry['reasons'] and len(entry['reasons']) < 20:
+                entry['reasons'].append(reason)
+            entry['last_match'] = time.monotonic()
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='recheck', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        reaped = time.monotonic()
+        while not self._stop.wait(1.0):
+            self.flush()
+            if self.last_launch and time.monotonic() - reaped >= 30:
+                reaped = time.monotonic()
+                self.reap_stuck()
+
+    def flush(self, force=False):
+        """Launch re-checks for nodes whose queue has been quiet for the debounce period."""
+        now = time.monotonic()
+        due = []
+        with self.lock:
+            for node, entry in list(self.pending.items()):
+                quiet = now - entry['last_match'] >= self.debounce
+                cooled = now - self.last_launch.get(node, -self.cooldown) >= self.cooldown
+                if force or (quiet and cooled):
+                    due.append((node, self.pending.pop(node)))
+                    self.last_launch[node] = now
+        if due:
+            self.reap_stuck()
+        for node, entry in due:
+            record = {
+                'node': node,
+                'check_ids': sorted(entry['checks'], key=natural_key),
+                'reasons': entry['reasons'],
+                'launched_at': time.time(),
+            }
+            try:
+                record['job'] = self.launch(node, record['check_ids'])
+                with self.lock:
+                    self.stats['launches'] += 1
+                print(f"[+] Re-checking {', '.join(record['check_ids'])} on {node or 'cluster'}: "
+                      f"{'; '.join(entry['reasons'])}", flush=True)
+            except Exception as e:
+                record['error'] = str(e)
+                with self.lock:
+                    self.stats['failed_launches'] += 1
+                    # e.g. a scan is still running: try again after the cooldown
+                    attempts = entry.get('attempts', 0) + 1
+                    if attempts < RECHECK_MAX_ATTEMPTS:
+                        retry = self.pending.setdefault(node, {'checks': set(), 'reasons': [], 'last_match': 0.0})
+                        retry['checks'] |= entry['checks']
+                        retry['reasons'] = (entry['reasons'] + retry['reasons'])[:20]
+                        retry['attempts'] = attempts
+                print(f"[-] Re-check launch failed on {node or 'cluster'}: {e}", flush=True)
+            self.history.append(record)
+        return due
+
+    def reap_stuck(self):
+        """Delete a re-check Job that has been pending longer than the deadline."""
+        if self.job_state is None or self.cancel is None:
+            return False
+        try:
+            state = self.job_state()
+            if not state or not state['pending'] or (state['age'] or 0) < self.job_deadline:
+                return False
+            self.cancel()
+        except Exception as e:
+            print(f"[-] Could not check the re-check Job: {e}", flush=True)
+            return False
+        with self.lock:
+            self.stats['stuck_jobs'] += 1
+            self.history.append({'error': f"re-check Job pending for {int(state['age'])}s, deleted",
+                                 'launched_at': time.time()})
+        print(f"[-] Deleted re-check Job pending for {int(state['age'])}s", flush=True)
+        return True
+
+    def status(self):
+        with self.lock:
+            return {
+                'enabled': True,
+                'watched_paths': len(self.index.by_path),
+                'watched_binaries': sorted(self.index.by_binary),
+                'nodes': sorted(self.nodes),
+                'skipped_nodes': dict(self.skipped),
+                'pending': {node: {'check_ids': sorted(e['checks'], key=natural_key), 'reasons': e['reasons']}
+                            for node, e in self.pending.items()},
+                'recent': list(self.history)[::-1],
+                'stats': dict(self.stats),
+            }
@@ -0,0 +1,163 @@
+"""
+Pre-aggregated time-bucket rollups of runtime events.
+
+Events are counted into per-minute and per-hour buckets by event type,
+severity and binary as they are ingested, so rate charts over hours or days
+are answered from the rollups and never by rescanning raw events.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+from events import classify_event, severity_of, event_timestamp, event_count
+
+# resolution name -> (bucket width in seconds, buckets kept)
+RESOLUTIONS = {
+    'minute': (60, int(os.environ.get('ROLLUP_MINUTE_BUCKETS', str(24 * 60)))),
+    'hour': (3600, int(os.environ.get('ROLLUP_HOUR_BUCKETS', str(30 * 24)))),
+}
+DIMENSIONS = ('by_type', 'by_severity', 'by_binary')
+# Binaries kept per bucket once it is no longer the newest one
+ROLLUP_TOP_BINARIES = int(os.environ.get('ROLLUP_TOP_BINARIES', '50'))
+
+
+class Bucket:
+    __slots__ = ('start', 'total', 'by_type', 'by_severity', 'by_binary', 'compacted')
+
+    def __init__(self, start):
+        self.start = start
+        self.total = 0
+        self.by_type = Counter()
+        self.by_severity = Counter()
+        self.by_binary = Counter()
+        self.compacted = False
+
+    def compact(self):
+        """Keep only the top binaries; the rest are folded into 'other'."""
+        if len(self.by_binary) > ROLLUP_TOP_BINARIES:
+            top = self.by_binary.most_common(ROLLUP_TOP_BINARIES)
+            other = self.by_binary.get('other', 0) + sum(self.by_binary.values()) - sum(v for _, v in top)
+            self.by_binary = Counter(dict(top))
+            self.by_binary['other'] = other
+        self.compacted = True
+
+    def to_dict(self, dimensions=DIMENSIONS):
+        out = {'start': self.start, 'total': self.total}
+        for dim in dimensions:
+            out[dim] = dict(getattr(self, dim))
+        return out
+
+    @classmethod
+    def from_dict(cls, data):
+        bucket = cls(data['start'])
+        bucket.total = data['total']
+        for dim in DIMENSIONS:
+            setattr(bucket, dim, Counter(data.get(dim, {})))
+        bucket.compacted = True
+        return bucket
+
+
+class RollupSeries:
+    """Fixed-width buckets for one resolution, oldest evicted first."""
+
+    def __init__(self, width, keep):
+        self.width = width
+        self.keep = keep
+        self.buckets = {}
+        self.newest = None
+
+    def add(self, ts, event_type, severity, binary, count=1):
+        start = int(ts // self.width) * self.width
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            if self.newest is not None and start < self.newest - (self.keep - 1) * self.width:
+                # Older than anything we still keep
+                return
+            bucket = self.buckets[start] = Bucket(start)
+            if self.newest is None or start > self.newest:
+                previous = self.buckets.get(self.newest)
+                if previous is not None and not previous.compacted:
+                    previous.compact()
+                self.newest = start
+                self._evict()
+        bucket.total += count
+        bucket.by_type[event_type] += count
+        bucket.by_severity[severity] += count
+        bucket.by_binary[binary] += count
+
+    def _evict(self):
+        oldest_allowed = self.newest - (self.keep - 1) * self.width
+        if len(self.buckets) > self.keep or min(self.buckets) < oldest_allowed:
+            for start in [s for s in self.buckets if s < oldest_allowed]:
+                del self.buckets[start]
+
+    def query(self, since=None, until=None):
+        starts = sorted(self.buckets)
+        if since is not None:
+            since = int(since // self.width) * self.width
+        return [
+            self.buckets[s] for s in starts
+            if (since is None or s >= since) and (until is None or s <= until)
+        ]
+
+
+class Rollups:
+    """Ingest consumer maintaining rollups at every configured resolution."""
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        self.lock = threading.Lock()
+        self.series = {name: RollupSeries(width, keep) for name, (width, keep) in resolutions.items()}
+
+    def __call__(self, alert):
+        ts = event_timestamp(alert)
+        if ts is None:
+            ts = time.time()
+        event_type, binary = classify_event(alert)
+        severity = severity_of(event_type)
+        count = event_count(alert)
+        with self.lock:
+            for series in self.series.values():
+                series.add(ts, event_type, severity, binary, count)
+
+    def snapshot(self):
+        """Plain-dict copy of every series, for sharing with other processes."""
+        with self.lock:
+            return {
+                name: {
+                    'width': series.width,
+                    'keep': series.keep,
+                    'buckets': [series.buckets[s].to_dict() for s in sorted(series.buckets)],
+                }
+                for name, series in self.series.items()
+            }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        rollups = cls({name: (data['width'], data['keep']) for name, data in snapshot.items()})
+        for name, data in snapshot.items():
+            series = rollups.series[name]
+            for item in data['buckets']:
+                series.buckets[item['start']] = Bucket.from_dict(item)
+            series.newest = max(series.buckets) if series.buckets else None
+        return rollups
+
+    def query(self, resolution='minute', since=None, until=None, dimensions=DIMENSIONS, top=None):
+        """
+        Return the buckets of one resolution in [since, until]. With `top`,
+        each dimension is limited to its `top` largest keys.
+        """
+        series = self.series.get(resolution)
+        if series is None:
+            raise ValueError(f"Unknown resolution '{resolution}', expected one of: {', '.join(self.series)}")
+        with self.lock:
+            buckets = [b.to_dict(dimensions) for b in series.query(since, until)]
+        if top:
+            for b in buckets:
+                for dim in dimensions:
+                    b[dim] = dict(Counter(b[dim]).most_common(top))
+        return {
+            'resolution': resolution,
+            'bucket_seconds': series.width,
+            'buckets': buckets,
+        }
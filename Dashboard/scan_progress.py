@@ -0,0 +1,100 @@
+"""
+Live progress of a running compliance scan.
+
+The compliance engine rewrites PROGRESS_PATH (checks done/total, current
+group, elapsed time, ETA) as each check starts and ends, and appends every
+finished result to PARTIAL_RESULTS_PATH. ScanProgress serves both cheaply:
+the record is re-read only when the file's (inode, mtime, size) changes, and
+the partial results are read incrementally from the last offset, so polling
+every second costs a stat call when nothing happened.
+"""
+import json
+import os
+import threading
+import time
+
+PROGRESS_PATH = os.environ.get('SCAN_PROGRESS_PATH', '/output/progress.json')
+PARTIAL_RESULTS_PATH = os.environ.get('SCAN_PARTIAL_RESULTS_PATH', '/output/results.partial.ndjson')
+# A running scan whose record has not changed for this long is reported stalled
+PROGRESS_STALE_SECONDS = float(os.environ.get('SCAN_PROGRESS_STALE_SECONDS', '120'))
+
+
+def file_identity(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class ScanProgress:
+    def __init__(self, progress_path=PROGRESS_PATH, partial_path=PARTIAL_RESULTS_PATH):
+        self.progress_path = progress_path
+        self.partial_path = partial_path
+        self.lock = threading.Lock()
+        self.record = None
+        self.record_identity = None
+        self.results = []
+        # (inode, offset) of the partial results read so far
+        self.partial_inode = None
+        self.partial_offset = 0
+
+    def progress(self):
+        """The latest progress record, or None if no scan has reported yet."""
+        identity = file_identity(self.progress_path)
+        with self.lock:
+            if identity != self.record_identity:
+                self.record_identity = identity
+                try:
+                    with open(self.progress_path, 'r', encoding='utf-8') as f:
+                        self.record = json.load(f)
+                except (OSError, ValueError):
+                    self.record = None
+            if self.record is None:
+                return None
+            record = dict(self.record)
+        record['age_seconds'] = round(max(0.0, time.time() - record.get('updated_at', 0)), 1)
+        if record.get('state') == 'running' and record['age_seconds'] > PROGRESS_STALE_SECONDS:
+            record['state'] = 'stalled'
+        return record
+
+    def partial(self, start=0):
+        """(results[start:], total) of the running scan's finished checks."""
+        with self.lock:
+            self._read_partial()
+            return self.results[start:], len(self.results)
+
+    def _read_partial(self):
+        try:
+            st = os.stat(self.partial_path)
+        except OSError:
+            self.results, self.partial_inode, self.partial_offset = [], None, 0
+            return
+        if st.st_ino != self.partial_inode or st.st_size < self.partial_offset:
+            # A new scan truncated or replaced the file
+            self.results, self.partial_inode, self.partial_offset = [], st.st_ino, 0
+        if st.st_size == self.partial_offset:
+            return
+        with open(self.partial_path, 'rb') as f:
+            f.seek(self.partial_offset)
+            data = f.read(st.st_size - self.partial_offset)
+        end = data.rfind(b'\n')
+        if end < 0:
+            return
+        for line in data[:end].split(b'\n'):
+            try:
+                self.results.append(json.loads(line))
+            except ValueError:
+                continue
+        self.partial_offset += end + 1
+
+    def clear(self):
+        """Forget the last scan's progress, before a new one starts."""
+        for path in (self.progress_path, self.partial_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        with self.lock:
+            self.record, self.record_identity = None, None
+            self.results, self.partial_inode, self.partial_offset = [], None, 0
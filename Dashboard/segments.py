@@ -0,0 +1,285 @@
+"""
+Segmented storage for the runtime event log.
+
+The collector appends events to a directory of NDJSON segments instead of a
+single unbounded file:
+
+    runtime_log/
+        index.json                 per-segment min/max time, event count, size
+        seg-00000001.ndjson.gz     sealed + compressed
+        seg-00000002.ndjson.gz
+        seg-00000003.ndjson        active segment
+
+A segment is sealed when it reaches SEGMENT_MAX_BYTES or when events cross
+into a new roll window (hourly by default). Sealed segments are gzipped and
+old ones are dropped by age or total size. Readers use the index to open only
+the segments that overlap a requested time range.
+"""
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+
+INDEX_NAME = 'index.json'
+SEGMENT_PREFIX = 'seg-'
+ACTIVE_SUFFIX = '.ndjson'
+SEALED_SUFFIX = '.ndjson.gz'
+
+SEGMENT_MAX_BYTES = int(os.environ.get('SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+# Seconds per time-based segment (0 = size-based only)
+SEGMENT_ROLL_SECONDS = int(os.environ.get('SEGMENT_ROLL_SECONDS', '3600'))
+SEGMENT_COMPRESS = os.environ.get('SEGMENT_COMPRESS', '1') not in ('0', 'false', 'no')
+# Retention (0 = unlimited)
+RETENTION_SECONDS = int(os.environ.get('RETENTION_SECONDS', str(7 * 24 * 3600)))
+RETENTION_BYTES = int(os.environ.get('RETENTION_BYTES', str(2 * 1024 * 1024 * 1024)))
+
+
+def segment_path(directory, entry):
+    suffix = SEALED_SUFFIX if entry.get('compressed') else ACTIVE_SUFFIX
+    return os.path.join(directory, entry['name'] + suffix)
+
+
+def load_index(directory):
+    """Read the segment index. Returns a list of entries ordered oldest first."""
+    try:
+        with open(os.path.join(directory, INDEX_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f).get('segments', [])
+    except (OSError, ValueError):
+        return []
+
+
+def write_index(directory, segments):
+    path = os.path.join(directory, INDEX_NAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'segments': segments, 'updated': time.time()}, f)
+    os.replace(tmp, path)
+
+
+def is_segment_dir(directory):
+    return os.path.isfile(os.path.join(directory, INDEX_NAME))
+
+
+class SegmentWriter:
+    """
+    Buffers event lines and appends them to the active segment in batches.
+    Has the same interface as collector.BatchWriter.
+    """
+
+    def __init__(self, directory, batch_size=500, flush_interval=1.0, truncate=False,
+                 max_bytes=SEGMENT_MAX_BYTES, roll_seconds=SEGMENT_ROLL_SECONDS,
+                 compress=SEGMENT_COMPRESS, retention_seconds=RETENTION_SECONDS,
+                 retention_bytes=RETENTION_BYTES):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.roll_seconds = roll_seconds
+        self.compress = compress
+        self.retention_seconds = retention_seconds
+        self.retention_bytes = retention_bytes
+        self.lock = threading.Lock()
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.batches = 0
+        self.bytes_written = 0
+
+        os.makedirs(directory, exist_ok=True)
+        if truncate:
+            for entry in load_index(directory):
+                _remove(segment_path(directory, entry))
+            self.segments = []
+        else:
+            self.segments = load_index(directory)
+
+        # Resume the last segment if the previous run left it open
+        self.active = None
+        self.f = None
+        if self.segments and not self.segments[-1].get('sealed'):
+            self.active = self.segments[-1]
+            self.f = open(segment_path(directory, self.active), 'a', encoding='utf-8')
+        write_index(directory, self.segments)
+
+    def write(self, text, ts=None):
+        with self.lock:
+            self.pending.append((text, ts))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def flush_if_due(self):
+        with self.lock:
+            if self.pending and time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.f is not None:
+                self.f.close()
+                self.f = None
+
+    def _flush(self):
+        if self.pending:
+            now = time.time()
+            chunk = []
+            for text, ts in self.pending:
+                ts = ts if ts is not None else now
+                if self.active is None or self._should_roll(ts):
+                    self._write_chunk(chunk)
+                    chunk = []
+                    self._roll(ts)
+                chunk.append(text)
+                active = self.active
+                active['count'] += 1
+                active['bytes'] += len(text) + 1
+                if active['min_ts'] is None or ts < active['min_ts']:
+                    active['min_ts'] = ts
+                if active['max_ts'] is None or ts > active['max_ts']:
+                    active['max_ts'] = ts
+            self._write_chunk(chunk)
+            self.pending = []
+            self.batches += 1
+            write_index(self.directory, self.segments)
+        self.last_flush = time.monotonic()
+
+    def _write_chunk(self, lines):
+        if lines:
+            data = '\n'.join(lines) + '\n'
+            self.f.write(data)
+            self.f.flush()
+            self.bytes_written += len(data)
+
+    def _should_roll(self, ts):
+        active = self.active
+        if active['bytes'] >= self.max_bytes:
+            return True
+        if self.roll_seconds and active.get('window') is not None:
+            # Only move forward; late events from an older window stay put
+            return int(ts // self.roll_seconds) > active['window']
+        return False
+
+    def _roll(self, ts):
+        if self.active is not None:
+            self._seal(self.active)
+        seq = int(self.segments[-1]['name'][len(SEGMENT_PREFIX):]) + 1 if self.segments else 1
+        self.active = {
+            'name': f"{SEGMENT_PREFIX}{seq:08d}",
+            'window': int(ts // self.roll_seconds) if self.roll_seconds else None,
+            'min_ts': None,
+            'max_ts': None,
+            'count': 0,
+            'bytes': 0,
+            'sealed': False,
+            'compressed': False,
+        }
+        self.segments.append(self.active)
+        self.f = open(segment_path(self.directory, self.active), 'w', encoding='utf-8')
+        self._apply_retention()
+
+    def _seal(self, entry):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        if self.compress:
+            src = segment_path(self.directory, entry)
+            dst = os.path.join(self.directory, entry['name'] + SEALED_SUFFIX)
+            tmp = f"{dst}.tmp"
+            with open(src, 'rb') as fin, gzip.open(tmp, 'wb', compresslevel=1) as fout:
+                shutil.copyfileobj(fin, fout, 1 << 20)
+            os.replace(tmp, dst)
+            entry['compressed'] = True
+            entry['bytes'] = os.path.getsize(dst)
+            # Publish the compressed name before the plain file goes away
+            entry['sealed'] = True
+            write_index(self.directory, self.segments)
+            _remove(src)
+        entry['sealed'] = True
+
+    def _apply_retention(self):
+        now = time.time()
+        sealed = [s for s in self.segments if s.get('sealed')]
+        total = sum(s['bytes'] for s in self.segments)
+        drop = set()
+        for entry in sealed:
+            too_old = (self.retention_seconds and entry['max_ts'] is not None
+                       and entry['max_ts'] < now - self.retention_seconds)
+            too_big = self.retention_bytes and total > self.retention_bytes
+            if not (too_old or too_big):
+                break
+            drop.add(entry['name'])
+            total -= entry['bytes']
+        if drop:
+            self.segments = [s for s in self.segments if s['name'] not in drop]
+            write_index(self.directory, self.segments)
+            for name in drop:
+                _remove(os.path.join(self.directory, name + SEALED_SUFFIX))
+                _remove(os.path.join(self.directory, name + ACTIVE_SUFFIX))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def select_segments(segments, since=None, until=None):
+    """Return the index entries whose time range overlaps [since, until]."""
+    out = []
+    for entry in segments:
+        lo, hi = entry.get('min_ts'), entry.get('max_ts')
+        if not entry.get('sealed'):
+            # The index for the active segment may trail the file by a flush
+            hi = None
+        if since is not None and hi is not None and hi < since:
+            continue
+        if until is not None and lo is not None and lo > until:
+            continue
+        out.append(entry)
+    return out
+
+
+def open_segment(directory, entry):
+    """
+    Open one segment for binary reading, transparently following it if it was
+    sealed and compressed after the index was read. Returns None if the
+    segment has been dropped by retention.
+    """
+    path = segment_path(directory, entry)
+    if not os.path.exists(path) and not entry.get('compressed'):
+        path = os.path.join(directory, entry['name'] + SEALED_SUFFIX)
+    try:
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def read_segment(directory, entry):
+    """Yield the lines of one segment (nothing if it was dropped by retention)."""
+    f = open_segment(directory, entry)
+    if f is None:
+        return
+    with f:
+        for line in f:
+            yield line.decode('utf-8', 'replace')
+
+
+def usage(directory):
+    """Summary of the segment directory for the API."""
+    segments = load_index(directory)
+    return {
+        'segments': len(segments),
+        'sealed': sum(1 for s in segments if s.get('sealed')),
+        'bytes': sum(s['bytes'] for s in segments),
+        'events': sum(s['count'] for s in segments),
+        'oldest': segments[0]['min_ts'] if segments else None,
+        'newest': segments[-1]['max_ts'] if segments else None,
+    }
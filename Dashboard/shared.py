@@ -0,0 +1,230 @@
+"""
+State shared between dashboard worker processes.
+
+Under a multi-worker server each worker is a separate process. Instead of
+every worker tailing the runtime log, one worker (the one holding an flock
+on SHARED_STATE_DIR/leader.lock) runs the ingester and periodically
+publishes snapshots of its in-memory views to SHARED_STATE_DIR (tmpfs by
+default). The other workers read those snapshots, re-loading one only when
+its file changes. If the leader exits, its lock is released and another
+worker takes over.
+
+Derived artifacts such as encoded response bodies can also be shared as
+blobs, so only one worker pays for building them.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+
+SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR', '')
+SHARED_PUBLISH_INTERVAL = float(os.environ.get('SHARED_PUBLISH_INTERVAL', '1.0'))
+
+
+def _atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SharedState:
+    def __init__(self, directory, publish_interval=SHARED_PUBLISH_INTERVAL):
+        self.directory = directory
+        self.publish_interval = publish_interval
+        self.views = {}
+        self.local_views = {}
+        self._published = {}
+        self.is_leader = False
+        self.lock = threading.Lock()
+        self._cache = {}
+        self._lock_file = None
+        self._thread = None
+        self.on_leader = None
+        os.makedirs(directory, exist_ok=True)
+
+    def register(self, name, producer, version=None, interval=None):
+        """
+        Publish producer() as view `name` while this process is the leader.
+        With `version`, the view is only re-published when version() changes;
+        with `interval`, at most once per `interval` seconds.
+        """
+        self.views[name] = (producer, version, interval)
+
+    def register_local(self, name, producer):
+        """Publish producer() from every process, as `name`-<pid>."""
+        self.local_views[name] = producer
+
+    def start(self, on_leader):
+        """Start competing for leadership; `on_leader` runs once when elected."""
+        with self.lock:
+            if self._thread is not None:
+                return
+            self.on_leader = on_leader
+            self._thread = threading.Thread(target=self._run, name='shared-state', daemon=True)
+            self._thread.start()
+
+    def _try_lead(self):
+        f = open(os.path.join(self.directory, 'leader.lock'), 'a+')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        # Keep the file open: the lock is held for the life of the process
+        self._lock_file = f
+        return True
+
+    def _run(self):
+        while True:
+            if not self.is_leader and self._try_lead():
+                self.is_leader = True
+                self.on_leader()
+            if self.is_leader:
+                self.publish_all()
+            self.publish_local()
+            time.sleep(self.publish_interval)
+
+    def publish_local(self):
+        """Publish this process's register_local() views (also called once more on exit)."""
+        for name, producer in self.local_views.items():
+            try:
+                self.publish(f"{name}-{os.getpid()}", producer())
+            except Exception as e:
+                print(f"[-] Could not publish shared view {name}: {e}", flush=True)
+
+    def publish_all(self):
+        now = time.monotonic()
+        for name, (producer, version, interval) in self.views.items():
+            current = version() if version is not None else None
+            last_version, last_time = self._published.get(name, (None, None))
+            if current is not None and last_version == current:
+                continue
+            if interval and last_time is not None and now - last_time < interval:
+                continue
+            try:
+                self.publish(name, producer())
+                self._published[name] = (current, now)
+            except Exception as e:
+                print(f"[-] Could not publish shared view {name}: {e}", flush=True)
+
+    def publish(self, name, obj):
+        _atomic_write(os.path.join(self.directory, f"{name}.json"), json.dumps(obj).encode('utf-8'))
+
+    def read(self, name, loader=None):
+        """
+        Return the latest published view, passed through `loader` if given.
+        The parsed (and loaded) value is cached until the file changes.
+        Returns None if nothing was published yet.
+        """
+        path = os.path.join(self.directory, f"{name}.json")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+        try:
+            with open(path, 'rb') as f:
+                value = json.loads(f.read())
+        except (OSError, ValueError):
+            return cached[1] if cached else None
+        if loader is not None:
+            value = loader(value)
+        self._cache[name] = (identity, value)
+        return value
+
+    def read_all(self, name, fold_exited=None):
+        """
+        Views published with register_local() by other live processes. With
+        `fold_exited(total, view)`, the last view of each exited process is
+        folded into the view `name`-exited instead of being dropped, and that
+        view is returned too (e.g. so counters never go backwards).
+        """
+        values = []
+        prefix = f"{name}-"
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith(prefix) and filename.endswith('.json')):
+                continue
+            try:
+                pid = int(filename[len(prefix):-5])
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                # Left behind by an exited worker
+                if fold_exited is not None:
+                    self._fold_exited(name, filename, fold_exited)
+                else:
+                    try:
+                        os.remove(os.path.join(self.directory, filename))
+                    except OSError:
+                        pass
+                continue
+            except PermissionError:
+                pass
+            value = self.read(filename[:-5])
+            if value is not None:
+                values.append(value)
+        if fold_exited is not None:
+            exited = self.read(f"{name}-exited")
+            if exited is not None:
+                values.append(exited)
+        return values
+
+    def _fold_exited(self, name, filename, fold):
+        path = os.path.join(self.directory, filename)
+        exited_path = os.path.join(self.directory, f"{name}-exited.json")
+        # Under a lock, so each exited view is folded exactly once
+        with open(os.path.join(self.directory, f"{name}-exited.lock"), 'a+') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    view = json.load(f)
+            except (OSError, ValueError):
+                # Folded by another process meanwhile
+                return
+            try:
+                with open(exited_path, 'r', encoding='utf-8') as f:
+                    total = json.load(f)
+            except (OSError, ValueError):
+                total = None
+            _atomic_write(exited_path, json.dumps(fold(total, view)).encode('utf-8'))
+            os.remove(path)
+
+    def get_blob(self, key):
+        try:
+            with open(os.path.join(self.directory, f"blob-{key}"), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put_blob(self, key, data, prefix=None):
+        """Store a blob; older blobs sharing `prefix` are removed."""
+        name = f"blob-{key}"
+        if prefix:
+            for other in os.listdir(self.directory):
+                if other.startswith(f"blob-{prefix}") and other != name and not other.endswith('.tmp'):
+                    try:
+                        os.remove(os.path.join(self.directory, other))
+                    except OSError:
+                        pass
+        _atomic_write(os.path.join(self.directory, name), data)
+
+    def status(self):
+        return {
+            'pid': os.getpid(),
+            'leader': self.is_leader,
+            'directory': self.directory,
+            'views': sorted(self.views),
+        }
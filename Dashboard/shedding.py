@@ -0,0 +1,178 @@
+"""
+Load shedding for runtime ingest.
+
+Decoding a Tetragon event (json.loads of a few KB) costs several times more
+than all ingest consumers together, so when the dashboard falls behind the
+log it stops decoding every line. Each line is first skimmed with plain
+substring searches for the fields the counters need (kind, call, binary, pod, node,
+policy, time, burst count). Then:
+  - counting consumers (rollups, top-K, rate anomalies) get the skimmed
+    skeleton of every event, so their counts stay exact;
+  - low-severity events are decoded only for a sample, then medium and high
+    if that is not enough; critical events and SHED_NEVER calls always are.
+
+The sample rate per severity adapts once per SHED_ADJUST_INTERVAL: halved
+while the backlog keeps growing, doubled again once ingest keeps up.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from events import call_key, classify_event, severity_of
+
+SHED_ENABLED = os.environ.get('SHED_ENABLED', '1') == '1'
+# Unread log bytes that count as overload
+SHED_BACKLOG_BYTES = int(os.environ.get('SHED_BACKLOG_BYTES', str(32 * 1024 * 1024)))
+# Seconds behind the newest event that count as overload (once caught up)
+SHED_LAG_SECONDS = float(os.environ.get('SHED_LAG_SECONDS', '30'))
+SHED_MIN_RATE = float(os.environ.get('SHED_MIN_RATE', '0.01'))
+SHED_ADJUST_INTERVAL = float(os.environ.get('SHED_ADJUST_INTERVAL', '1.0'))
+# Event kinds and calls that are always decoded (critical severity always is).
+# Calls match by bare syscall name, so setns covers __x64_sys_setns and
+# sys_enter_setns alike
+SHED_NEVER = set(os.environ.get(
+    'SHED_NEVER', 'process_exec,process_exit,setns,unshare,kill,tkill,tgkill').split(','))
+
+# Shed first to last; critical is never shed
+SHEDDABLE = ('low', 'medium', 'high')
+
+KIND_RE = re.compile(rb'^\s*\{"(process_\w+)":')
+COUNT_RE = re.compile(rb'"coalesced":\{"count":(\d+)')
+
+
+def _field(line, key, last=False):
+    """The string value of the first (or last) `"key":"..."` in the line, or None."""
+    needle = b'"' + key + b'":"'
+    i = line.rfind(needle) if last else line.find(needle)
+    if i < 0:
+        return None
+    i += len(needle)
+    return line[i:line.find(b'"', i)].decode('utf-8', 'replace')
+
+
+def skim(line):
+    """
+    A skeleton alert with the fields counters and filters read, taken from
+    the raw line without decoding it. None if the line does not look like
+    a Tetragon event.
+    """
+    m = KIND_RE.match(line)
+    if m is None:
+        return None
+    kind = m.group(1).decode()
+    # The process comes first in the body, the parent after it
+    process = {'binary': _field(line, b'binary') or ''}
+    i = line.find(b'"pod":{')
+    if i >= 0:
+        pod = line[i:i + 512]
+        process['pod'] = {'namespace': _field(pod, b'namespace') or '', 'name': _field(pod, b'name') or ''}
+    body = {'process': process}
+    if kind == 'process_tracepoint':
+        body['subsys'] = _field(line, b'subsys', last=True) or ''
+        body['event'] = _field(line, b'event', last=True) or ''
+    elif kind == 'process_kprobe':
+        body['function_name'] = _field(line, b'function_name', last=True) or ''
+    policy = _field(line, b'policy_name', last=True)
+    if policy is not None:
+        body['policy_name'] = policy
+    alert = {kind: body, 'node_name': _field(line, b'node_name', last=True) or ''}
+    # The event time is the last top-level key
+    ts = _field(line, b'time', last=True)
+    if ts is not None:
+        alert['time'] = ts
+    if b'"coalesced"' in line:
+        count = COUNT_RE.search(line)
+        if count:
+            alert['coalesced'] = {'count': int(count.group(1))}
+    return alert
+
+
+class LoadShedder:
+    def __init__(self, backlog_bytes=SHED_BACKLOG_BYTES, lag_seconds=SHED_LAG_SECONDS,
+                 min_rate=SHED_MIN_RATE, adjust_interval=SHED_ADJUST_INTERVAL, never=SHED_NEVER):
+        self.backlog_limit = backlog_bytes
+        self.lag_limit = lag_seconds
+        self.min_rate = min_rate
+        self.adjust_interval = adjust_interval
+        self.never = {call_key(c) for c in never}
+        self.lock = threading.Lock()
+        self.rates = {severity: 1.0 for severity in SHEDDABLE}
+        # Per-call sampling credit, so every call keeps its share of the sample
+        self.credit = {}
+        self.seen = Counter()
+        self.shed = Counter()
+        self.shed_calls = Counter()
+        self.last_adjust = 0.0
+        self.last_backlog = None
+        self.since = None
+        self.stats = {'adjustments': 0, 'degraded_seconds': 0.0}
+
+    @property
+    def degraded(self):
+        return any(rate < 1.0 for rate in self.rates.values())
+
+    def protect(self, calls):
+        """Never shed these event kinds or calls (e.g. the ones re-checks act on)."""
+        self.never |= {call_key(c) for c in calls}
+
+    def update(self, backlog, lag, caught_up):
+        """Adapt the sample rates to the current backlog (bytes) and lag (seconds)."""
+        now = time.monotonic()
+        if now - self.last_adjust < self.adjust_interval:
+            return
+        with self.lock:
+            if self.since is not None:
+                self.stats['degraded_seconds'] += now - max(self.since, self.last_adjust)
+            overloaded = backlog > self.backlog_limit or (caught_up and lag is not None and lag > self.lag_limit)
+            growing = self.last_backlog is None or backlog >= self.last_backlog
+            if overloaded and growing:
+                # Shed the lowest severity that is still above the floor
+                for severity in SHEDDABLE:
+                    if self.rates[severity] > self.min_rate:
+                        self.rates[severity] = max(self.min_rate, self.rates[severity] / 2)
+                        self.stats['adjustments'] += 1
+                        break
+            elif not overloaded:
+                for severity in reversed(SHEDDABLE):
+                    if self.rates[severity] < 1.0:
+                        self.rates[severity] = min(1.0, self.rates[severity] * 2)
+                        self.stats['adjustments'] += 1
+                        break
+            self.since = now if self.degraded else None
+            self.last_backlog = backlog
+            self.last_adjust = now
+
+    def admit(self, skeleton):
+        """True if the event should be decoded in full; counts it either way."""
+        kind = next(iter(skeleton))
+        call, _ = classify_event(skeleton)
+        severity = severity_of(call)
+        with self.lock:
+            self.seen[severity] += 1
+            rate = self.rates.get(severity, 1.0)
+            if rate >= 1.0 or kind in self.never or call_key(call) in self.never:
+                return True
+            credit = self.credit.get(call, 1.0) + rate
+            if credit >= 1.0:
+                self.credit[call] = credit - 1.0
+                return True
+            self.credit[call] = credit
+            self.shed[severity] += 1
+            self.shed_calls[call] += 1
+            return False
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'degraded': self.degraded,
+                'sample_rates': dict(self.rates),
+                'seen_while_degraded': dict(self.seen),
+                'shed': dict(self.shed),
+                'shed_total': sum(self.shed.values()),
+                'shed_by_call': dict(self.shed_calls.most_common(20)),
+                'protected': sorted(self.never),
+                'adjustments': self.stats['adjustments'],
+                'degraded_seconds': round(self.stats['degraded_seconds'], 1),
+            }
@@ -0,0 +1,265 @@
+"""
+Bounded-memory heavy-hitter tracking for runtime statistics.
+
+Each tracker counts keys (binary paths, pods, calls) and reports the top-K
+with error bounds:
+
+  - exact:        collections.Counter, memory grows with key cardinality
+  - spacesaving:  Space-Saving (Metwally et al.), `capacity` counters;
+                  every reported count overestimates by at most N/capacity
+  - countmin:     Count-Min sketch of width x depth plus `capacity` candidates;
+                  overestimates by at most (e/width)*N with prob 1 - e^-depth
+
+The mode is chosen per dimension with TOPK_MODE_<DIMENSION>, falling back to
+TOPK_MODE (default 'exact').
+"""
+import heapq
+import math
+import os
+import random
+import threading
+from collections import Counter
+
+from events import classify_event, severity_of, event_count
+
+TOPK_MODE = os.environ.get('TOPK_MODE', 'exact')
+TOPK_CAPACITY = int(os.environ.get('TOPK_CAPACITY', '1000'))
+CMS_WIDTH = int(os.environ.get('CMS_WIDTH', '2048'))
+CMS_DEPTH = int(os.environ.get('CMS_DEPTH', '4'))
+
+DIMENSIONS = ('binary', 'pod', 'call')
+
+_MASK64 = (1 << 64) - 1
+
+
+class ExactCounter:
+    """Exact counts; the reference the sketches are compared against."""
+    mode = 'exact'
+
+    def __init__(self):
+        self.counts = Counter()
+        self.n = 0
+
+    def add(self, key, count=1):
+        self.counts[key] += count
+        self.n += count
+
+    def top(self, k):
+        return self.counts.most_common(k)
+
+    def error_bounds(self):
+        return {'algorithm': self.mode, 'n': self.n, 'keys': len(self.counts), 'max_overestimate': 0}
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K with a stream-summary layout: keys are grouped into
+    buckets by count so increments and evictions are O(1).
+    """
+    mode = 'spacesaving'
+
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}     # key -> count
+        self.errors = {}     # key -> overestimation at insert time
+        self.buckets = {}    # count -> {key: None} (insertion ordered set)
+        self.min_count = 0
+        self.n = 0
+
+    def _move(self, key, old, new):
+        if old:
+            bucket = self.buckets[old]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[old]
+        self.buckets.setdefault(new, {})[key] = None
+        self.counts[key] = new
+
+    def _fix_min(self, old, new):
+        if old == self.min_count and old not in self.buckets:
+            # With unit increments the key just moved to the next smallest count
+            self.min_count = new if new == old + 1 else min(self.buckets)
+
+    def add(self, key, count=1):
+        self.n += count
+        old = self.counts.get(key)
+        if old is not None:
+            self._move(key, old, old + count)
+            self._fix_min(old, old + count)
+            return
+        if len(self.counts) < self.capacity:
+            self.errors[key] = 0
+            self._move(key, 0, count)
+            if len(self.counts) == 1 or count < self.min_count:
+                self.min_count = count
+            return
+        # Replace a key with the minimum count; it inherits that count as error
+        floor = self.min_count
+        bucket = self.buckets[floor]
+        victim = next(iter(bucket))
+        del bucket[victim]
+        if not bucket:
+            del self.buckets[floor]
+        del self.counts[victim]
+        del self.errors[victim]
+        self.errors[key] = floor
+        self._move(key, 0, floor + count)
+        self._fix_min(floor, floor + count)
+
+    def top(self, k):
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def guaranteed(self, key):
+        """Lower bound on the true count of a tracked key."""
+        return self.counts.get(key, 0) - self.errors.get(key, 0)
+
+    def error_bounds(self):
+        full = len(self.counts) >= self.capacity
+        return {
+            'algorithm': self.mode,
+            'n': self.n,
+            'capacity': self.capacity,
+            'keys': len(self.counts),
+            # Any reported count is at most this much above the true count
+            'max_overestimate': self.min_count if full else 0,
+            'bound': math.ceil(self.n / self.capacity) if full else 0,
+        }
+
+
+class CountMinTopK:
+    """Count-Min sketch for frequency estimates plus a bounded candidate set."""
+    mode = 'countmin'
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, capacity=TOPK_CAPACITY):
+        # Width is rounded up to a power of two for multiply-shift hashing
+        bits = max(1, (width - 1).bit_length())
+        self.width = 1 << bits
+        self.shift = 64 - bits
+        self.depth = depth
+        self.capacity = capacity
+        rng = random.Random(0x5eed)
+        # One odd multiplier per row gives independent row hashes
+        self.multipliers = [rng.getrandbits(64) | 1 for _ in range(depth)]
+        self.rows = [[0] * self.width for _ in range(depth)]
+        self.candidates = {}
+        # Min-heap of (estimate, key); entries go stale as candidates grow
+        self.heap = []
+        self.n = 0
+
+    def _indexes(self, key):
+        h = hash(key) & _MASK64
+        shift = self.shift
+        return [((h * a) & _MASK64) >> shift for a in self.multipliers]
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def add(self, key, count=1):
+        self.n += count
+        est = None
+        for row, i in zip(self.rows, self._indexes(key)):
+            v = row[i] = row[i] + count
+            if est is None or v < est:
+                est = v
+        candidates = self.candidates
+        if key in candidates:
+            candidates[key] = est
+            return
+        heap = self.heap
+        if len(candidates) < self.capacity:
+            candidates[key] = est
+            heapq.heappush(heap, (est, key))
+            return
+        # Refresh stale heap entries until the top is the true minimum
+        while True:
+            low, low_key = heap[0]
+            current = candidates[low_key]
+            if current == low:
+                break
+            heapq.heapreplace(heap, (current, low_key))
+        if est > low:
+            heapq.heapreplace(heap, (est, key))
+            del candidates[low_key]
+            candidates[key] = est
+
+    def top(self, k):
+        return sorted(self.candidates.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def error_bounds(self):
+        epsilon = math.e / self.width
+        return {
+            'algorithm': self.mode,
+            'n': self.n,
+            'width': self.width,
+            'depth': self.depth,
+            'capacity': self.capacity,
+            'keys': len(self.candidates),
+            'epsilon': round(epsilon, 6),
+            'delta': round(math.exp(-self.depth), 6),
+            # With probability 1 - delta, estimates exceed the true count by at most this
+            'max_overestimate': math.ceil(epsilon * self.n),
+        }
+
+
+TRACKERS = {
+    'exact': ExactCounter,
+    'spacesaving': SpaceSaving,
+    'countmin': CountMinTopK,
+}
+
+
+def dimension_mode(dimension):
+    return os.environ.get(f'TOPK_MODE_{dimension.upper()}', TOPK_MODE)
+
+
+def make_tracker(mode):
+    try:
+        return TRACKERS[mode]()
+    except KeyError:
+        raise ValueError(f"Unknown top-K mode '{mode}', expected one of: {', '.join(TRACKERS)}")
+
+
+def pod_key(alert):
+    for key in ('process_tracepoint', 'process_kprobe', 'process_exec', 'process_exit'):
+        if key in alert:
+            pod = alert[key].get('process', {}).get('pod') or {}
+            if pod:
+                return f"{pod.get('namespace', '')}/{pod.get('name', '')}"
+            return 'host'
+    return 'unknown'
+
+
+class HeavyHitters:
+    """
+    Runtime statistics with bounded memory: exact totals and severity counts,
+    top-K per dimension from the configured trackers. Usable as an ingest
+    consumer or fed directly while scanning a time range.
+    """
+
+    def __init__(self, modes=None):
+        modes = modes or {d: dimension_mode(d) for d in DIMENSIONS}
+        self.lock = threading.Lock()
+        self.total = 0
+        self.by_severity = Counter()
+        self.trackers = {d: make_tracker(modes[d]) for d in DIMENSIONS}
+
+    def __call__(self, alert):
+        event_type, binary = classify_event(alert)
+        count = event_count(alert)
+        with self.lock:
+            self.total += count
+            self.by_severity[severity_of(event_type)] += count
+            self.trackers['call'].add(event_type, count)
+            self.trackers['binary'].add(binary, count)
+            self.trackers['pod'].add(pod_key(alert), count)
+
+    def stats(self, k=10):
+        with self.lock:
+            return {
+                'total': self.total,
+                'by_type': dict(self.trackers['call'].top(k)),
+                'by_process': dict(self.trackers['binary'].top(k)),
+                'by_pod': dict(self.trackers['pod'].top(k)),
+                'by_severity': dict(self.by_severity),
+                'error_bounds': {d: t.error_bounds() for d, t in self.trackers.items()},
+            }
@@ -64,84 +64,144 @@ function renderPerFile(perFile) {
   });
 }
 
-function renderTopFailed(list) {
+// Failed checks: a virtual list (only visible rows in the DOM), paged from
+// /api/checks as it is scrolled; details open in a pane below it
+let failedList = null;
+let failedCursor = null;
+let failedLoading = false;
+const FAILED_ROW_HEIGHT = 64;
+
+function renderFailedRow(item) {
+  const row = document.createElement('div');
+  row.style.padding = '4px 0';
+  row.style.cursor = 'pointer';
+  const card = document.createElement('div');
+  card.style.cssText = 'background:#fff;padding:8px 10px;border-radius:6px;box-shadow:0 1px 2px rgba(0,0,0,0.04);height:100%;box-sizing:border-box;overflow:hidden;';
+  const title = document.createElement('div');
+  title.style.cssText = 'font-weight:600;white-space:nowrap;overflow:hidden;text-overflow:ellipsis;';
+  title.textContent = (item.check_id && `${item.check_id} — ${item._source_file || ''}`) || (item.description || 'Unnamed check');
+  card.appendChild(title);
+  const reason = document.createElement('div');
+  reason.style.cssText = 'color:#444;font-size:13px;white-space:nowrap;overflow:hidden;text-overflow:ellipsis;';
+  reason.textContent = (item.reason && (typeof item.reason === 'string' ? item.reason : JSON.stringify(item.reason).slice(0,200))) || (item.description && item.description.slice(0,200)) || '';
+  card.appendChild(reason);
+  row.appendChild(card);
+  row.addEventListener('click', () => showFailedDetails(item));
+  return row;
+}
+
+function showFailedDetails(item) {
+  const details = document.getElementById('failed-details');
+  if (!details) return;
+  details.style.display = 'block';
+  details.innerHTML = '';
+  const title = document.createElement('div');
+  title.style.fontWeight = '600';
+  title.textContent = item.description ? `${item.check_id} — ${item.description}` : safeText(item.check_id);
+  details.appendChild(title);
+  const rem = document.createElement('div');
+  rem.innerHTML = '<strong>Remediation:</strong> ';
+  rem.appendChild(document.createTextNode(item.remediation ? safeText(item.remediation) : 'n/a'));
+  details.appendChild(rem);
+  const src = document.createElement('div');
+  src.innerHTML = '<strong>Source:</strong> ';
+  src.appendChild(document.createTextNode(safeText(item._source_file || 'unknown')));
+  details.appendChild(src);
+  if (Array.isArray(item.line_results) && item.line_results.length) {
+    const lr = document.createElement('pre');
+    lr.style.background = '#f5f7fa';
+    lr.style.padding = '8px';
+    lr.style.borderRadius = '6px';
+    lr.style.marginTop = '8px';
+    lr.style.maxHeight = '160px';
+    lr.style.overflow = 'auto';
+    lr.textContent = item.line_results.map(r => typeof r === 'string' ? r : JSON.stringify(r)).join('\n');
+    details.appendChild(lr);
+  }
+}
+
+function renderTopFailed(list, append) {
   const host = document.getElementById('top-failed');
   if (!host) return;
-  host.innerHTML = '';
-  if (!Array.isArray(list) || list.length === 0) {
-    host.innerHTML = '<div style="padding:8px;color:#666">No failures found</div>';
-    return;
-  }
-  list.forEach(item => {
-    const card = document.createElement('div');
-    card.style.background = '#fff';
-    card.style.padding = '10px';
-    card.style.borderRadius = '6px';
-    card.style.boxShadow = '0 1px 2px rgba(0,0,0,0.04)';
-    card.style.display = 'flex';
-    card.style.flexDirection = 'column';
-    const title = document.createElement('div');
-    title.style.fontWeight = '600';
-    title.style.marginBottom = '6px';
-    title.textContent = (item.check_id && `${item.check_id} — ${item._source_file || ''}`) || (item.description || 'Unnamed check');
-    card.appendChild(title);
-    const reason = document.createElement('div');
-    reason.style.color = '#444';
-    reason.style.fontSize = '13px';
-    reason.style.marginBottom = '6px';
-    reason.textContent = (item.reason && (typeof item.reason === 'string' ? item.reason : JSON.stringify(item.reason).slice(0,200))) || (item.description && item.description.slice(0,200)) || '';
-    card.appendChild(reason);
-    const actions = document.createElement('div');
-    actions.style.display = 'flex';
-    actions.style.gap = '8px';
-    actions.style.alignItems = 'center';
-    const expandBtn = document.createElement('button');
-    expandBtn.textContent = 'Details';
-    expandBtn.style.cursor = 'pointer';
-    expandBtn.style.padding = '6px 8px';
-    expandBtn.style.border = '1px solid #e5e7eb';
-    expandBtn.style.borderRadius = '6px';
-    expandBtn.style.background = '#fff';
-    actions.appendChild(expandBtn);
-    card.appendChild(actions);
-    const details = document.createElement('div');
-    details.style.display = 'none';
-    details.style.marginTop = '8px';
-    details.style.fontSize = '13px';
-    details.style.color = '#333';
-    const rem = document.createElement('div');
-    rem.innerHTML = `<strong>Remediation:</strong> ${item.remediation ? safeText(item.remediation) : '<em>n/a</em>'}`;
-    details.appendChild(rem);
-    const src = document.createElement('div');
-    src.innerHTML = `<strong>Source:</strong> ${safeText(item._source_file || 'unknown')}`;
-    details.appendChild(src);
-    if (Array.isArray(item.line_results) && item.line_results.length) {
-      const lr = document.createElement('pre');
-      lr.style.background = '#f5f7fa';
-      lr.style.padding = '8px';
-      lr.style.borderRadius = '6px';
-      lr.style.marginTop = '8px';
-      lr.style.maxHeight = '160px';
-      lr.style.overflow = 'auto';
-      lr.textContent = item.line_results.map(r => typeof r === 'string' ? r : JSON.stringify(r)).join('\n');
-      details.appendChild(lr);
-    }
-    expandBtn.addEventListener('click', () => {
-      details.style.display = details.style.display === 'none' ? 'block' : 'none';
+  if (failedList === null) {
+    failedList = new VirtualList(host, {
+      rowHeight: FAILED_ROW_HEIGHT, renderRow: renderFailedRow, empty: 'No failures found',
+      onNearEnd: () => { if (failedCursor) loadFailedPage(failedCursor).catch(e => console.error(e)); }
     });
-    card.appendChild(details);
-    host.appendChild(card);
+  }
+  if (append) failedList.append(Array.isArray(list) ? list : []);
+  else failedList.setItems(Array.isArray(list) ? list : []);
+}
+
+async function loadCluster() {
+  const res = await fetch('/api/compliance/cluster?worst=10');
+  if (!res.ok) return;
+  const data = await res.json();
+  if (!data.nodes) return;
+  document.getElementById('cluster-panels').style.display = '';
+  document.getElementById('cluster-node-count').textContent = data.nodes;
+  const cell = 'padding:6px;border-top:1px solid #eee';
+  const nodesBody = document.querySelector('#worst-nodes-table tbody');
+  nodesBody.innerHTML = '';
+  data.worst_nodes.forEach(n => {
+    const tr = document.createElement('tr');
+    tr.innerHTML = `<td style="${cell}"></td><td style="${cell}"></td>
+                    <td style="text-align:center;${cell}">${n.fail}</td>
+                    <td style="text-align:center;${cell}">${n.total_checks}</td>`;
+    tr.children[0].textContent = n.node;
+    tr.children[1].textContent = n.role;
+    nodesBody.appendChild(tr);
+  });
+  const checksBody = document.querySelector('#cluster-checks-table tbody');
+  checksBody.innerHTML = '';
+  data.checks.slice(0, 50).forEach(c => {
+    const tr = document.createElement('tr');
+    const rate = c.pass_rate === null ? '—' : `${Math.round(c.pass_rate * 100)}%`;
+    tr.innerHTML = `<td style="${cell}"></td>
+                    <td style="text-align:center;${cell}">${rate}</td>
+                    <td style="text-align:center;${cell}">${c.nodes}</td>`;
+    tr.children[0].textContent = c.description ? `${c.check_id} — ${c.description}` : c.check_id;
+    tr.children[0].title = JSON.stringify(c.counts);
+    checksBody.appendChild(tr);
   });
 }
 
+// Failed checks are paged from /api/checks instead of shipping every result
+async function loadFailedPage(cursor) {
+  if (failedLoading) return;
+  failedLoading = true;
+  try {
+    const params = new URLSearchParams({
+      status: 'FAIL', limit: '50', lines: '8',
+      fields: 'check_id,description,status,reason,remediation,_source_file,line_results'
+    });
+    if (cursor) params.set('cursor', cursor);
+    const res = await fetch('/api/checks?' + params.toString());
+    if (!res.ok) throw new Error(`HTTP ${res.status} ${res.statusText}`);
+    const page = await res.json();
+    renderTopFailed(page.items || [], Boolean(cursor));
+    failedCursor = page.next_cursor || null;
+    const count = document.getElementById('failed-count');
+    if (count) count.textContent = `${failedList.items.length} of ${page.total} failed checks`;
+  } finally {
+    failedLoading = false;
+  }
+}
+
 document.addEventListener('DOMContentLoaded', async () => {
+  loadCluster().catch(e => console.error('Failed to fetch cluster results', e));
   const rawPre = document.getElementById('rawjson');
   try {
     const data = await fetchProcessed();
     if (rawPre) rawPre.textContent = JSON.stringify(data, null, 2);
     renderSummary(data.summary || {});
     renderPerFile(data.per_file || {});
-    renderTopFailed(data.top_failed || []);
+    try {
+      await loadFailedPage();
+    } catch (e) {
+      console.error('Failed to page failed checks', e);
+      renderTopFailed(data.top_failed || []);
+    }
   } catch (e) {
     console.error('Failed to fetch processed data', e);
     if (rawPre) rawPre.textContent = 'Failed to fetch processed data: ' + (e && e.message ? e.message : String(e));
@@ -173,16 +233,50 @@ async function startScan() {
   }
 }
 
+function formatEta(seconds) {
+  if (seconds === null || seconds === undefined) return '';
+  if (seconds < 60) return `~${Math.max(1, Math.round(seconds))}s left`;
+  return `~${Math.round(seconds / 60)} min left`;
+}
+
+function progressText(p) {
+  if (!p) return 'Scan running…';
+  let text = `Scan running: ${p.checks_done}/${p.checks_total} checks (${p.percent}%)`;
+  if (p.current && (p.current.group || p.current.group_id)) text += ` — ${p.current.group || p.current.group_id}`;
+  const eta = formatEta(p.eta_seconds);
+  if (eta) text += `, ${eta}`;
+  if (p.state === 'stalled') text += ' (no progress reported recently)';
+  return text;
+}
+
+// Results finished so far are fetched incrementally (`since` = results already
+// shown) and rendered as they arrive, before results.json exists
 async function pollJobStatus() {
   const statusEl = document.getElementById('scan-status');
+  let since = 0;
 
   const interval = setInterval(async () => {
     try {
-      const res = await fetch('/api/scan/status');
+      const res = await fetch('/api/scan/progress?since=' + since);
       const data = await res.json();
 
+      // A smaller `next` means a new scan reset the partial results
+      if (data.next < since) since = 0;
+      if (data.progress && data.progress.state !== 'completed') {
+        const failed = (data.results || []).filter(r => ['FAIL', 'FAILED', 'ERROR'].includes(String(r.status).toUpperCase()));
+        if (since === 0) {
+          failedCursor = null;
+          renderTopFailed([], false);
+        }
+        if (failed.length) renderTopFailed(failed, true);
+        const count = document.getElementById('failed-count');
+        if (count && failedList) count.textContent = `${failedList.items.length} failed so far`;
+        since = data.next;
+        renderSummary({ counts: data.counts || {} });
+      }
+
       if (data.status === 'running') {
-        statusEl.textContent = 'Scan running…';
+        statusEl.textContent = progressText(data.progress);
       } else if (data.status === 'completed') {
         statusEl.textContent = 'Scan completed. Reloading…';
         clearInterval(interval);
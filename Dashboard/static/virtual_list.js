@@ -0,0 +1,94 @@
+// static/virtual_list.js
+// Windowed list: only the rows in (and just around) the viewport exist in the
+// DOM, each a fixed `rowHeight` tall. Rows are keyed, so updating the items
+// keeps the nodes of rows that are still visible and only builds new ones.
+
+class VirtualList {
+  constructor(host, { rowHeight, renderRow, key, overscan = 6, onNearEnd = null, empty = '' }) {
+    this.host = host;
+    this.rowHeight = rowHeight;
+    this.renderRow = renderRow;
+    this.key = key || ((item, i) => i);
+    this.overscan = overscan;
+    this.onNearEnd = onNearEnd;
+    this.empty = empty;
+    this.items = [];
+    this.nodes = new Map();
+    this.pending = false;
+    host.innerHTML = '';
+    host.style.position = 'relative';
+    host.style.overflowY = 'auto';
+    this.spacer = document.createElement('div');
+    this.spacer.style.position = 'relative';
+    host.appendChild(this.spacer);
+    this.note = document.createElement('div');
+    this.note.style.cssText = 'padding:12px;color:#666;text-align:center;';
+    host.appendChild(this.note);
+    host.addEventListener('scroll', () => this.schedule());
+  }
+
+  // Replace the items; the row at the top of the viewport stays there
+  setItems(items) {
+    const top = Math.floor(this.host.scrollTop / this.rowHeight);
+    const anchor = top > 0 && top < this.items.length ? this.key(this.items[top], top) : undefined;
+    this.items = items;
+    if (anchor !== undefined) {
+      const moved = items.findIndex((item, i) => this.key(item, i) === anchor);
+      if (moved >= 0) {
+        // Grow the spacer first so the new scroll position is not clamped
+        this.spacer.style.height = `${items.length * this.rowHeight}px`;
+        this.host.scrollTop += (moved - top) * this.rowHeight;
+      }
+    }
+    this.schedule();
+  }
+
+  append(items) {
+    if (!items.length) return;
+    this.items = this.items.concat(items);
+    this.schedule();
+  }
+
+  schedule() {
+    if (this.pending) return;
+    this.pending = true;
+    requestAnimationFrame(() => {
+      this.pending = false;
+      this.render();
+    });
+  }
+
+  render() {
+    const n = this.items.length;
+    this.note.textContent = n ? '' : this.empty;
+    this.note.style.display = n ? 'none' : '';
+    this.spacer.style.height = `${n * this.rowHeight}px`;
+    const first = Math.max(0, Math.floor(this.host.scrollTop / this.rowHeight) - this.overscan);
+    const visible = Math.ceil((this.host.clientHeight || 600) / this.rowHeight) + 2 * this.overscan;
+    const last = Math.min(n, first + visible);
+    const keep = new Map();
+    for (let i = first; i < last; i++) {
+      const item = this.items[i];
+      const k = this.key(item, i);
+      let node = this.nodes.get(k);
+      if (node === undefined || node._item !== item) {
+        if (node !== undefined) node.remove();
+        node = this.renderRow(item, i);
+        node._item = item;
+        node.style.position = 'absolute';
+        node.style.left = '0';
+        node.style.right = '0';
+        node.style.height = `${this.rowHeight}px`;
+        node.style.boxSizing = 'border-box';
+        node.style.overflow = 'hidden';
+        this.spacer.appendChild(node);
+      }
+      node.style.top = `${i * this.rowHeight}px`;
+      keep.set(k, node);
+      this.nodes.delete(k);
+    }
+    this.nodes.forEach(node => node.remove());
+    this.nodes = keep;
+    if (this.onNearEnd && n && last >= n - this.overscan) this.onNearEnd();
+  }
+}
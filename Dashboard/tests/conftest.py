@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DASHBOARD_DIR)
+# Shared with the scanners (results_summary.py), as app.py does
+sys.path.append(os.path.join(DASHBOARD_DIR, '..', 'Compliance', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Modules read their paths at import time; keep everything out of /output
+_OUTPUT = tempfile.mkdtemp(prefix='dashboard-tests-')
+for _var, _name in (
+    ('RESULT_JSON_PATH', 'results.json'),
+    ('RESULT_MANIFEST_PATH', 'manifest.json'),
+    ('RUNTIME_LOGS_PATH', 'runtime_alerts.json'),
+    ('RUNTIME_LOG_DIR', 'runtime_log'),
+    ('COLLECTOR_STATS_PATH', 'collector_stats.json'),
+    ('COLLECTOR_CHECKPOINT_PATH', 'collector_checkpoints.json'),
+    ('NODE_RESULTS_DIR', 'nodes'),
+    ('HISTORY_DB_PATH', 'history.db'),
+    ('SCAN_PROGRESS_PATH', 'progress.json'),
+    ('SCAN_PARTIAL_RESULTS_PATH', 'results.partial.ndjson'),
+):
+    os.environ.setdefault(_var, os.path.join(_OUTPUT, _name))
+os.environ.setdefault('KUBE_CLIENT', 'kubectl')
@@ -0,0 +1,218 @@
+"""
+A small stand-in for the Kubernetes API server's Job endpoints, built on
+http.server, for the kube.py tests (or KUBE_API_URL=http://127.0.0.1:<port>).
+
+Jobs can be read, listed, created and deleted; watches stream the changes
+after a resourceVersion. After compact(), watches from an older
+resourceVersion get a 410 Gone ERROR event, as after etcd compaction.
+"""
+import copy
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+JOBS_RE = re.compile(r'^/apis/batch/v1/namespaces/([^/]+)/jobs(?:/([^/]+))?$')
+
+
+def status_body(code, message):
+    return {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure', 'code': code, 'message': message}
+
+
+class FakeApiServer:
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.jobs = {}          # (namespace, name) -> Job
+        self.version = 0
+        self.events = []        # (resourceVersion, namespace, type, Job)
+        self.oldest = 0         # watches from before this version get 410
+        self.closing = 0        # bumped by end_watches() to end open streams
+        self.gone_status = False  # answer stale watches with HTTP 410 instead
+        self.requests = []      # (method, path, query dict, headers)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.end_watches()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _record(self, namespace, kind, job):
+        # Callers hold self.cond
+        self.version += 1
+        job['metadata']['resourceVersion'] = str(self.version)
+        self.events.append((self.version, namespace, kind, copy.deepcopy(job)))
+        self.cond.notify_all()
+
+    def create(self, namespace, manifest):
+        with self.cond:
+            name = manifest['metadata']['name']
+            if (namespace, name) in self.jobs:
+                return None
+            job = copy.deepcopy(manifest)
+            job['metadata'].update({
+                'namespace': namespace,
+                'uid': str(uuid.uuid4()),
+                'creationTimestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            })
+            job.setdefault('status', {})
+            self.jobs[(namespace, name)] = job
+            self._record(namespace, 'ADDED', job)
+            return copy.deepcopy(job)
+
+    def set_status(self, namespace, name, **status):
+        with self.cond:
+            job = self.jobs[(namespace, name)]
+            job['status'].update(status)
+            self._record(namespace, 'MODIFIED', job)
+
+    def delete(self, namespace, name):
+        with self.cond:
+            job = self.jobs.pop((namespace, name), None)
+            if job is not None:
+                self._record(namespace, 'DELETED', job)
+            return job
+
+    def compact(self):
+        """Forget the history so far: older resourceVersions become 410 Gone."""
+        with self.cond:
+            self.oldest = self.version
+            self.events = []
+
+    def end_watches(self):
+        """Drop every open watch stream, without sending what is still pending."""
+        with self.cond:
+            self.closing += 1
+            self.cond.notify_all()
+
+    def count(self, method, watch=None):
+        return sum(1 for m, _, q, _ in self.requests
+                   if m == method and (watch is None or ('watch' in q) == watch))
+
+    def watch_versions(self):
+        return [q.get('resourceVersion', [''])[0] for m, _, q, _ in self.requests if m == 'GET' and 'watch' in q]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method):
+        fake = self.server.fake
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        fake.requests.append((method, parts.path, query, dict(self.headers)))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        match = JOBS_RE.match(parts.path)
+        if not match:
+            return self._send(404, status_body(404, 'not found'))
+        return fake, match.group(1), match.group(2), query, body
+
+    def do_GET(self):
+        routed = self._route('GET')
+        if not routed:
+            return
+        fake, namespace, name, query, _ = routed
+        if name:
+            with fake.cond:
+                job = copy.deepcopy(fake.jobs.get((namespace, name)))
+            if job is None:
+                return self._send(404, status_body(404, f'jobs.batch "{name}" not found'))
+            return self._send(200, job)
+        wanted = None
+        for selector in query.get('fieldSelector', []):
+            if selector.startswith('metadata.name='):
+                wanted = selector.split('=', 1)[1]
+        if 'watch' in query:
+            return self._watch(fake, namespace, wanted, query)
+        with fake.cond:
+            items = [copy.deepcopy(j) for (ns, n), j in sorted(fake.jobs.items())
+                     if ns == namespace and wanted in (None, n)]
+            version = str(fake.version)
+        self._send(200, {'kind': 'JobList', 'apiVersion': 'batch/v1',
+                         'metadata': {'resourceVersion': version}, 'items': items})
+
+    def _watch(self, fake, namespace, wanted, query):
+        since = int(query.get('resourceVersion', ['0'])[0] or 0)
+        deadline = time.monotonic() + float(query.get('timeoutSeconds', ['300'])[0])
+        with fake.cond:
+            gone = since < fake.oldest
+            if gone and fake.gone_status:
+                return self._send(410, status_body(410, 'too old resource version'))
+            closing = fake.closing
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        if gone:
+            error = status_body(410, f'too old resource version: {since} ({fake.oldest})')
+            self._line({'type': 'ERROR', 'object': error})
+            return
+        while True:
+            with fake.cond:
+                pending = [e for e in fake.events if e[0] > since]
+                while not pending and fake.closing == closing and time.monotonic() < deadline:
+                    fake.cond.wait(max(0.0, deadline - time.monotonic()))
+                    pending = [e for e in fake.events if e[0] > since]
+                if fake.closing != closing:
+                    return
+                done = time.monotonic() >= deadline
+            for version, ns, kind, job in pending:
+                since = version
+                if ns == namespace and wanted in (None, job['metadata']['name']):
+                    self._line({'type': kind, 'object': job})
+            if done and not pending:
+                return
+
+    def _line(self, event):
+        try:
+            self.wfile.write(json.dumps(event).encode('utf-8') + b'\n')
+            self.wfile.flush()
+        except OSError:
+            self.close_connection = True
+
+    def do_POST(self):
+        routed = self._route('POST')
+        if not routed:
+            return
+        fake, namespace, _, _, body = routed
+        job = fake.create(namespace, body)
+        if job is None:
+            name = body['metadata']['name']
+            return self._send(409, status_body(409, f'jobs.batch "{name}" already exists'))
+        self._send(201, job)
+
+    def do_DELETE(self):
+        routed = self._route('DELETE')
+        if not routed:
+            return
+        fake, namespace, name, _, _ = routed
+        if fake.delete(namespace, name) is None:
+            return self._send(404, status_body(404, f'jobs.batch "{name}" not found'))
+        self._send(200, {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Success'})
@@ -0,0 +1,135 @@
+import pytest
+
+from anomaly import RateDetector
+from events import rfc3339
+
+T0 = 1700000000.0  # a bucket boundary
+
+
+def event(ts, binary='/usr/bin/curl', pod='web-0', count=None):
+    body = {'process': {'binary': binary, 'pod': {'namespace': 'prod', 'name': pod}},
+            'function_name': 'tcp_connect'}
+    out = {'process_kprobe': body, 'time': rfc3339(ts), 'node_name': 'node-a'}
+    if count:
+        out['coalesced'] = {'count': count}
+    return out
+
+
+def detector(**overrides):
+    options = dict(bucket=10, alpha=0.1, threshold=6, min_rate=2, absolute_rate=50, warmup=3, cooldown=60)
+    options.update(overrides)
+    return RateDetector(**options)
+
+
+def fill(d, bucket, n, **kwargs):
+    """n events spread over one 10 s bucket."""
+    for i in range(n):
+        d(event(T0 + bucket * 10 + i * 10 / n, **kwargs))
+
+
+def binary_alerts(d):
+    return d.recent(dimension='binary')
+
+
+def test_absolute_rate_applies_before_the_warmup():
+    d = detector()
+    # 50/s over a 10 s bucket is 500 events: at the limit, not above it
+    fill(d, 0, 500)
+    assert binary_alerts(d) == []
+    d(event(T0 + 9.99))
+    [alert] = binary_alerts(d)
+    info = alert['anomaly']
+    assert info['key'] == '/usr/bin/curl'
+    assert info['baseline_rate'] is None
+    assert info['severity'] == 'critical'
+
+
+def test_threshold_over_a_learned_baseline():
+    d = detector()
+    for bucket in range(6):
+        fill(d, bucket, 10 + bucket % 2)
+    state = d.keys['binary']['/usr/bin/curl']
+    assert state.samples == 5
+    d(event(T0 + 60))
+    limit = d._limit(state)
+    expected = max(d.min_rate, state.mean + d.threshold * state.var ** 0.5) * d.bucket
+    assert limit == pytest.approx(expected)
+    assert limit < 500
+    for i in range(int(limit) - 1):
+        d(event(T0 + 61))
+    assert state.count == int(limit)
+    assert binary_alerts(d) == []
+    d(event(T0 + 62))
+    [alert] = binary_alerts(d)
+    assert alert['anomaly']['baseline_rate'] == pytest.approx(state.mean, abs=0.01)
+    assert alert['anomaly']['severity'] == 'high'
+
+
+def test_min_rate_keeps_quiet_keys_from_alerting():
+    d = detector(min_rate=5)
+    for bucket in range(5):
+        fill(d, bucket, 1)
+    # 5/s over a baseline of ~0.1/s is far above threshold, but not above min_rate
+    fill(d, 5, 50)
+    assert binary_alerts(d) == []
+    d(event(T0 + 59.9))
+    assert len(binary_alerts(d)) == 1
+
+
+def test_excess_within_the_cooldown_updates_one_alert():
+    d = detector(absolute_rate=1)
+    fill(d, 0, 12)
+    [alert] = binary_alerts(d)
+    assert alert['anomaly']['excess_events'] == 1
+    # Later buckets still over the limit, within the cooldown
+    fill(d, 3, 12)
+    [alert] = binary_alerts(d)
+    assert alert['anomaly']['excess_events'] > 1
+    assert alert['anomaly']['last_time'] == pytest.approx(T0 + 30 + 11 * 10 / 12)
+    # After the cooldown the next burst is a new alert
+    fill(d, 12, 12)
+    assert len(binary_alerts(d)) == 2
+
+
+def test_empty_buckets_decay_the_baseline_in_closed_form():
+    d = detector()
+    for bucket in range(4):
+        fill(d, bucket, 20)
+    # Closes bucket 3 and opens bucket 4 with one event
+    d(event(T0 + 40))
+    state = d.keys['binary']['/usr/bin/curl']
+    mean, var, samples = state.mean, state.var, state.samples
+    # Closes bucket 4, then folds in the four silent buckets 5-8
+    d(event(T0 + 90))
+    a = d.alpha
+    for rate in [1 / d.bucket, 0, 0, 0, 0]:
+        diff = rate - mean
+        mean += a * diff
+        var = (1 - a) * (var + a * diff * diff)
+    assert state.samples == samples + 5
+    assert state.mean == pytest.approx(mean)
+    assert state.var == pytest.approx(var)
+
+
+def test_a_sustained_burst_does_not_become_the_baseline():
+    d = detector()
+    for bucket in range(5):
+        fill(d, bucket, 10)
+    state = d.keys['binary']['/usr/bin/curl']
+    d(event(T0 + 50))
+    cap = state.mean + d.threshold * state.var ** 0.5 + d.min_rate
+    fill(d, 6, 400)
+    d(event(T0 + 70))
+    # The 40/s bucket counted as at most the cap
+    assert state.mean <= cap
+    assert state.mean < 40 * d.alpha
+
+
+def test_keys_are_bounded_and_idle_ones_dropped():
+    d = detector(max_keys=3, idle=100)
+    for i in range(5):
+        d(event(T0 + i, binary=f"/bin/{i}"))
+    assert list(d.keys['binary']) == ['/bin/2', '/bin/3', '/bin/4']
+    d(event(T0 + 200, binary='/bin/new'))
+    assert list(d.keys['binary']) == ['/bin/new']
+    assert d.stats['evicted'] >= 5
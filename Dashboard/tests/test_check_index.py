@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from check_index import CheckIndex, natural_key
+from results_summary import normalize_status
+
+
+def results(n=60, seed=3):
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        group = 1 + i % 3
+        out.append({
+            'check_id': f"1.{group}.{i + 1}",
+            'status': rng.choice(['PASS', 'FAIL', 'warn', 'ERROR', None]),
+            'description': rng.choice(['Ensure the API server audit log is enabled', 'Ensure kubelet TLS is set']),
+            'reason': rng.choice(['file missing', 'flag not set', '']),
+            '_source_file': rng.choice(['master.yaml', 'node.yaml']),
+        })
+    rng.shuffle(out)
+    return out
+
+
+def pages(index, limit, **filters):
+    """Follow next_cursor from the first page to the last."""
+    seen, cursor, totals = [], None, set()
+    while True:
+        page = index.query(limit=limit, cursor=cursor, fields=['check_id', 'status'], **filters)
+        seen.extend(item['check_id'] for item in page['items'])
+        totals.add(page['total'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return seen, totals
+
+
+@pytest.mark.parametrize('limit', [1, 7, 20, 60, 100])
+def test_cursor_walks_every_check_once_in_order(limit):
+    raw = results()
+    index = CheckIndex(raw, normalize_status, version='v1')
+    seen, totals = pages(index, limit)
+    assert seen == sorted((r['check_id'] for r in raw), key=natural_key)
+    assert totals == {len(raw)}
+
+
+def test_filtered_pages_match_brute_force():
+    raw = results()
+    index = CheckIndex(raw, normalize_status, version='v1')
+    seen, totals = pages(index, 4, statuses=['fail'], sources=['master.yaml'], prefix='1.2.', text='kube')
+    expected = sorted((r['check_id'] for r in raw
+                       if normalize_status(r['status']) == 'FAIL' and r['_source_file'] == 'master.yaml'
+                       and r['check_id'].startswith('1.2.') and 'kubelet' in r['description'].lower()),
+                      key=natural_key)
+    assert expected
+    assert seen == expected
+    assert totals == {len(expected)}
+
+
+@pytest.mark.parametrize('text', ['-', '"" ?', '  '])
+def test_text_without_words_does_not_filter(text):
+    raw = results()
+    index = CheckIndex(raw, normalize_status, version='v1')
+    seen, totals = pages(index, 25, text=text)
+    assert seen == sorted((r['check_id'] for r in raw), key=natural_key)
+    assert totals == {len(raw)}
+
+
+def test_cursor_from_another_scan_is_rejected():
+    old = CheckIndex(results(), normalize_status, version='v1')
+    cursor = old.query(limit=5)['next_cursor']
+    new = CheckIndex(results(seed=4), normalize_status, version='v2')
+    with pytest.raises(ValueError, match='older scan'):
+        new.query(limit=5, cursor=cursor)
+
+
+@pytest.mark.parametrize('cursor', ['!!!', 'bm90LWEtY3Vyc29y'])
+def test_invalid_cursor_is_rejected(cursor):
+    index = CheckIndex(results(), normalize_status, version='v1')
+    with pytest.raises(ValueError):
+        index.query(cursor=cursor)
@@ -0,0 +1,98 @@
+import json
+import time
+
+from coalesce import Coalescer
+
+
+def tracepoint(call, ts, binary='/usr/bin/curl', pod='web'):
+    event = {
+        'process_tracepoint': {
+            'process': {'binary': binary, 'pod': {'namespace': 'default', 'name': pod}},
+            'parent': {'binary': '/bin/sh'},
+            'event': call,
+        },
+        'time': f"t{ts}",
+    }
+    return json.dumps(event), event, ts
+
+
+def make(window=5, **kwargs):
+    out = []
+    coalescer = Coalescer(lambda text, ts: out.append((json.loads(text), ts)), window=window,
+                          calls=['sys_enter_connect', 'sys_enter_clone'], **kwargs)
+    return coalescer, out
+
+
+def test_burst_collapses_into_first_event_of_the_window():
+    coalescer, out = make()
+    for ts in (100.0, 100.5, 101.0, 102.0):
+        coalescer.add(*tracepoint('sys_enter_connect', ts))
+    assert out == []
+    coalescer.flush()
+    [(event, ts)] = out
+    assert ts == 100.0
+    assert event['time'] == 't100.0'
+    assert event['coalesced'] == {
+        'count': 4, 'first_time': 't100.0', 'last_time': 't102.0',
+        'rate_per_sec': 2.0, 'window_seconds': 5,
+    }
+    assert coalescer.snapshot() == {'events_in': 4, 'records_out': 1, 'collapsed': 3, 'open_windows': 0}
+
+
+def test_other_events_pass_straight_through():
+    coalescer, out = make()
+    coalescer.add(*tracepoint('sys_enter_openat', 1.0))
+    exec_event = {'process_exec': {'process': {'binary': '/bin/ls'}}, 'time': 't2'}
+    coalescer.add(json.dumps(exec_event), exec_event, 2.0)
+    assert [e for e, _ in out] == [tracepoint('sys_enter_openat', 1.0)[1], exec_event]
+
+
+def test_single_event_window_is_written_unchanged():
+    coalescer, out = make()
+    text, event, ts = tracepoint('sys_enter_clone', 1.0)
+    coalescer.add(text, event, ts)
+    coalescer.flush()
+    assert out == [(json.loads(text), 1.0)]
+
+
+def test_keys_have_separate_windows():
+    coalescer, out = make()
+    for ts in (1.0, 2.0):
+        coalescer.add(*tracepoint('sys_enter_connect', ts, pod='a'))
+        coalescer.add(*tracepoint('sys_enter_connect', ts, pod='b'))
+        coalescer.add(*tracepoint('sys_enter_clone', ts, pod='a'))
+    coalescer.flush()
+    assert len(out) == 3
+    assert all(e['coalesced']['count'] == 2 for e, _ in out)
+
+
+def test_event_time_past_the_window_closes_it():
+    coalescer, out = make(window=5)
+    for ts in (0.0, 1.0, 4.9, 5.0, 6.0):
+        coalescer.add(*tracepoint('sys_enter_connect', ts))
+    assert [(e['coalesced']['count'], ts) for e, ts in out] == [(3, 0.0)]
+    coalescer.flush()
+    assert [(e['coalesced']['count'], ts) for e, ts in out] == [(3, 0.0), (2, 5.0)]
+
+
+def test_flush_expired_closes_only_windows_open_longer_than_the_window():
+    coalescer, out = make(window=0.2)
+    coalescer.add(*tracepoint('sys_enter_connect', 1.0, pod='old'))
+    coalescer.add(*tracepoint('sys_enter_connect', 1.0, pod='old'))
+    time.sleep(0.25)
+    coalescer.add(*tracepoint('sys_enter_connect', 1.0, pod='new'))
+    coalescer.flush_expired()
+    assert [(e['process_tracepoint']['process']['pod']['name'], e['coalesced']['count']) for e, _ in out] == [('old', 2)]
+    assert coalescer.snapshot()['open_windows'] == 1
+    time.sleep(0.25)
+    coalescer.flush_expired()
+    assert len(out) == 2
+    assert coalescer.snapshot()['open_windows'] == 0
+
+
+def test_too_many_open_windows_flush_the_oldest():
+    coalescer, out = make(max_keys=2)
+    for pod in ('a', 'b', 'c'):
+        coalescer.add(*tracepoint('sys_enter_connect', 1.0, pod=pod))
+    assert [e['process_tracepoint']['process']['pod']['name'] for e, _ in out] == ['a']
+    assert coalescer.snapshot()['open_windows'] == 2
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import app as dashboard
+from compliance_store import NodeResultsStore
+from results_summary import build_processed, normalize_status
+
+
+def document(node, statuses, role='worker'):
+    return {'node': node, 'role': role, 'scanned_at': 1.0,
+            'results': [{'check_id': cid, 'status': s} for cid, s in statuses.items()]}
+
+
+def write(directory, node, data):
+    (directory / f"{node}.json").write_text(json.dumps(data) if not isinstance(data, str) else data)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NodeResultsStore(str(tmp_path), build_processed, normalize_status)
+
+
+def test_cluster_counts_follow_node_files(tmp_path, store):
+    write(tmp_path, 'a', document('a', {'1.1': 'PASS', '1.2': 'FAIL'}))
+    write(tmp_path, 'b', document('b', {'1.1': 'FAIL'}))
+    store.refresh()
+    assert dict(store.check_counts['1.1']) == {'PASS': 1, 'FAIL': 1}
+    write(tmp_path, 'b', document('b', {'1.1': 'PASS', '1.2': 'PASS'}))
+    store.refresh()
+    assert dict(store.check_counts['1.1']) == {'PASS': 2}
+    (tmp_path / 'a.json').unlink()
+    store.refresh()
+    assert dict(store.check_counts['1.2']) == {'PASS': 1}
+    assert [s['node'] for s in store.summaries()] == ['b']
+
+
+def test_failed_load_is_retried_without_a_file_change(tmp_path, store, monkeypatch):
+    write(tmp_path, 'a', document('a', {'1.1': 'PASS'}))
+    load = store._load
+    calls = []
+
+    def flaky(node, identity):
+        calls.append(node)
+        # The first read sees a file still being written
+        return None if len(calls) == 1 else load(node, identity)
+
+    monkeypatch.setattr(store, '_load', flaky)
+    partial = store.refresh()
+    assert store.summaries() != []
+    assert calls == ['a', 'a']
+    assert partial != store.refresh()
+
+
+def test_malformed_file_is_not_loaded_until_fixed(tmp_path, store):
+    write(tmp_path, 'a', '{"results": [')
+    first = store.refresh()
+    assert store.summaries() == []
+    assert store.refresh() == first
+    write(tmp_path, 'a', document('a', {'1.1': 'PASS'}))
+    assert store.refresh() != first
+    assert [s['node'] for s in store.summaries()] == ['a']
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard, 'node_results', NodeResultsStore(str(tmp_path), build_processed, normalize_status))
+    return dashboard.app.test_client()
+
+
+def test_uploads_are_refused_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(dashboard, 'NODE_UPLOAD_TOKEN', '')
+    response = client.put('/api/compliance/nodes/a', json=document('a', {'1.1': 'PASS'}),
+                          headers={'Authorization': 'Bearer '})
+    assert response.status_code == 403
+    assert dashboard.node_results.summaries() == []
+
+
+def test_uploads_need_the_shared_token(client, monkeypatch):
+    monkeypatch.setattr(dashboard, 'NODE_UPLOAD_TOKEN', 's3cret')
+    body = document('a', {'1.1': 'PASS'})
+    assert client.put('/api/compliance/nodes/a', json=body).status_code == 401
+    assert client.put('/api/compliance/nodes/a', json=body,
+                      headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert dashboard.node_results.summaries() == []
+    response = client.put('/api/compliance/nodes/a', json=body, headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert [s['node'] for s in dashboard.node_results.summaries()] == ['a']
@@ -0,0 +1,83 @@
+import json
+import os
+
+from event_store import EventStore, iso_time
+from ingest import RuntimeIngester
+from segments import SegmentWriter
+
+
+def kprobe(i, ts, binary=None, namespace='prod'):
+    return {
+        'process_kprobe': {
+            'process': {'binary': binary or f"/usr/bin/tool-{i}", 'pid': 100 + i,
+                        'pod': {'namespace': namespace, 'name': f"web-{i}"}},
+            'function_name': 'tcp_connect',
+        },
+        'node_name': 'node-a',
+        'time': iso_time(ts),
+    }
+
+
+def test_ring_wraparound_releases_overwritten_strings():
+    store = EventStore(capacity=4)
+    for i in range(4):
+        store(kprobe(i, 1000 + i))
+    full = len(store.strings)
+    for i in range(4, 50):
+        store(kprobe(i, 1000 + i))
+    assert store.oldest_id == 46
+    assert store.row(45) is None
+    assert [store.row(i)['binary'] for i in range(46, 50)] == [f"/usr/bin/tool-{i}" for i in range(46, 50)]
+    # Only the strings of the rows still held, with freed ids reused
+    assert len(store.strings) == full
+    assert len(store.strings.strings) == full + len(store.strings.free)
+    assert '/usr/bin/tool-3' not in store.strings.ids
+    # Shared by every row: kept throughout
+    assert store.strings.refs[store.strings.ids['prod']] == 4
+
+
+def test_string_shared_with_the_new_row_survives_the_overwrite():
+    store = EventStore(capacity=1)
+    store(kprobe(0, 1000, binary='/bin/sh'))
+    sid = store.strings.ids['/bin/sh']
+    store(kprobe(1, 1001, binary='/bin/sh', namespace='dev'))
+    assert store.strings.ids['/bin/sh'] == sid
+    assert 'prod' not in store.strings.ids
+    assert store.row(1)['namespace'] == 'dev'
+
+
+def ingest(tmp_path, times):
+    """A segment log (60 s windows) ingested into a store; returns (writer, store, ingester)."""
+    log_dir = str(tmp_path / 'log')
+    writer = SegmentWriter(log_dir, batch_size=1000, roll_seconds=60, retention_seconds=0, retention_bytes=0)
+    for i, ts in enumerate(times):
+        writer.write(json.dumps(kprobe(i, ts)), ts)
+    writer.flush()
+    ingester = RuntimeIngester(log_dir, str(tmp_path / 'missing.json'))
+    store = EventStore(location=lambda: ingester.location)
+    ingester.add_consumer(store)
+    ingester.poll()
+    return writer, store, ingester
+
+
+def test_rehydrate_reads_sealed_and_open_segments(tmp_path):
+    writer, store, _ = ingest(tmp_path, [0, 10, 61, 62, 130])
+    assert 'seg-00000002.ndjson.gz' in os.listdir(writer.directory)
+    locations = store.locations(range(5))
+    assert [loc[0] for loc in locations.values()] == ['seg-00000001'] * 2 + ['seg-00000002'] * 2 + ['seg-00000003']
+    payloads = store.rehydrate(range(5), writer.directory, '')
+    assert [payloads[i]['process_kprobe']['process']['pid'] for i in range(5)] == [100, 101, 102, 103, 104]
+    writer.close()
+
+
+def test_rehydrate_follows_a_segment_sealed_after_ingest(tmp_path):
+    writer, store, ingester = ingest(tmp_path, [0, 10])
+    # Ingested while open; the next window seals and compresses it
+    writer.write(json.dumps(kprobe(2, 100)), 100)
+    writer.flush()
+    assert 'seg-00000001.ndjson.gz' in os.listdir(writer.directory)
+    ingester.poll()
+    payloads = store.rehydrate([0, 1, 2], writer.directory, '')
+    assert sorted(payloads) == [0, 1, 2]
+    assert payloads[1]['time'] == iso_time(10)
+    writer.close()
@@ -0,0 +1,12 @@
+import pytest
+
+from events import parse_time, rfc3339
+
+
+@pytest.mark.parametrize('ts', [0.0, 1700000000.0, 1700000000.123456789, 1700000000.9999995])
+def test_rfc3339_round_trips_through_parse_time(ts):
+    text = rfc3339(ts)
+    # Whole seconds are never rounded up into the next one
+    assert text[:19] == rfc3339(int(ts))[:19]
+    assert len(text.rsplit('.', 1)[1]) == 10
+    assert parse_time(text) == pytest.approx(ts, abs=1e-6)
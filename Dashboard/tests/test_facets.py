@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from event_store import EventStore
+from facets import FACETS, FacetIndex, count_rows, format_query, match_row, parse_query
+from events import rfc3339
+
+VALUES = {
+    'namespace': ['prod', 'staging', 'kube-system'],
+    'pod': ['web-0', 'web-1', 'debug-0', ''],
+    'node': ['node-a', 'node-b'],
+    'binary': ['curl', 'wget', 'sh', 'nc'],
+    'policy': ['dos-connect', 'file-monitor', ''],
+}
+
+
+def alert(rng, ts):
+    pod = rng.choice(VALUES['pod'])
+    process = {'binary': '/usr/bin/' + rng.choice(VALUES['binary']), 'pid': rng.randrange(1, 5000)}
+    if pod:
+        process['pod'] = {'name': pod, 'namespace': rng.choice(VALUES['namespace'])}
+    return {
+        'process_kprobe': {
+            'process': process,
+            'function_name': rng.choice(['tcp_connect', 'security_file_open']),
+            'policy_name': rng.choice(VALUES['policy']),
+        },
+        'node_name': rng.choice(VALUES['node']),
+        'time': rfc3339(1700000000 + ts),
+    }
+
+
+def random_query(rng, depth=0):
+    if depth >= 2 or rng.random() < 0.4:
+        facet = rng.choice(list(VALUES))
+        return ('term', facet, rng.choice([v for v in VALUES[facet] if v]))
+    if rng.random() < 0.2:
+        return ('not', random_query(rng, depth + 1))
+    return (rng.choice(['and', 'or']), [random_query(rng, depth + 1) for _ in range(rng.randint(2, 3))])
+
+
+def held_rows(store):
+    return [store.row(i) for i in range(store.oldest_id, store.next_id)]
+
+
+def brute_force(store, query, since=None, until=None):
+    rows = [r for r in held_rows(store) if query is None or match_row(query, r)]
+    held = {i: store.ts[i % store.capacity] for i in range(store.oldest_id, store.next_id)}
+    return [r for r in rows if (since is None or held[r['id']] >= since) and (until is None or held[r['id']] <= until)]
+
+
+def make_store(capacity, events):
+    rng = random.Random(capacity)
+    store = EventStore(capacity=capacity)
+    FacetIndex(store)
+    for ts in range(events):
+        store(alert(rng, ts))
+    return store
+
+
+@pytest.fixture(params=[(500, 300), (100, 12000)], ids=['partial', 'wrapped'])
+def store(request):
+    """A store with its index, filled past its capacity when `wrapped`."""
+    return make_store(*request.param)
+
+
+def test_search_matches_brute_force(store):
+    rng = random.Random(7)
+    queries = [None] + [random_query(rng) for _ in range(200)]
+    for query in queries:
+        expected = brute_force(store, query)
+        result = store.index.search(query, limit=store.capacity)
+        assert result['ids'] == [r['id'] for r in reversed(expected)], format_query(query)
+        assert result['total'] == len(expected)
+        assert result['facets'] == count_rows(expected, FACETS, 20)
+
+
+def test_search_with_time_range_matches_brute_force(store):
+    rng = random.Random(11)
+    first = store.ts[store.oldest_id % store.capacity]
+    since, until = 1700000000 + first + 20, 1700000000 + first + 60
+    for query in [None] + [random_query(rng) for _ in range(50)]:
+        expected = brute_force(store, query, since, until)
+        result = store.index.search(query, since=since, until=until, limit=10)
+        assert result['total'] == len(expected)
+        assert result['ids'] == [r['id'] for r in reversed(expected)][:10]
+
+
+def test_index_built_over_existing_events_matches_incremental(store):
+    incremental = store.index
+    rebuilt = FacetIndex(store)
+    query = parse_query('namespace:prod AND (binary:curl OR binary:wget) NOT pod:debug-0')
+    assert rebuilt.search(query, limit=50) == incremental.search(query, limit=50)
+    assert {c: {sid: list(e[0][e[1]:]) for sid, e in p.items()} for c, p in rebuilt.postings.items()} == \
+        {c: {sid: list(e[0][e[1]:]) for sid, e in p.items()} for c, p in incremental.postings.items()}
+
+
+def test_evicted_events_leave_the_posting_lists():
+    # Long enough for the posting lists to compact their evicted heads
+    store = make_store(100, 12000)
+    for postings in store.index.postings.values():
+        for ids, head in postings.values():
+            live = ids[head:]
+            assert live[0] >= store.oldest_id
+            assert list(live) == sorted(live)
+    total = sum(len(ids) - head for ids, head in store.index.postings['node'].values())
+    assert total == store.capacity
@@ -0,0 +1,54 @@
+import json
+import time
+
+from compliance_store import NodeResultsStore
+from history import ScanHistory, ScanRecorder
+from results_summary import build_processed, normalize_status
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+def results(status='PASS'):
+    return [{'check_id': '1.1.1', 'status': status, 'description': 'd'},
+            {'check_id': '1.1.2', 'status': 'FAIL', 'reason': 'r'}]
+
+
+def test_node_scans_loaded_before_starting_are_recorded(tmp_path):
+    nodes = tmp_path / 'nodes'
+    nodes.mkdir()
+    (nodes / 'worker-1.json').write_text(json.dumps({'role': 'worker', 'scanned_at': 10.0, 'results': results()}))
+    history = ScanHistory(str(tmp_path / 'history.db'), normalize_status)
+    recorder = None
+    store = NodeResultsStore(str(nodes), build_processed, normalize_status,
+                             on_load=lambda *args: recorder.node_loaded(*args))
+    recorder = ScanRecorder(history, lambda: (None, None), store.refresh, interval=3600, reload_nodes=store.reload)
+
+    # Loaded while this process is not the recorder: dropped
+    store.refresh()
+    assert not recorder.pending
+
+    recorder.start()
+    wait_for(lambda: recorder.stats['recorded'] == 1)
+    [run] = history.runs()
+    assert (run['source'], run['completed_at'], run['total']) == ('worker-1', 10.0, 2)
+    assert [s['node'] for s in store.summaries()] == ['worker-1']
+    assert dict(store.check_counts['1.1.2']) == {'FAIL': 1}
+
+
+def test_results_recorded_from_several_processes_are_stored_once(tmp_path):
+    path = str(tmp_path / 'history.db')
+    identity = (42, 1700000000 * 10**9, 123)
+    current = lambda: (identity, results())
+    leader = ScanRecorder(ScanHistory(path, normalize_status), current)
+    worker = ScanRecorder(ScanHistory(path, normalize_status), current)
+    assert worker.record_results()
+    assert leader.record_results()
+    assert not worker.record_results()
+    assert len(ScanHistory(path, normalize_status).runs()) == 1
+    assert worker.stats['recorded'] + leader.stats['recorded'] == 1
@@ -0,0 +1,165 @@
+import time
+
+import pytest
+
+import app as dashboard
+from fake_apiserver import FakeApiServer
+from kube import ApiServerClient, JobWatcher, KubeError, job_age, job_pending, recreate_job
+from shared import SharedState
+
+NS = 'compliance'
+
+
+def job_manifest(name='cis-scan'):
+    return {'apiVersion': 'batch/v1', 'kind': 'Job', 'metadata': {'name': name}, 'spec': {}}
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server():
+    fake = FakeApiServer().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def client(server):
+    return ApiServerClient(server.url, token='test-token')
+
+
+@pytest.fixture
+def watcher(client):
+    watcher = JobWatcher(client, NS, 'cis-scan', retry=0.2)
+    watcher.start()
+    wait_for(lambda: watcher.synced)
+    return watcher
+
+
+def test_create_get_delete_job(server, client):
+    created = client.create_job(NS, job_manifest())
+    assert created['metadata']['uid']
+    assert client.get_job(NS, 'cis-scan')['metadata']['uid'] == created['metadata']['uid']
+
+    with pytest.raises(KubeError) as exc:
+        client.create_job(NS, job_manifest())
+    assert exc.value.status == 409
+
+    client.delete_job(NS, 'cis-scan')
+    assert client.get_job(NS, 'cis-scan') is None
+    # Deleting a missing Job is not an error
+    client.delete_job(NS, 'cis-scan')
+
+    assert all(headers.get('Authorization') == 'Bearer test-token' for *_, headers in server.requests)
+    # Every request went over the same keep-alive connection
+    assert client.pool.created == 1
+
+
+def test_recreate_job_replaces_existing(server, client):
+    old = client.create_job(NS, job_manifest())
+    new = recreate_job(client, NS, job_manifest())
+    assert new['metadata']['uid'] != old['metadata']['uid']
+    assert server.count('DELETE') == 1
+    assert client.get_job(NS, 'cis-scan')['metadata']['uid'] == new['metadata']['uid']
+
+
+def test_list_jobs_filters_by_name(server, client):
+    client.create_job(NS, job_manifest('cis-scan'))
+    client.create_job(NS, job_manifest('other'))
+    listing = client.list_jobs(NS, 'cis-scan')
+    assert [j['metadata']['name'] for j in listing['items']] == ['cis-scan']
+    assert listing['metadata']['resourceVersion'] == str(server.version)
+
+
+def test_watch_streams_changes_after_version(server, client):
+    client.create_job(NS, job_manifest())
+    version = client.list_jobs(NS, 'cis-scan')['metadata']['resourceVersion']
+    server.set_status(NS, 'cis-scan', succeeded=1)
+    server.create(NS, job_manifest('other'))
+    events = list(client.watch_jobs(NS, 'cis-scan', version, timeout=1))
+    assert [e['type'] for e in events] == ['MODIFIED']
+    assert events[0]['object']['status'] == {'succeeded': 1}
+
+
+def test_watcher_follows_job(server, client, watcher):
+    assert watcher.status() == 'not_found'
+    client.create_job(NS, job_manifest())
+    wait_for(lambda: watcher.status() == 'running')
+    server.set_status(NS, 'cis-scan', succeeded=1)
+    wait_for(lambda: watcher.status() == 'completed')
+    client.delete_job(NS, 'cis-scan')
+    wait_for(lambda: watcher.status() == 'not_found')
+    # Listed once; everything after came from the one watch
+    assert server.count('GET', watch=False) == 1
+    assert server.count('GET', watch=True) == 1
+
+
+def test_watcher_resumes_from_last_version(server, client, watcher):
+    client.create_job(NS, job_manifest())
+    wait_for(lambda: watcher.status() == 'running')
+    seen = str(server.version)
+    # The stream ends (timeoutSeconds) and the Job fails before the watch is renewed
+    with server.cond:
+        server.end_watches()
+        server.set_status(NS, 'cis-scan', failed=1)
+    wait_for(lambda: watcher.status() == 'failed')
+    assert server.count('GET', watch=False) == 1
+    assert server.watch_versions()[1] == seen
+
+
+def test_watcher_relists_after_410_gone_event(server, client, watcher):
+    client.create_job(NS, job_manifest())
+    wait_for(lambda: watcher.status() == 'running')
+    # The Job completes and that history is compacted before the watch is renewed
+    with server.cond:
+        server.set_status(NS, 'cis-scan', succeeded=1)
+        server.compact()
+        server.end_watches()
+    wait_for(lambda: watcher.status() == 'completed')
+    assert server.count('GET', watch=False) == 2
+    assert watcher.synced
+
+
+def test_watcher_backs_off_before_relisting_on_410_response(server, client, watcher):
+    server.gone_status = True
+    client.create_job(NS, job_manifest())
+    wait_for(lambda: watcher.status() == 'running')
+    with server.cond:
+        server.set_status(NS, 'cis-scan', succeeded=1)
+        server.compact()
+        server.end_watches()
+    wait_for(lambda: '410' in (watcher.last_error or '') or 'too old' in (watcher.last_error or ''))
+    # Not relisted until the retry delay has passed; the listed state is kept
+    assert server.count('GET', watch=False) == 1
+    assert watcher.synced
+    wait_for(lambda: watcher.status() == 'completed')
+    assert server.count('GET', watch=False) == 2
+
+
+def test_workers_serve_the_status_the_leader_publishes(tmp_path, monkeypatch):
+    state = SharedState(str(tmp_path))
+    monkeypatch.setattr(dashboard, 'shared_state', state)
+    lookups = []
+    monkeypatch.setattr(dashboard.kube_client, 'get_job', lambda *args: lookups.append(args))
+    state.publish('scan_job', {'status': 'completed'})
+    assert dashboard.scan_job_status() == 'completed'
+    assert lookups == []
+    # The leader has not listed the Job yet
+    state.publish('scan_job', {'status': None})
+    assert dashboard.scan_job_status() == 'not_found'
+    assert lookups == [(dashboard.NAMESPACE, dashboard.JOB_NAME)]
+
+
+def test_job_pending_and_age(server, client):
+    job = client.create_job(NS, job_manifest())
+    assert job_pending(job)
+    assert 0 <= job_age(job) < 60
+    assert not job_pending(dict(job, status={'ready': 1}))
+    assert not job_pending(dict(job, status={'succeeded': 1}))
+    assert job_age({}) is None
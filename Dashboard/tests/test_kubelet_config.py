@@ -0,0 +1,113 @@
+import importlib.util
+import os
+
+import pytest
+
+# The worker scanner's main.py (not the control-plane one also named main)
+_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Compliance', 'src', 'worker', 'main.py')
+_role = os.environ.get('NODE_ROLE')
+_spec = importlib.util.spec_from_file_location('worker_main', _path)
+worker = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(worker)
+if _role is None:
+    # Set by the worker at import time; keep it out of the other tests
+    os.environ.pop('NODE_ROLE', None)
+
+AUDIT = '/bin/ps -fC $kubeletbin'
+CONFIG = """
+authentication:
+  anonymous:
+    enabled: false
+  webhook:
+    cacheTTL: 2m0s
+readOnlyPort: 0
+eventRecordQPS: 5
+tlsCipherSuites:
+  - TLS_ECDHE_RSA_WITH_AES_128_GCM_SHA256
+  - TLS_ECDHE_RSA_WITH_AES_256_GCM_SHA384
+"""
+
+
+@pytest.fixture
+def kubelet(tmp_path):
+    config = tmp_path / 'config.yaml'
+    config.write_text(CONFIG)
+    kubelet = worker.KubeletConfig()
+    # What `ps -fC kubelet` would print, so no command runs
+    kubelet._outputs['/bin/ps -fC kubelet'] = (
+        f"root 1 0 0 10:00 ? 00:00:01 /usr/bin/kubelet --config={config} --read-only-port 10255 "
+        "--anonymous-auth --feature-gates=RotateKubeletServerCertificate=true,Other=false\n"
+    )
+    return kubelet
+
+
+def check(*items, bin_op=None):
+    tests = {'test_items': list(items)}
+    if bin_op:
+        tests['bin_op'] = bin_op
+    return {'audit': AUDIT, 'audit_config': '/bin/cat /var/lib/kubelet/config.yaml', 'tests': tests}
+
+
+def test_flags_on_the_command_line_win_over_the_config_file(kubelet):
+    c = check()
+    assert kubelet.resolve(c, {'flag': '--read-only-port', 'path': '{.readOnlyPort}'}) == ('flag', '10255')
+    assert kubelet.resolve(c, {'flag': '--anonymous-auth', 'path': '{.authentication.anonymous.enabled}'}) \
+        == ('flag', 'true')
+    assert kubelet.resolve(c, {'flag': '--event-qps', 'path': '{.eventRecordQPS}'}) == ('config', 5)
+    assert kubelet.resolve(c, {'flag': 'RotateKubeletServerCertificate'}) == ('flag', 'true')
+    assert kubelet.resolve(c, {'flag': '--protect-kernel-defaults', 'path': '{.protectKernelDefaults}'}) \
+        == (None, None)
+
+
+def test_config_lookup_walks_nested_keys_and_joins_lists():
+    config = {'authentication': {'webhook': {'cacheTTL': '2m0s'}}, 'suites': ['a', 'b']}
+    assert worker.config_lookup(config, '{.authentication.webhook.cacheTTL}') == (True, '2m0s')
+    assert worker.config_lookup(config, '{.authentication.x509.clientCAFile}') == (False, None)
+    assert worker.config_lookup(config, '{.authentication.webhook.cacheTTL.more}') == (False, None)
+    assert worker.config_lookup(config, "{range .suites[:]}{}{','}{end}") == (True, 'a,b')
+    assert worker.config_lookup(config, 'not a path') == (False, None)
+
+
+@pytest.mark.parametrize('op, actual, expected, status', [
+    ('eq', False, 'false', 'PASS'),
+    ('eq', 'TRUE', 'true', 'PASS'),
+    ('eq', '1', '0', 'FAIL'),
+    ('noteq', '0', '10255', 'PASS'),
+    ('noteq', 'true', 'TRUE', 'FAIL'),
+    ('has', 'NodeRestriction,AlwaysPullImages', 'NodeRestriction', 'PASS'),
+    ('has', 'AlwaysPullImages', 'NodeRestriction', 'FAIL'),
+    ('nothave', 'Node,RBAC', 'AlwaysAllow', 'PASS'),
+    ('not_have', 'AlwaysAllow', 'AlwaysAllow', 'FAIL'),
+    ('gte', 5, '5', 'PASS'),
+    ('gt', 5, '5', 'FAIL'),
+    ('lte', '4', '5', 'PASS'),
+    ('lt', '6', '5', 'FAIL'),
+    ('gte', '2m0s', '5', 'WARN'),
+    ('valid_elements', 'a,b', 'a,b,c', 'PASS'),
+    ('valid_elements', 'a,d', 'a,b,c', 'FAIL'),
+    ('bitmask', '1', '1', 'WARN'),
+])
+def test_compare_ops(op, actual, expected, status):
+    assert worker.compare_value(op, actual, expected)[0] == status
+
+
+def test_compare_applies_when_set_is_given(kubelet):
+    item = {'flag': '--read-only-port', 'path': '{.readOnlyPort}', 'set': True,
+            'compare': {'op': 'eq', 'value': '0'}}
+    status, reason, _ = worker.evaluate_kubelet_check(kubelet, check(item))
+    assert status == 'FAIL'
+    assert '10255 != 0' in reason
+    item = dict(item, flag='--event-qps', path='{.eventRecordQPS}', compare={'op': 'gte', 'value': 5})
+    assert worker.evaluate_kubelet_check(kubelet, check(item))[0] == 'PASS'
+
+
+def test_set_is_a_presence_precondition(kubelet):
+    missing = {'flag': '--protect-kernel-defaults', 'path': '{.protectKernelDefaults}', 'set': True,
+               'compare': {'op': 'eq', 'value': 'true'}}
+    status, reason, _ = worker.evaluate_kubelet_check(kubelet, check(missing))
+    assert (status, reason) == ('FAIL', '--protect-kernel-defaults missing')
+    unset = dict(missing, set=False)
+    assert worker.evaluate_kubelet_check(kubelet, check(unset))[0] == 'PASS'
+    present = {'flag': '--read-only-port', 'set': False}
+    assert worker.evaluate_kubelet_check(kubelet, check(present))[0] == 'FAIL'
+    assert worker.evaluate_kubelet_check(kubelet, check(present, unset, bin_op='or'))[0] == 'PASS'
@@ -0,0 +1,88 @@
+import json
+
+from lineage import ProcessTree
+
+
+def exec_event(exec_id, parent_id=None, binary='/bin/sh', ts='2026-01-01T00:00:00Z'):
+    body = {'process': {'exec_id': exec_id, 'parent_exec_id': parent_id, 'binary': binary}}
+    return {'process_exec': body, 'time': ts}
+
+
+def exit_event(exec_id, parent_id=None, ts='2026-01-01T00:00:01Z'):
+    return {'process_exit': {'process': {'exec_id': exec_id, 'parent_exec_id': parent_id}}, 'time': ts}
+
+
+def shape(tree):
+    """Every process row and child set, to compare a shared copy with the leader."""
+    return {e: (p.to_row(), sorted(p.children)) for e, p in tree.processes.items()}
+
+
+def roundtrip(obj):
+    return json.loads(json.dumps(obj))
+
+
+def test_child_seen_before_its_parent_is_linked_when_the_parent_arrives():
+    tree = ProcessTree()
+    tree(exec_event('c', 'p', '/bin/cat'))
+    assert tree.ancestry('c') == ([], False)
+    tree(exec_event('p', 'root', '/bin/bash'))
+    tree(exec_event('root', None, '/sbin/init'))
+    chain, complete = tree.ancestry('c')
+    assert [a['exec_id'] for a in chain] == ['root', 'p']
+    assert complete
+    assert tree.subtree('p')['children'][0]['exec_id'] == 'c'
+    assert tree.orphans == {}
+
+
+def test_children_wait_again_while_their_parent_is_gone():
+    tree = ProcessTree(exit_ttl=5)
+    tree(exec_event('p'))
+    tree(exec_event('c', 'p'))
+    tree(exit_event('p'))
+    tree(exit_event('other', ts='2026-01-01T00:00:10Z'))
+    # 'p' was pruned after its exit TTL
+    assert 'p' not in tree.processes
+    assert tree.orphans == {'p': {'c'}}
+    tree(exec_event('p'))
+    assert tree.processes['p'].children == {'c'}
+    assert tree.orphans == {}
+
+
+def test_shared_copy_follows_deltas():
+    leader = ProcessTree(exit_ttl=5)
+    for i in range(5):
+        leader(exec_event(f"p{i}", f"p{i - 1}" if i else None))
+    copy = ProcessTree.from_snapshot(roundtrip(leader.snapshot()))
+    assert shape(copy) == shape(leader)
+
+    leader(exec_event('late-child', 'late-parent'))
+    leader(exec_event('late-parent', 'p4'))
+    leader(exit_event('p1', 'p0', ts='2026-01-01T00:00:01Z'))
+    delta = roundtrip(leader.delta())
+    assert {'late-child', 'late-parent', 'p1'} <= {row[0] for row in delta['rows']}
+    copy.apply_delta(delta)
+    assert shape(copy) == shape(leader)
+    assert copy.ancestry('late-child') == leader.ancestry('late-child')
+
+    # p1 is pruned once the exit TTL passes
+    leader(exit_event('p3', 'p2', ts='2026-01-01T00:00:10Z'))
+    assert 'p1' not in leader.processes
+    copy.apply_delta(roundtrip(leader.delta()))
+    assert shape(copy) == shape(leader)
+    assert copy.stats() == leader.stats()
+
+
+def test_delta_for_a_newer_generation_waits_for_its_base():
+    leader = ProcessTree(delta_max=3)
+    leader(exec_event('a'))
+    copy = ProcessTree.from_snapshot(roundtrip(leader.snapshot()))
+    for name in 'bcd':
+        leader(exec_event(name, 'a'))
+    assert leader.generation == 1
+    delta = roundtrip(leader.delta())
+    assert [row[0] for row in delta['rows']] == ['d']
+    copy.apply_delta(delta)
+    assert 'b' not in copy.processes
+    copy = ProcessTree.from_snapshot(roundtrip(leader.snapshot()))
+    copy.apply_delta(delta)
+    assert shape(copy) == shape(leader)
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+from coalesce import Coalescer
+from collector import CollectorStats, collect_pods
+from events import rfc3339
+from pod_streams import Checkpoints, DirectoryPods, PodCollector
+
+BASE = 1700000000.0
+
+
+def line(i, ts=None, call='sys_enter_openat'):
+    event = {'process_tracepoint': {'process': {'binary': '/bin/app'}, 'event': call, 'i': i}}
+    if ts is not None:
+        event['time'] = rfc3339(BASE + ts)
+    return json.dumps(event) + '\n'
+
+
+def append(directory, pod, *lines):
+    with open(directory / f"{pod}.log", 'a', encoding='utf-8') as f:
+        f.writelines(lines)
+
+
+class ListWriter:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, text, ts=None):
+        self.lines.append(json.loads(text))
+
+    def flush(self):
+        pass
+
+
+def collect(directory, checkpoint_path):
+    """One collector run over the pod files; returns (emitted event ids, collector)."""
+    out = []
+    pods = PodCollector(DirectoryPods(str(directory), follow=False),
+                        lambda text, event, ts: out.append(event['process_tracepoint']['i']),
+                        CollectorStats(), Checkpoints(str(checkpoint_path)))
+    asyncio.run(pods.run())
+    pods.checkpoints.save()
+    return out, pods
+
+
+def test_accept_drops_events_at_or_before_the_checkpoint():
+    checkpoints = Checkpoints(path=None)
+    assert checkpoints.accept('p', 10.0, 'a')
+    assert checkpoints.accept('p', 10.0, 'b')
+    assert not checkpoints.accept('p', 10.0, 'a')
+    assert not checkpoints.accept('p', 9.0, 'c')
+    assert checkpoints.accept('p', 11.0, 'a')
+    # Pods are tracked separately
+    assert checkpoints.accept('q', 9.0, 'c')
+
+
+def test_restart_resumes_without_duplicates_or_gaps(tmp_path):
+    pods_dir = tmp_path / 'pods'
+    pods_dir.mkdir()
+    cp = tmp_path / 'checkpoints.json'
+    append(pods_dir, 'a', line(1, 1), line(2, 2), line(3, 2))
+    append(pods_dir, 'b', line(10, 1))
+
+    first, _ = collect(pods_dir, cp)
+    assert sorted(first) == [1, 2, 3, 10]
+
+    # New events, including one at the exact time of the checkpoint
+    append(pods_dir, 'a', line(4, 2), line(5, 3))
+    append(pods_dir, 'b', line(11, 5))
+    second, pods = collect(pods_dir, cp)
+    assert sorted(second) == [4, 5, 11]
+    snapshot = pods.snapshot()
+    assert snapshot['a']['duplicates'] == 3
+    assert snapshot['b']['duplicates'] == 1
+
+    third, _ = collect(pods_dir, cp)
+    assert third == []
+
+
+def test_untimed_events_are_dropped_only_while_replaying(tmp_path):
+    pods_dir = tmp_path / 'pods'
+    pods_dir.mkdir()
+    cp = tmp_path / 'checkpoints.json'
+    append(pods_dir, 'a', line(1, 1), line(100), line(2, 2))
+    first, _ = collect(pods_dir, cp)
+    assert first == [1, 100, 2]
+
+    # The same untimed line again, but after the stream went live: a new event
+    append(pods_dir, 'a', line(3, 3), line(100))
+    second, _ = collect(pods_dir, cp)
+    assert second == [3, 100]
+
+    saved = json.loads(cp.read_text())['pods']['a']
+    assert 'replay' not in saved
+    assert len(saved['untimed']) == 2
+
+
+def test_checkpoints_are_saved_only_after_coalesced_events_are_written(tmp_path):
+    pods_dir = tmp_path / 'pods'
+    pods_dir.mkdir()
+    cp = tmp_path / 'checkpoints.json'
+    writer = ListWriter()
+    coalescer = Coalescer(writer.write, window=60, calls=['sys_enter_connect'])
+    burst = [line(i, i / 10, call='sys_enter_connect') for i in range(20)]
+    append(pods_dir, 'a', *burst)
+
+    pods = PodCollector(DirectoryPods(str(pods_dir), follow=False), coalescer.add,
+                        CollectorStats(), Checkpoints(str(cp)))
+    open_at_save = []
+    save = pods.checkpoints.save
+
+    def checked_save():
+        open_at_save.append(coalescer.snapshot()['open_windows'])
+        save()
+
+    pods.checkpoints.save = checked_save
+    collect_pods(pods, writer, report_interval=3600, coalescer=coalescer)
+
+    assert open_at_save and not any(open_at_save)
+    assert [e['coalesced']['count'] for e in writer.lines] == [20]
+    assert json.loads(cp.read_text())['pods']['a']['events'] == 20
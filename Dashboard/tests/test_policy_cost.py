@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from events import rfc3339
+from policy_cost import PolicyProfiler, policy_calls, profile_log
+from segments import SegmentWriter
+
+T0 = 1700000000.0
+CALLS = {
+    ('tracepoint', 'sys_enter_connect'): ['dos-connect-detect'],
+    ('kprobe', 'setns'): ['ns-escape', 'container-escape'],
+}
+
+
+def tracepoint(event, ts=T0, binary='/usr/bin/curl', policy=None, count=None):
+    body = {'process': {'binary': binary}, 'subsys': 'syscalls', 'event': event}
+    if policy:
+        body['policy_name'] = policy
+    out = {'process_tracepoint': body, 'time': rfc3339(ts)}
+    if count:
+        out['coalesced'] = {'count': count}
+    return out
+
+
+def kprobe(call, ts=T0, binary='/usr/bin/nsenter'):
+    return {'process_kprobe': {'process': {'binary': binary}, 'function_name': call}, 'time': rfc3339(ts)}
+
+
+def by_policy(report):
+    return {p['policy']: p for p in report['policies']}
+
+
+def test_events_are_charged_to_their_policy():
+    profiler = PolicyProfiler(CALLS)
+    # policy_name from Tetragon wins over the call lookup
+    assert profiler.attribute(tracepoint('sys_enter_connect', policy='custom')) == 'custom'
+    assert profiler.attribute(tracepoint('sys_enter_connect')) == 'dos-connect-detect'
+    # kprobes match by bare syscall name; a call in two policies is charged to both
+    assert profiler.attribute(kprobe('__x64_sys_setns')) == 'container-escape | ns-escape'
+    assert profiler.attribute(kprobe('tcp_sendmsg')) == 'unmatched:tcp_sendmsg'
+    assert profiler.attribute({'process_exit': {'process': {'binary': '/bin/sh'}}}) == 'process_exit'
+
+
+def test_report_totals_shares_and_rates():
+    profiler = PolicyProfiler(CALLS, window=10)
+    profiler.record(tracepoint('sys_enter_connect', T0, count=9), 300, 0.003)
+    profiler.record(tracepoint('sys_enter_connect', T0 + 20, binary='/usr/bin/wget'), 100, 0.001, shed=True)
+    profiler.record(kprobe('__x64_sys_setns', T0 + 20), 600, 0.004)
+    profiler.record({'process_exit': {'process': {'binary': '/bin/sh'}}}, 50, 0.0)
+    report = profiler.report()
+    policies = by_policy(report)
+    assert [p['policy'] for p in report['policies']][:2] == ['container-escape | ns-escape', 'dos-connect-detect']
+
+    connect = policies['dos-connect-detect']
+    assert (connect['events'], connect['records'], connect['bytes'], connect['shed']) == (10, 2, 400, 1)
+    assert connect['cpu_share'] == pytest.approx(0.5)
+    assert connect['byte_share'] == pytest.approx(400 / 1050, abs=1e-4)
+    assert connect['events_per_second'] == pytest.approx(0.5)
+    assert connect['us_per_event'] == pytest.approx(400)
+    assert connect['top_binaries'] == {'/usr/bin/curl': 9, '/usr/bin/wget': 1}
+    # The burst at T0 fell out of the 10 s window
+    assert connect['recent']['events_per_second'] == pytest.approx(1)
+    assert policies['process_exit']['top_binaries'] == {'/bin/sh': 1}
+    assert report['totals']['events'] == 12
+    assert report['totals']['span_seconds'] == 20
+
+
+def test_late_events_count_in_the_newest_bucket():
+    profiler = PolicyProfiler(CALLS, window=10)
+    profiler.record(tracepoint('sys_enter_connect', T0 + 5), 100, 0.001)
+    profiler.record(tracepoint('sys_enter_connect', T0), 100, 0.001)
+    assert [second for second, _ in profiler.buckets] == [int(T0) + 5]
+    assert by_policy(profiler.report())['dos-connect-detect']['recent']['events_per_second'] == 2
+    assert profiler.report()['totals']['span_seconds'] == 5
+
+
+def test_profile_log_reads_sealed_and_open_segments(tmp_path):
+    writer = SegmentWriter(str(tmp_path), batch_size=1000, roll_seconds=60, retention_seconds=0)
+    for i in range(5):
+        ts = T0 + i * 40
+        writer.write(json.dumps(tracepoint('sys_enter_connect', ts)), ts)
+    writer.write('not json', T0 + 200)
+    writer.close()
+    profiler = PolicyProfiler(CALLS)
+    profile_log(str(tmp_path), profiler)
+    assert by_policy(profiler.report())['dos-connect-detect']['events'] == 5
+
+
+def test_policy_calls_from_the_shipped_policies():
+    calls = policy_calls()
+    assert calls[('tracepoint', 'sys_enter_connect')] == ['dos-connect-detect']
+    assert policy_calls('/nonexistent') == {}
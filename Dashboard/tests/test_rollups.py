@@ -0,0 +1,89 @@
+import pytest
+
+import rollups
+from events import rfc3339
+from rollups import Rollups
+
+MINUTE = 1700000040.0  # a minute boundary
+HOUR = 1699999200.0    # the hour it falls in
+
+
+def kprobe(ts, binary='/usr/bin/curl', count=None):
+    event = {'process_kprobe': {'process': {'binary': binary}, 'function_name': 'tcp_connect'},
+             'time': rfc3339(ts)}
+    if count:
+        event['coalesced'] = {'count': count}
+    return event
+
+
+def exec_event(ts, binary='/bin/sh'):
+    return {'process_exec': {'process': {'binary': binary}}, 'time': rfc3339(ts)}
+
+
+def totals(result):
+    return [(b['start'], b['total']) for b in result['buckets']]
+
+
+def test_events_are_counted_per_bucket_and_dimension():
+    r = Rollups()
+    r(kprobe(MINUTE))
+    # A collapsed burst counts for every event it stands for
+    r(kprobe(MINUTE + 59.9, count=5))
+    r(exec_event(MINUTE + 60))
+    minute = r.query('minute')
+    assert minute['bucket_seconds'] == 60
+    assert totals(minute) == [(MINUTE, 6), (MINUTE + 60, 1)]
+    first = minute['buckets'][0]
+    assert first['by_type'] == {'tcp_connect': 6}
+    assert first['by_severity'] == {'high': 6}
+    assert first['by_binary'] == {'/usr/bin/curl': 6}
+    assert minute['buckets'][1]['by_severity'] == {'medium': 1}
+    assert totals(r.query('hour')) == [(HOUR, 7)]
+    # since is rounded down to its bucket; until compares bucket starts
+    assert totals(r.query('minute', since=MINUTE + 30, until=MINUTE + 30)) == [(MINUTE, 6)]
+    assert totals(r.query('minute', since=MINUTE + 60)) == [(MINUTE + 60, 1)]
+
+
+def test_old_buckets_are_evicted_and_late_events_dropped():
+    r = Rollups({'minute': (60, 3)})
+    for i in range(5):
+        r(kprobe(MINUTE + i * 60))
+    assert [s for s, _ in totals(r.query())] == [MINUTE + 120, MINUTE + 180, MINUTE + 240]
+    # Older than the oldest bucket kept: not counted
+    r(kprobe(MINUTE + 60))
+    assert totals(r.query()) == [(MINUTE + 120, 1), (MINUTE + 180, 1), (MINUTE + 240, 1)]
+    # Late, but within the kept window
+    r(kprobe(MINUTE + 150))
+    assert totals(r.query())[0] == (MINUTE + 120, 2)
+
+
+def test_closed_buckets_keep_only_the_top_binaries(monkeypatch):
+    monkeypatch.setattr(rollups, 'ROLLUP_TOP_BINARIES', 2)
+    r = Rollups({'minute': (60, 10)})
+    for binary, n in (('/bin/a', 5), ('/bin/b', 4), ('/bin/c', 2), ('/bin/d', 1)):
+        for _ in range(n):
+            r(kprobe(MINUTE, binary))
+    # The newest bucket is still exact
+    assert len(r.query()['buckets'][0]['by_binary']) == 4
+    r(kprobe(MINUTE + 60, '/bin/e'))
+    closed = r.query()['buckets'][0]
+    assert closed['by_binary'] == {'/bin/a': 5, '/bin/b': 4, 'other': 3}
+    assert closed['total'] == 12
+    assert r.query(top=1)['buckets'][0]['by_binary'] == {'/bin/a': 5}
+
+
+def test_snapshot_round_trip_answers_the_same_queries():
+    r = Rollups()
+    for i in range(30):
+        r(kprobe(MINUTE + i * 17, f"/bin/{i % 4}"))
+    copy = Rollups.from_snapshot(r.snapshot())
+    for resolution in ('minute', 'hour'):
+        assert copy.query(resolution) == r.query(resolution)
+    # The shared copy keeps counting into the right buckets
+    copy(kprobe(MINUTE + 29 * 17))
+    assert copy.query()['buckets'][-1]['total'] == r.query()['buckets'][-1]['total'] + 1
+
+
+def test_unknown_resolution_is_rejected():
+    with pytest.raises(ValueError, match='Unknown resolution'):
+        Rollups().query('day')
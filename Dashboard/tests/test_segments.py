@@ -0,0 +1,111 @@
+import json
+import os
+import time
+
+import segments
+from segments import SegmentWriter
+
+
+def event(i, ts):
+    return json.dumps({'i': i, 'time': ts})
+
+
+def read_all(directory, since=None, until=None):
+    """Event numbers in the segments overlapping the range, read as the dashboard does."""
+    entries = segments.select_segments(segments.load_index(directory), since, until)
+    return [json.loads(line)['i'] for entry in entries for line in segments.read_segment(directory, entry)]
+
+
+def files(directory):
+    return sorted(f for f in os.listdir(directory) if f.startswith(segments.SEGMENT_PREFIX))
+
+
+def test_rolls_by_time_window_and_compresses(tmp_path):
+    d = str(tmp_path)
+    writer = SegmentWriter(d, batch_size=1000, roll_seconds=60, retention_seconds=0, retention_bytes=0)
+    for i, ts in enumerate([0, 10, 59, 60, 61, 130]):
+        writer.write(event(i, ts), ts)
+    writer.close()
+
+    index = segments.load_index(d)
+    assert [(s['min_ts'], s['max_ts'], s['count']) for s in index] == [(0, 59, 3), (60, 61, 2), (130, 130, 1)]
+    assert [s['sealed'] for s in index] == [True, True, False]
+    assert files(d) == ['seg-00000001.ndjson.gz', 'seg-00000002.ndjson.gz', 'seg-00000003.ndjson']
+    assert read_all(d) == [0, 1, 2, 3, 4, 5]
+    # Only segments overlapping the range are read
+    assert [s['name'] for s in segments.select_segments(index, 60, 100)] == ['seg-00000002']
+    assert read_all(d, 60, 100) == [3, 4]
+
+
+def test_retention_drops_segments_by_age(tmp_path):
+    d = str(tmp_path)
+    now = time.time()
+    writer = SegmentWriter(d, batch_size=1000, roll_seconds=60, retention_seconds=300, retention_bytes=0)
+    for i, ts in enumerate([now - 1000, now - 990, now - 600, now - 100, now]):
+        writer.write(event(i, ts), ts)
+    writer.close()
+
+    index = segments.load_index(d)
+    assert all(s['max_ts'] >= now - 300 for s in index)
+    assert read_all(d) == [3, 4]
+    assert files(d) == sorted(os.path.basename(segments.segment_path(d, s)) for s in index)
+
+
+def test_retention_drops_oldest_segments_by_size(tmp_path):
+    d = str(tmp_path)
+    line = event(0, 0)
+    per_segment = 4 * (len(line) + 1)
+    writer = SegmentWriter(d, batch_size=1, max_bytes=per_segment, roll_seconds=0, compress=False,
+                           retention_seconds=0, retention_bytes=3 * per_segment)
+    for i in range(40):
+        writer.write(event(i % 10, i), i)
+    writer.close()
+
+    index = segments.load_index(d)
+    # Never more than the budget plus the segment just opened
+    assert sum(s['bytes'] for s in index) <= 4 * per_segment
+    names = [s['name'] for s in index]
+    assert names[-1] == 'seg-00000010'
+    assert names == [f"seg-{n:08d}" for n in range(11 - len(names), 11)]
+    assert files(d) == sorted(n + segments.ACTIVE_SUFFIX for n in names)
+    times = [json.loads(line)['time'] for entry in index for line in segments.read_segment(d, entry)]
+    assert times == list(range(40 - len(times), 40))
+
+
+def test_restart_resumes_the_open_segment(tmp_path):
+    d = str(tmp_path)
+    writer = SegmentWriter(d, roll_seconds=60, retention_seconds=0)
+    writer.write(event(0, 0), 0)
+    writer.close()
+    writer = SegmentWriter(d, roll_seconds=60, retention_seconds=0)
+    writer.write(event(1, 1), 1)
+    writer.close()
+    index = segments.load_index(d)
+    assert [(s['name'], s['count']) for s in index] == [('seg-00000001', 2)]
+    assert read_all(d) == [0, 1]
+
+
+def test_reader_follows_a_segment_sealed_after_reading_the_index(tmp_path):
+    d = str(tmp_path)
+    writer = SegmentWriter(d, batch_size=1, roll_seconds=60, retention_seconds=0)
+    writer.write(event(0, 0), 0)
+    stale = segments.load_index(d)[0]
+    writer.write(event(1, 60), 60)
+    writer.close()
+    assert not stale['compressed']
+    assert [json.loads(line)['i'] for line in segments.read_segment(d, stale)] == [0]
+    with segments.open_segment(d, stale) as f:
+        assert json.loads(f.readline())['i'] == 0
+
+
+def test_readers_skip_a_segment_dropped_by_retention(tmp_path):
+    d = str(tmp_path)
+    writer = SegmentWriter(d, batch_size=1, roll_seconds=60, retention_seconds=0)
+    writer.write(event(0, 0), 0)
+    writer.write(event(1, 60), 60)
+    writer.close()
+    first = segments.load_index(d)[0]
+    os.remove(segments.segment_path(d, first))
+    assert segments.open_segment(d, first) is None
+    assert list(segments.read_segment(d, first)) == []
+    assert read_all(d) == [1]
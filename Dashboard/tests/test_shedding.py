@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from events import classify_event, severity_of
+from shedding import LoadShedder, skim
+
+LOW, MEDIUM, HIGH, CRITICAL = 'tcp_sendmsg', 'security_file_open', 'tcp_connect', '__x64_sys_setuid'
+
+
+def kprobe(call, count=None):
+    body = {'process': {'exec_id': 'e1', 'binary': '/usr/bin/curl',
+                        'pod': {'namespace': 'prod', 'name': 'web-0', 'container': {'name': 'app'}}},
+            'parent': {'binary': '/bin/sh'},
+            'function_name': call, 'policy_name': 'network'}
+    event = {'process_kprobe': body, 'node_name': 'node-a'}
+    if count:
+        event['coalesced'] = {'count': count, 'first_time': '2026-01-01T00:00:00Z'}
+    event['time'] = '2026-01-01T00:00:01.123456789Z'
+    return event
+
+
+def line(event):
+    return json.dumps(event, separators=(',', ':')).encode()
+
+
+def shedder(**overrides):
+    return LoadShedder(**dict(dict(backlog_bytes=100, lag_seconds=30, min_rate=0.125, adjust_interval=0),
+                              **overrides))
+
+
+def test_calls_severities():
+    assert [severity_of(c) for c in (LOW, MEDIUM, HIGH, CRITICAL)] == ['low', 'medium', 'high', 'critical']
+
+
+@pytest.mark.parametrize('event', [
+    kprobe(HIGH),
+    kprobe(LOW, count=7),
+    {'process_tracepoint': {'process': {'binary': '/bin/cat'}, 'subsys': 'syscalls', 'event': 'sys_enter_openat'},
+     'node_name': 'node-b', 'time': '2026-01-01T00:00:02Z'},
+    {'process_exec': {'process': {'binary': '/bin/ls', 'pod': {'namespace': 'dev', 'name': 'job-1'}},
+                      'parent': {'binary': '/bin/bash'}}, 'node_name': 'node-c', 'time': '2026-01-01T00:00:03Z'},
+])
+def test_skim_matches_a_full_decode(event):
+    skeleton = skim(line(event))
+    assert classify_event(skeleton) == classify_event(event)
+    kind = next(iter(event))
+    if event[kind]['process'].get('pod'):
+        pod = event[kind]['process']['pod']
+        assert skeleton[kind]['process']['pod'] == {'namespace': pod['namespace'], 'name': pod['name']}
+    assert skeleton['node_name'] == event['node_name']
+    assert skeleton['time'] == event['time']
+    assert skeleton.get('coalesced', {}).get('count') == event.get('coalesced', {}).get('count')
+    assert skim(b'time="..." level=info msg="not an event"') is None
+
+
+def test_rates_drop_lowest_severity_first_and_recover_highest_first():
+    s = shedder()
+    assert not s.degraded
+    for backlog in range(200, 1200, 100):
+        s.update(backlog, None, False)
+    # low reaches the floor (1 -> 1/8 in three halvings) before medium and high follow
+    assert s.rates == {'low': 0.125, 'medium': 0.125, 'high': 0.125}
+    assert s.degraded
+    # Overloaded but the backlog is shrinking: hold the rates
+    s.update(1000, None, False)
+    assert s.rates['high'] == 0.125
+    s.update(50, None, False)
+    assert s.rates == {'low': 0.125, 'medium': 0.125, 'high': 0.25}
+    for _ in range(8):
+        s.update(50, None, False)
+    assert s.rates == {'low': 1.0, 'medium': 1.0, 'high': 1.0}
+    assert not s.degraded
+
+
+def test_lag_counts_only_once_caught_up():
+    s = shedder()
+    s.update(0, 120, False)
+    assert not s.degraded
+    s.update(0, 120, True)
+    assert s.rates['low'] == 0.5
+
+
+def test_each_call_keeps_its_share_of_the_sample():
+    s = shedder()
+    s.rates['low'] = 0.25
+    admitted = {'tcp_sendmsg': 0, 'tcp_recvmsg': 0}
+    for _ in range(40):
+        for call in admitted:
+            admitted[call] += s.admit(skim(line(kprobe(call))))
+    # Interleaved calls are sampled independently: the first of each, then 1 in 4
+    assert admitted == {'tcp_sendmsg': 11, 'tcp_recvmsg': 11}
+    snapshot = s.snapshot()
+    assert snapshot['shed'] == {'low': 58}
+    assert snapshot['shed_by_call'] == {'tcp_sendmsg': 29, 'tcp_recvmsg': 29}
+    assert snapshot['seen_while_degraded'] == {'low': 80}
+
+
+def test_critical_and_protected_events_are_always_decoded():
+    s = shedder(never={'process_exec', 'setns'})
+    s.rates.update(low=0.125, medium=0.125, high=0.125)
+    always = [kprobe(CRITICAL), kprobe('__x64_sys_setns'),
+              {'process_exec': {'process': {'binary': '/bin/ls'}}, 'time': '2026-01-01T00:00:03Z'}]
+    assert all([s.admit(skim(line(e))) for e in always for _ in range(10)])
+    # The first and the eighth of ten at 1/8
+    assert sum(s.admit(skim(line(kprobe(HIGH)))) for _ in range(10)) == 2
+    # Protected by bare syscall name: the tracepoint name covers the kprobe
+    s.protect(['sys_enter_connect'])
+    assert all([s.admit(skim(line(kprobe('__x64_sys_connect')))) for _ in range(10)])
+    assert s.snapshot()['shed'] == {'high': 8}
@@ -0,0 +1,87 @@
+import random
+from collections import Counter
+
+import pytest
+
+from sketches import CountMinTopK, ExactCounter, HeavyHitters, SpaceSaving, make_tracker
+
+
+def stream(n=20000, keys=2000, seed=7, skew=1.1):
+    """Zipf-like keys (a few heavy hitters, a long tail) with the odd weighted add."""
+    rng = random.Random(seed)
+    weights = [1 / (rank ** skew) for rank in range(1, keys + 1)]
+    names = [f"/usr/bin/k{i}" for i in range(keys)]
+    return [(key, rng.choice((1, 1, 1, 3))) for key in rng.choices(names, weights, k=n)]
+
+
+def feed(tracker, items):
+    exact = Counter()
+    for key, count in items:
+        tracker.add(key, count)
+        exact[key] += count
+    return exact
+
+
+def test_space_saving_counts_stay_within_the_reported_bound():
+    items = stream()
+    sketch = SpaceSaving(capacity=100)
+    exact = feed(sketch, items)
+    bounds = sketch.error_bounds()
+    assert bounds['n'] == sum(exact.values())
+    assert 0 < bounds['max_overestimate'] <= bounds['bound']
+    assert sketch.min_count == min(sketch.counts.values())
+    for key, count in sketch.counts.items():
+        assert exact[key] <= count <= exact[key] + bounds['max_overestimate']
+        assert sketch.guaranteed(key) <= exact[key]
+    # Every key above n / capacity is still tracked
+    heavy = [k for k, c in exact.items() if c > bounds['n'] / sketch.capacity]
+    assert heavy and all(k in sketch.counts for k in heavy)
+    assert [k for k, _ in sketch.top(5)] == [k for k, _ in exact.most_common(5)]
+
+
+def test_space_saving_is_exact_below_capacity():
+    sketch = SpaceSaving(capacity=10)
+    exact = feed(sketch, [('a', 1), ('b', 2), ('a', 3)])
+    assert sketch.top(2) == exact.most_common(2)
+    assert sketch.error_bounds()['max_overestimate'] == 0
+
+
+def test_count_min_overestimates_within_epsilon_n():
+    items = stream()
+    sketch = CountMinTopK(width=256, depth=4, capacity=50)
+    exact = feed(sketch, items)
+    bounds = sketch.error_bounds()
+    errors = [sketch.estimate(k) - c for k, c in exact.items()]
+    assert min(errors) >= 0
+    # Holds per key with probability 1 - delta (~98%); allow for that
+    within = sum(1 for e in errors if e <= bounds['max_overestimate'])
+    assert within >= (1 - 2 * bounds['delta']) * len(errors)
+    assert [k for k, _ in sketch.top(5)] == [k for k, _ in exact.most_common(5)]
+    assert len(sketch.candidates) == 50
+
+
+def test_trackers_agree_with_exact_counts_on_the_heavy_hitters():
+    items = stream(seed=11)
+    exact = feed(ExactCounter(), items)
+    for tracker in (SpaceSaving(capacity=200), CountMinTopK(width=1024, capacity=200)):
+        feed(tracker, items)
+        assert [k for k, _ in tracker.top(3)] == [k for k, _ in exact.most_common(3)]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match='Unknown top-K mode'):
+        make_tracker('lossy')
+
+
+def test_heavy_hitters_count_collapsed_bursts():
+    hitters = HeavyHitters(modes={'binary': 'spacesaving', 'pod': 'countmin', 'call': 'exact'})
+    event = {'process_kprobe': {'process': {'binary': '/usr/bin/curl', 'pod': {'namespace': 'prod', 'name': 'web'}},
+                                'function_name': 'tcp_connect'}}
+    hitters(event)
+    hitters(dict(event, coalesced={'count': 4}))
+    stats = hitters.stats()
+    assert stats['total'] == 5
+    assert stats['by_process'] == {'/usr/bin/curl': 5}
+    assert stats['by_pod'] == {'prod/web': 5}
+    assert stats['by_type'] == {'tcp_connect': 5}
+    assert stats['error_bounds']['binary']['algorithm'] == 'spacesaving'
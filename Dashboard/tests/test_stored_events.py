@@ -0,0 +1,104 @@
+import json
+import time
+
+import pytest
+
+import app as dashboard
+from event_store import EventStore
+from events import rfc3339
+from segments import SegmentWriter
+
+
+def kprobe(i, ts):
+    return {
+        'process_kprobe': {
+            'process': {'binary': '/usr/bin/nmap', 'pid': 100 + i,
+                        'pod': {'namespace': 'prod', 'name': f"web-{i % 3}"}},
+            'function_name': 'tcp_connect',
+        },
+        'node_name': 'node-a',
+        'time': rfc3339(ts),
+    }
+
+
+@pytest.fixture(scope='module')
+def log():
+    writer = SegmentWriter(dashboard.RUNTIME_LOG_DIR, batch_size=1000, truncate=True)
+    count = [0]
+
+    def append(n):
+        """Append n events to the runtime log and ingest them."""
+        now = time.time()
+        for _ in range(n):
+            count[0] += 1
+            ts = now + count[0] * 0.001
+            writer.write(json.dumps(kprobe(count[0], ts)), ts)
+        writer.flush()
+        dashboard.runtime_ingester.poll()
+
+    yield append
+    writer.close()
+
+
+@pytest.fixture(scope='module')
+def client():
+    return dashboard.app.test_client()
+
+
+def alerts(client, **params):
+    response = client.get('/api/runtime/alerts', query_string=dict(params, lineage='0'))
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_delta_cursor_returns_only_newer_alerts(log, client):
+    log(5)
+    first = alerts(client)
+    assert first['source'] == 'store'
+    assert first['reset'] is True
+    cursor = first['cursor']
+    assert cursor == dashboard.runtime_events.next_id - 1
+    assert len(first['alerts']) == len(dashboard.runtime_events)
+
+    nothing = alerts(client, after=cursor)
+    assert nothing['alerts'] == []
+    assert nothing['reset'] is False
+    assert nothing['cursor'] == cursor
+
+    log(3)
+    delta = alerts(client, after=cursor)
+    assert delta['reset'] is False
+    assert sorted(a['event_id'] for a in delta['alerts']) == [cursor + 1, cursor + 2, cursor + 3]
+    assert delta['cursor'] == cursor + 3
+
+    compact = alerts(client, after=cursor, compact='1')
+    assert compact['compact'] is True
+    assert [r['id'] for r in compact['alerts']] == [cursor + 3, cursor + 2, cursor + 1]
+
+
+def test_cursor_from_before_a_restart_starts_over(log, client):
+    log(2)
+    latest = alerts(client)['cursor']
+    reset = alerts(client, after=latest + 100)
+    assert reset['reset'] is True
+    assert reset['cursor'] == latest
+    assert len(reset['alerts']) == len(dashboard.runtime_events)
+
+
+def test_delta_survives_only_while_the_cursor_is_held(log, monkeypatch):
+    log(1)
+    store = EventStore(capacity=4)
+    for i in range(10):
+        store(kprobe(i, time.time() - 10 + i))
+    monkeypatch.setattr(dashboard, 'runtime_events', store)
+
+    pairs, cursor = dashboard.stored_events(after=7)
+    assert cursor == 9
+    assert [row['id'] for row, _ in pairs] == [9, 8]
+    # Everything after the cursor is held even if older than the store's range
+    pairs, _ = dashboard.stored_events(after=5)
+    assert [row['id'] for row, _ in pairs] == [9, 8, 7, 6]
+    # Events after the cursor were overwritten: the caller must fall back
+    assert dashboard.stored_events(after=2) is None
+    pairs, _ = dashboard.stored_events(after=7, limit=1)
+    assert [row['id'] for row, _ in pairs] == [9]
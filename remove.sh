@@ -16,6 +16,7 @@ fi
 echo "[+] Removing dashboard deployment..."
 kubectl delete deployment k8s-security-dashboard -n default --ignore-not-found=true
 kubectl delete service k8s-security-dashboard -n default --ignore-not-found=true
+kubectl delete secret cis-node-upload -n default --ignore-not-found=true
 
 if [ -f "$BASE_DIR/job.yaml" ]; then
   kubectl delete -f "$BASE_DIR/job.yaml" --ignore-not-found=true
@@ -139,6 +139,12 @@ echo "[+] Deploying dashboard..."
 wget -q -O "$BASE_DIR/job.yaml" \
 https://raw.githubusercontent.com/mohanvamsi06/FYP-CYS-22-26/main/job.yaml
 
+# Shared secret the scanners present when uploading per-node results
+if ! kubectl get secret cis-node-upload -n default >/dev/null 2>&1; then
+  kubectl create secret generic cis-node-upload -n default \
+    --from-literal=token="$(head -c 32 /dev/urandom | od -An -tx1 | tr -d ' \n')"
+fi
+
 kubectl apply -f "$BASE_DIR/job.yaml"
 
 echo "[+] Waiting for dashboard to be ready (may take a few mins on first run)..."